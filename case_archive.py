@@ -0,0 +1,285 @@
+"""
+[CASE-BASE RETENTION - Cold Archive & Compaction]
+Maintenance command that keeps case_library.txt small for the CBR hot path.
+
+Dead cases (feedback_score below the CBR quality threshold) and stale PENDING
+submissions are moved into a gzip-compressed archive that the diagnosis code
+never opens. The live library is then rewritten without them (compaction).
+
+PENDING cases written before submissions carried a created date are stamped
+with the date of the first run that sees them, so they age out from then on.
+Rewrites hold the library lock (file_lock.py) the app's writers take too.
+
+Usage:
+    python case_archive.py report                 # dry-run: what would be archived
+    python case_archive.py run                    # archive + compact
+    python case_archive.py restore CASE-10001 ... # move cases back to the library
+    python case_archive.py restore --all
+"""
+import argparse
+import datetime
+import gzip
+import json
+import os
+
+from case_reader import atomic_writer, write_lines_atomic
+from expert_engine import try_parse_case_record
+from file_lock import file_lock
+
+LIBRARY_PATH = "case_library.txt"
+ARCHIVE_PATH = "case_archive.jsonl.gz"
+
+# Same threshold run_cbr_analysis uses to skip a case
+DEAD_FEEDBACK_THRESHOLD = -2
+
+# PENDING cases older than this with no positive feedback are considered stale
+DEFAULT_MAX_PENDING_AGE_DAYS = 90
+
+
+# ======================================
+# 1. PARSING
+# ======================================
+
+def parse_created(created):
+    """Returns the creation date of a case, or None for undated (legacy) cases."""
+    if not created:
+        return None
+    try:
+        return datetime.date.fromisoformat(created[:10])
+    except ValueError:
+        return None
+
+
+# ======================================
+# 2. RETENTION POLICY
+# ======================================
+
+def classify_case(case, today, max_pending_age_days=DEFAULT_MAX_PENDING_AGE_DAYS):
+    """
+    Applies the retention policy to a parsed case.
+
+    Returns:
+        str | None: Archive reason ("dead", "stale-pending") or None to keep it live
+    """
+    if case["feedback"] < DEAD_FEEDBACK_THRESHOLD:
+        return "dead"
+
+    if case["status"] == "PENDING" and case["feedback"] <= 0:
+        created = parse_created(case["created"])
+        if created and (today - created).days > max_pending_age_days:
+            return "stale-pending"
+
+    return None
+
+
+def stamp_created(line, created):
+    """The line of an undated case with `created` filled in (feedback score defaults to 0)."""
+    parts = [p.strip() for p in line.strip().split("|")]
+    if len(parts) == 4:
+        parts.append("0")
+    if len(parts) == 5:
+        parts.append(created)
+    else:
+        parts[5] = created
+    return " | ".join(parts) + "\n"
+
+
+def plan_retention(lines, today=None, max_pending_age_days=DEFAULT_MAX_PENDING_AGE_DAYS):
+    """
+    Splits library lines into the ones to keep and the ones to archive.
+    Kept PENDING cases without a usable created date are stamped with `today`
+    (migration of cases written before submissions were dated).
+
+    Returns:
+        tuple: (keep_lines: list, archived: list of dict, dated: list of case IDs)
+    """
+    today = today or datetime.date.today()
+    keep, archived, dated = [], [], []
+
+    for line in lines:
+        if not line.strip():
+            continue  # Compaction: blank lines are dropped
+
+        case = try_parse_case_record(line)
+        if case is None:
+            reason = "malformed"
+        else:
+            reason = classify_case(case, today, max_pending_age_days)
+
+        if reason:
+            archived.append({
+                "id": case["id"] if case else None,
+                "reason": reason,
+                "line": line.rstrip("\n"),
+            })
+        elif case["status"] == "PENDING" and parse_created(case["created"]) is None:
+            keep.append(stamp_created(line, today.isoformat()))
+            dated.append(case["id"])
+        else:
+            keep.append(line.rstrip("\n") + "\n")
+
+    return keep, archived, dated
+
+
+# ======================================
+# 3. FILE OPERATIONS
+# ======================================
+
+def read_archive(archive_path=ARCHIVE_PATH):
+    """Returns all archive records (oldest first)."""
+    if not os.path.exists(archive_path):
+        return []
+    with gzip.open(archive_path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def write_archive(records, archive_path=ARCHIVE_PATH):
+    """Rewrites the archive atomically with the given records."""
+    with atomic_writer(archive_path) as raw, gzip.open(raw, "wt", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def library_stats(lines):
+    """Size metrics for a list of library lines."""
+    cases = [try_parse_case_record(line) for line in lines if line.strip()]
+    return {
+        "lines": len(lines),
+        "bytes": sum(len(line.encode("utf-8")) for line in lines),
+        "verified": sum(1 for c in cases if c and c["status"] == "VERIFIED"),
+        "pending": sum(1 for c in cases if c and c["status"] == "PENDING"),
+    }
+
+
+def run_retention(library_path=LIBRARY_PATH, archive_path=ARCHIVE_PATH,
+                  max_pending_age_days=DEFAULT_MAX_PENDING_AGE_DAYS, dry_run=False, today=None):
+    """
+    [MAINTENANCE ENTRY POINT]
+    Archives dead/stale cases and compacts the live library.
+
+    Returns:
+        dict: Report with before/after stats, read cost saved and archived cases
+    """
+    if not os.path.exists(library_path):
+        return {"before": library_stats([]), "after": library_stats([]), "archived": [], "dated": [],
+                "saved_bytes": 0, "saved_pct": 0.0}
+
+    with file_lock(library_path):
+        with open(library_path, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+
+        keep, archived, dated = plan_retention(lines, today, max_pending_age_days)
+        before, after = library_stats(lines), library_stats(keep)
+        saved = before["bytes"] - after["bytes"]
+
+        if not dry_run and (archived or dated or len(keep) != len(lines)):
+            stamp = datetime.datetime.now().isoformat(timespec="seconds")
+            for record in archived:
+                record["archived_at"] = stamp
+            # Archive first: a crash between the two writes duplicates, never loses, a case
+            if archived:
+                write_archive(read_archive(archive_path) + archived, archive_path)
+            write_lines_atomic(library_path, keep)
+
+    return {
+        "before": before,
+        "after": after,
+        "archived": archived,
+        "dated": dated,
+        "saved_bytes": saved,
+        "saved_pct": (saved / before["bytes"] * 100) if before["bytes"] else 0.0,
+    }
+
+
+def restore_cases(case_ids=None, library_path=LIBRARY_PATH, archive_path=ARCHIVE_PATH):
+    """
+    Moves archived cases back into the live library.
+
+    Args:
+        case_ids: Iterable of case IDs to restore, or None for all
+
+    Returns:
+        list: Restored case IDs
+    """
+    # The archive is only rewritten together with the library, under the same lock
+    with file_lock(library_path):
+        records = read_archive(archive_path)
+        wanted = set(case_ids) if case_ids is not None else None
+
+        restored, remaining = [], []
+        for record in records:
+            if wanted is None or record.get("id") in wanted:
+                restored.append(record)
+            else:
+                remaining.append(record)
+
+        if not restored:
+            return []
+
+        lines = []
+        if os.path.exists(library_path):
+            with open(library_path, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+        if lines and not lines[-1].endswith("\n"):
+            lines[-1] += "\n"
+        lines.extend(record["line"] + "\n" for record in restored)
+
+        write_lines_atomic(library_path, lines)
+        write_archive(remaining, archive_path)
+    return [record.get("id") for record in restored]
+
+
+# ======================================
+# 4. COMMAND LINE
+# ======================================
+
+def print_report(report, dry_run):
+    before, after = report["before"], report["after"]
+    print("📚 Case Library Retention" + (" (dry run)" if dry_run else ""))
+    print(f"   Before: {before['lines']} lines, {before['bytes']} bytes "
+          f"({before['verified']} VERIFIED / {before['pending']} PENDING)")
+    print(f"   After:  {after['lines']} lines, {after['bytes']} bytes "
+          f"({after['verified']} VERIFIED / {after['pending']} PENDING)")
+    print(f"   Read cost saved per scan: {report['saved_bytes']} bytes ({report['saved_pct']:.1f}%)")
+    if report["archived"]:
+        print(f"   Archived {len(report['archived'])} case(s):")
+        for record in report["archived"]:
+            print(f"   - {record['id'] or '<unparseable>'} [{record['reason']}]")
+    else:
+        print("   Nothing to archive.")
+    if report["dated"]:
+        print(f"   Stamped {len(report['dated'])} undated PENDING case(s) with today's date "
+              f"(they age out from now on)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Case library retention, archive and restore.")
+    parser.add_argument("--library", default=LIBRARY_PATH)
+    parser.add_argument("--archive", default=ARCHIVE_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name in ("report", "run"):
+        p = sub.add_parser(name)
+        p.add_argument("--max-pending-age-days", type=int, default=DEFAULT_MAX_PENDING_AGE_DAYS)
+
+    p_restore = sub.add_parser("restore")
+    p_restore.add_argument("case_ids", nargs="*")
+    p_restore.add_argument("--all", action="store_true")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "restore":
+        if not args.case_ids and not args.all:
+            parser.error("restore needs case IDs or --all")
+        restored = restore_cases(None if args.all else args.case_ids, args.library, args.archive)
+        print(f"♻️ Restored {len(restored)} case(s): {', '.join(filter(None, restored)) or '-'}")
+        return 0
+
+    dry_run = args.command == "report"
+    report = run_retention(args.library, args.archive, args.max_pending_age_days, dry_run=dry_run)
+    print_report(report, dry_run)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
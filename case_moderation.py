@@ -0,0 +1,282 @@
+"""
+[BULK MODERATION - Expert Review of PENDING Cases]
+Lists PENDING submissions with filters and approves, rejects or archives many
+of them in one action, instead of one update_case_feedback rewrite per case.
+
+- Filters: age in days (from the created date), feedback score and
+  convergence points (same tiers as check_numerical_convergence)
+- approve: PENDING -> VERIFIED, every other field kept
+- reject / archive: the case leaves the live library and is stored in the
+  cold archive (case_archive.py) with reason "rejected" / "moderated", so
+  `python case_archive.py restore` can bring it back
+- A whole batch is one transaction: the archive is written first, then the
+  library in a single atomic rewrite (a crash duplicates, never loses, a case)
+- The read and the rewrite hold the library lock (file_lock.py) the app's
+  write-behind flushes take, so no vote or submission is overwritten
+- Cases that are no longer PENDING when the action runs are skipped
+
+Usage:
+    python case_moderation.py list --min-age-days 30 --max-score 0
+    python case_moderation.py approve --min-convergence 40
+    python case_moderation.py reject --max-score -1 --dry-run
+    python case_moderation.py archive --min-age-days 60
+    python case_moderation.py approve CASE-10001 CASE-10002
+    python case_moderation.py archive --all
+"""
+import argparse
+import datetime
+import time
+from collections import Counter
+
+from case_archive import (
+    ARCHIVE_PATH,
+    LIBRARY_PATH,
+    parse_created,
+    read_archive,
+    write_archive,
+)
+from case_reader import write_lines_atomic
+from expert_engine import try_parse_case_record
+from file_lock import file_lock
+
+ACTIONS = ("approve", "reject", "archive")
+
+# Archive reason recorded for the actions that remove a case from the library
+ARCHIVE_REASONS = {"reject": "rejected", "archive": "moderated"}
+
+FILTER_KEYS = ("min_age_days", "max_age_days", "min_score", "max_score", "min_convergence", "max_convergence")
+
+
+# ======================================
+# 1. REVIEW QUEUE
+# ======================================
+
+def convergence_points(matching_cases):
+    """Convergence bonus for a feature set seen in `matching_cases` library cases (0-40)."""
+    if matching_cases >= 3:
+        return 40
+    if matching_cases == 2:
+        return 20
+    return 0
+
+
+def read_library(library_path=LIBRARY_PATH):
+    try:
+        with open(library_path, "r", encoding="utf-8") as f:
+            return f.readlines()
+    except FileNotFoundError:
+        return []
+
+
+def pending_cases(lines, today=None):
+    """
+    Parses the PENDING cases of a library with their review attributes.
+    Convergence is counted for all cases in one pass, not one library scan per case.
+
+    Returns:
+        list of dict: parsed case + "line_no", "age_days" (None if undated), "convergence"
+    """
+    today = today or datetime.date.today()
+    parsed = [(i, try_parse_case_record(line)) for i, line in enumerate(lines)]
+    parsed = [(i, case) for i, case in parsed if case is not None]
+    feature_counts = Counter(frozenset(case["features"]) for _, case in parsed)
+
+    queue = []
+    for i, case in parsed:
+        if case["status"] != "PENDING":
+            continue
+        created = parse_created(case["created"])
+        queue.append(dict(
+            case,
+            line_no=i,
+            age_days=(today - created).days if created else None,
+            convergence=convergence_points(feature_counts[frozenset(case["features"])]),
+        ))
+    return queue
+
+
+def matches_filters(case, min_age_days=None, max_age_days=None, min_score=None, max_score=None,
+                    min_convergence=None, max_convergence=None):
+    """True if a pending_cases() entry passes every given filter (None = no bound)."""
+    age = case["age_days"]
+    if min_age_days is not None and (age is None or age < min_age_days):
+        return False
+    if max_age_days is not None and (age is None or age > max_age_days):
+        return False
+    if min_score is not None and case["feedback"] < min_score:
+        return False
+    if max_score is not None and case["feedback"] > max_score:
+        return False
+    if min_convergence is not None and case["convergence"] < min_convergence:
+        return False
+    if max_convergence is not None and case["convergence"] > max_convergence:
+        return False
+    return True
+
+
+def select_cases(queue, case_ids=None, **filters):
+    """The queue entries that pass the filters (and are in case_ids, if given)."""
+    wanted = set(case_ids) if case_ids is not None else None
+    return [case for case in queue
+            if (wanted is None or case["id"] in wanted) and matches_filters(case, **filters)]
+
+
+def oldest_first(queue):
+    return sorted(queue, key=lambda case: (case["created"] or "", case["line_no"]))
+
+
+def review_queue(library_path=LIBRARY_PATH, case_ids=None, today=None, **filters):
+    """[REVIEW ENTRY POINT] Filtered PENDING cases of the live library, oldest first."""
+    return oldest_first(select_cases(pending_cases(read_library(library_path), today), case_ids, **filters))
+
+
+# ======================================
+# 2. BULK ACTIONS
+# ======================================
+
+def approve_line(line):
+    """A PENDING case line with its status set to VERIFIED."""
+    parts = [p.strip() for p in line.strip().split("|")]
+    parts[1] = "VERIFIED"
+    return " | ".join(parts) + "\n"
+
+
+def plan_moderation(lines, action, case_ids, today=None, **filters):
+    """
+    Applies one action to the selected PENDING cases of a library.
+
+    Returns:
+        tuple: (new_lines: list, archived: list of archive records, changed: list of case IDs)
+    """
+    if action not in ACTIONS:
+        raise ValueError(f"Unknown moderation action: {action}")
+
+    selected = select_cases(pending_cases(lines, today), case_ids, **filters)
+    targets = {case["line_no"]: case["id"] for case in selected}
+
+    new_lines, archived, changed = [], [], []
+    for i, line in enumerate(lines):
+        case_id = targets.get(i)
+        if case_id is None:
+            new_lines.append(line)
+            continue
+        changed.append(case_id)
+        if action == "approve":
+            new_lines.append(approve_line(line))
+        else:
+            archived.append({"id": case_id, "reason": ARCHIVE_REASONS[action], "line": line.rstrip("\n")})
+
+    if new_lines and not new_lines[-1].endswith("\n"):
+        new_lines[-1] += "\n"
+    return new_lines, archived, changed
+
+
+def moderate(action, case_ids=None, library_path=LIBRARY_PATH, archive_path=ARCHIVE_PATH,
+             dry_run=False, today=None, **filters):
+    """
+    [MODERATION ENTRY POINT]
+    Approves, rejects or archives every selected PENDING case in one transaction.
+
+    Args:
+        action: "approve", "reject" or "archive"
+        case_ids: Case IDs to act on, or None for every PENDING case passing the filters
+        filters: min/max_age_days, min/max_score, min/max_convergence
+
+    Returns:
+        dict: action, changed IDs, requested IDs that were skipped (not PENDING / not found),
+              archived records and elapsed seconds
+    """
+    start = time.perf_counter()
+    # Held from read to rewrite, so no write-behind flush lands in between
+    with file_lock(library_path):
+        lines = read_library(library_path)
+        new_lines, archived, changed = plan_moderation(lines, action, case_ids, today, **filters)
+
+        if changed and not dry_run:
+            stamp = datetime.datetime.now().isoformat(timespec="seconds")
+            for record in archived:
+                record["archived_at"] = stamp
+            # Archive first: a crash between the two writes duplicates, never loses, a case
+            if archived:
+                write_archive(read_archive(archive_path) + archived, archive_path)
+            write_lines_atomic(library_path, new_lines)
+
+    done = set(changed)
+    return {
+        "action": action,
+        "changed": changed,
+        "skipped": [case_id for case_id in (case_ids or []) if case_id not in done],
+        "archived": archived,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+# ======================================
+# 3. COMMAND LINE
+# ======================================
+
+def print_queue(queue, limit):
+    print(f"🗂️ {len(queue)} PENDING case(s) match")
+    if not queue:
+        return
+    print(f"{'case':<12} {'created':<10} {'age':>5} {'score':>5} {'conv':>4}  solution")
+    for case in queue[:limit or None]:
+        age = "-" if case["age_days"] is None else case["age_days"]
+        solution = case["solution"] if len(case["solution"]) <= 60 else case["solution"][:57] + "..."
+        print(f"{case['id']:<12} {case['created'] or '-':<10} {age:>5} {case['feedback']:>5} "
+              f"{case['convergence']:>4}  {solution}")
+    if limit and len(queue) > limit:
+        print(f"... {len(queue) - limit} more (use --limit 0 to show all)")
+
+
+def print_result(result, dry_run):
+    verb = {"approve": "Approved", "reject": "Rejected", "archive": "Archived"}[result["action"]]
+    prefix = "Would have " + verb.lower() if dry_run else verb
+    print(f"🛡️ {prefix} {len(result['changed'])} case(s) in {result['seconds']:.2f}s"
+          + (" (dry run)" if dry_run else ""))
+    if result["archived"] and not dry_run:
+        print(f"   Moved to the archive as '{result['archived'][0]['reason']}' "
+              f"(restore with: python case_archive.py restore <ID>)")
+    if result["skipped"]:
+        print(f"   Skipped {len(result['skipped'])} (not PENDING or not found): {', '.join(result['skipped'])}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk moderation of PENDING cases.")
+    parser.add_argument("--library", default=LIBRARY_PATH)
+    parser.add_argument("--archive", default=ARCHIVE_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name in ("list",) + ACTIONS:
+        p = sub.add_parser(name)
+        p.add_argument("case_ids", nargs="*")
+        p.add_argument("--min-age-days", type=int)
+        p.add_argument("--max-age-days", type=int)
+        p.add_argument("--min-score", type=int)
+        p.add_argument("--max-score", type=int)
+        p.add_argument("--min-convergence", type=int)
+        p.add_argument("--max-convergence", type=int)
+        if name == "list":
+            p.add_argument("--limit", type=int, default=50)
+        else:
+            p.add_argument("--all", action="store_true", help="act on every PENDING case passing the filters")
+            p.add_argument("--dry-run", action="store_true")
+
+    args = parser.parse_args(argv)
+    filters = {key: getattr(args, key) for key in FILTER_KEYS}
+    case_ids = args.case_ids or None
+
+    if args.command == "list":
+        print_queue(review_queue(args.library, case_ids, **filters), args.limit)
+        return 0
+
+    if case_ids is None and not args.all and all(value is None for value in filters.values()):
+        parser.error(f"{args.command} needs case IDs, a filter or --all")
+
+    result = moderate(args.command, case_ids, args.library, args.archive, dry_run=args.dry_run, **filters)
+    print_result(result, args.dry_run)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,302 @@
+"""
+[CASE-BASE CONDENSATION - Prototype Cases & Two-Level Retrieval]
+Many library entries are variations on the same few symptom patterns. This
+tool clusters the matchable cases by weighted-Jaccard distance (current
+FEATURE_WEIGHTS, no status/feedback modifiers), keeps one prototype feature
+set per cluster and answers CBR queries in two levels:
+
+1. score the query against the prototypes (one matrix product)
+2. score the distinct feature sets of the best clusters (one matrix product
+   per cluster), then rerun score_case on the few top candidates
+
+Clustering: identical feature sets are merged first; the distinct sets are
+then assigned, most frequent first, to the nearest prototype within
+`radius`, or become a new prototype (leader clustering).
+
+Weighted-Jaccard distance is a metric, so a cluster whose members lie within
+r of its prototype p cannot hold a case closer to the query q than
+d(q, p) - r. With the case's score ceiling (status / feedback) that bounds
+the best score a cluster can contribute:
+- probes=N  scans the N clusters with the highest bound (approximate)
+- probes=None scans clusters by bound until no remaining cluster can win (exact)
+
+Identical feature sets are stored (and scored) once, which is where both the
+memory saving and most of the speedup come from.
+
+Usage:
+    python case_prototypes.py                      # report: work, memory, agreement
+    python case_prototypes.py --radius 0.4 --queries 5000
+    python case_prototypes.py build -o case_prototypes.json
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+import numpy as np
+
+from expert_engine import FEATURE_WEIGHTS, case_score_ceiling, get_user_features, load_case_index, score_case
+from rbr_table import random_answers
+
+LIBRARY_PATH = "case_library.txt"
+PROTOTYPES_PATH = "case_prototypes.json"
+
+DEFAULT_RADIUS = 0.35   # Max weighted-Jaccard distance of a member to its prototype
+DEFAULT_PROBES = None    # Exact; N = scan only the N most promising clusters
+BOUND_SLACK = 1e-9      # Float rounding allowance when pruning on the score bound
+TIE_TOLERANCE = 1e-6    # Vectorized estimates this close to the best are rescored exactly
+
+
+def feature_weight(feature):
+    return FEATURE_WEIGHTS.get(feature.split(":")[0] if ":" in feature else feature, 1.0)
+
+
+# ======================================
+# 1. CLUSTERING
+# ======================================
+
+class PrototypeIndex:
+    """
+    Two-level CBR index over a case list (load_case_index / KnowledgeSnapshot.cases).
+
+    Level 1: prototypes (one per cluster). Level 2: the distinct feature sets of
+    the cluster, each represented by the member with the highest score ceiling
+    (earliest in the file on ties) - every other case with the same features
+    scores lower or equal and comes later, so it can never be the best match.
+    Level-2 scores are vectorized; the top candidates are rescored with
+    score_case, so the result is run_cbr_analysis' whenever the best case lies
+    in a scanned cluster (always, with probes=None).
+    """
+
+    def __init__(self, cases, radius=DEFAULT_RADIUS):
+        self.cases = cases
+        self.radius = radius
+
+        groups = {}
+        for index, case in enumerate(cases):
+            groups.setdefault(frozenset(case["features"]), []).append(index)
+        self.feature_sets = list(groups)
+        self.representatives = np.array(
+            [max(groups[key], key=lambda i: (case_score_ceiling(cases[i]), -i)) for key in self.feature_sets],
+            dtype=np.intp)
+        self.set_ceilings = np.array([case_score_ceiling(cases[i]) for i in self.representatives])
+        self.set_sizes = np.array([len(groups[key]) for key in self.feature_sets])
+
+        vocabulary = sorted({f for key in self.feature_sets for f in key})
+        self._column = {f: i for i, f in enumerate(vocabulary)}
+        self._weights = np.array([feature_weight(f) for f in vocabulary])
+        self._S = self._matrix(self.feature_sets)
+        self._S_totals = self._S @ self._weights
+
+        # Leader clustering of the distinct sets, most frequent pattern first
+        order = np.argsort(-self.set_sizes, kind="stable")
+        prototype_sets, members, radii = [], [], []
+        for u in order:
+            if prototype_sets:
+                P = self._S[prototype_sets]
+                distances = self._distances(P, self._S_totals[prototype_sets], self._S[u], self._S_totals[u])
+                nearest = int(np.argmin(distances))
+                if distances[nearest] <= radius:
+                    members[nearest].append(u)
+                    radii[nearest] = max(radii[nearest], float(distances[nearest]))
+                    continue
+            prototype_sets.append(u)
+            members.append([u])
+            radii.append(0.0)
+
+        self.prototype_sets = np.array(prototype_sets, dtype=np.intp)
+        self.members = [np.array(m, dtype=np.intp) for m in members]
+        self.radii = np.array(radii)
+        self.cluster_ceilings = np.array([self.set_ceilings[m].max() for m in self.members])
+        self._P = self._S[self.prototype_sets]
+        self._P_totals = self._S_totals[self.prototype_sets]
+
+    @property
+    def prototypes(self):
+        return [self.feature_sets[u] for u in self.prototype_sets]
+
+    def _matrix(self, feature_sets):
+        X = np.zeros((len(feature_sets), len(self._column)))
+        for row, features in enumerate(feature_sets):
+            X[row, [self._column[f] for f in features if f in self._column]] = 1.0
+        return X
+
+    def _similarities(self, M, M_totals, x, x_total):
+        inter = M @ (x * self._weights)
+        union = M_totals + x_total - inter
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(union > 0, inter / union, 0.0)
+
+    def _distances(self, P, P_totals, x, x_total):
+        return 1.0 - self._similarities(P, P_totals, x, x_total)
+
+    # ----------------------------------
+    # Two-level retrieval
+    # ----------------------------------
+
+    def query(self, user_features, probes=DEFAULT_PROBES):
+        """
+        Returns:
+            tuple: (best_match, score, work) - best_match/score as run_cbr_analysis,
+                   work = prototypes + feature sets + cases scored
+        """
+        x = self._matrix([[f for f in user_features if f in self._column]])[0]
+        # Features no case has still count in the query's union weight
+        x_total = x @ self._weights + sum(feature_weight(f) for f in user_features if f not in self._column)
+        distances = self._distances(self._P, self._P_totals, x, x_total)
+
+        # Upper bound of any member's score: its distance to the query is at least d(q, p) - r
+        bounds = (1.0 - np.maximum(distances - self.radii, 0.0)) * self.cluster_ceilings
+        order = np.argsort(-bounds, kind="stable")
+        if probes is not None:
+            order = order[:probes]
+
+        best_estimate, visited, estimates = 0.0, [], []
+        for cluster in order:
+            if probes is None and bounds[cluster] + BOUND_SLACK < best_estimate:
+                break
+            rows = self.members[cluster]
+            estimate = self._similarities(self._S[rows], self._S_totals[rows], x, x_total) * self.set_ceilings[rows]
+            visited.append(rows)
+            estimates.append(estimate)
+            best_estimate = max(best_estimate, float(estimate.max()))
+        work = len(self._P) + sum(len(rows) for rows in visited)
+        if best_estimate <= 0:
+            return None, 0.0, work
+
+        # Exact scores for everything within float noise of the best estimate
+        rows, estimate = np.concatenate(visited), np.concatenate(estimates)
+        best_match, max_score, best_index = None, 0.0, None
+        for index in sorted(int(i) for i in self.representatives[rows[estimate >= best_estimate - TIE_TOLERANCE]]):
+            work += 1
+            case = self.cases[index]
+            score, matched = score_case(user_features, case)
+            if score > max_score:  # File order: the first of equal scores wins, like run_cbr_analysis
+                max_score, best_index = score, index
+                best_match = {
+                    "id": case["id"],
+                    "solution": case["solution"],
+                    "matched_features": list(matched),
+                    "match_quality": "High" if score > 70 else "Medium" if score > 40 else "Low",
+                    "status": case["status"],
+                    "feedback": case["feedback"]
+                }
+        return best_match, max_score, work
+
+    def query_best(self, user_features):
+        """Exact query with run_cbr_analysis' return shape: (best_match, score)."""
+        return self.query(user_features, None)[:2]
+
+    def to_json(self):
+        return {
+            "radius": self.radius,
+            "prototypes": [{
+                "features": sorted(self.feature_sets[u]),
+                "radius": round(float(radius), 6),
+                "members": [self.cases[i]["id"] for s in members for i in [self.representatives[s]]],
+            } for u, radius, members in zip(self.prototype_sets, self.radii, self.members)],
+        }
+
+
+# ======================================
+# 2. REPORT
+# ======================================
+
+def _exhaustive(user_features, cases):
+    best_match, max_score = None, 0.0
+    for case in cases:
+        score, _ = score_case(user_features, case)
+        if score > max_score:
+            max_score, best_match = score, case
+    return (best_match["id"] if best_match else None), max_score
+
+
+def _set_bytes(feature_sets):
+    """Approximate bytes of the feature sets (set objects + distinct strings)."""
+    seen, total = set(), 0
+    for features in feature_sets:
+        if id(features) in seen:
+            continue
+        seen.add(id(features))
+        total += sys.getsizeof(features)
+    strings = {f for features in feature_sets for f in features}
+    return total + sum(sys.getsizeof(f) for f in strings)
+
+
+def query_sets(cases, queries, seed=0):
+    """Every distinct case pattern (leave-in) plus random wizard answer sheets."""
+    rng = random.Random(seed)
+    patterns = list({frozenset(c["features"]) for c in cases})
+    rng.shuffle(patterns)
+    sheets = [get_user_features(random_answers(rng)) for _ in range(queries)]
+    return [set(p) for p in patterns[:queries]] + sheets
+
+
+def report(cases, radius, queries, seed=0, probe_settings=(1, 2, 3, None)):
+    start = time.perf_counter()
+    index = PrototypeIndex(cases, radius)
+    build_seconds = time.perf_counter() - start
+
+    n = len(cases)
+    sizes = sorted((len(m) for m in index.members), reverse=True)
+    print(f"🧩 {n} cases -> {len(index.feature_sets)} distinct feature sets -> {len(index.prototypes)} prototypes "
+          f"(radius {radius}, built in {build_seconds:.2f}s)")
+    print(f"   largest clusters: {sizes[:8]}")
+
+    before = _set_bytes([c["features"] for c in cases])
+    after = _set_bytes(index.feature_sets)
+    print(f"   feature-set memory: {before / 1024:.0f} KiB -> {after / 1024:.0f} KiB shared "
+          f"({1 - after / before:.0%} saved)" if before else "   empty library")
+
+    workload = query_sets(cases, queries, seed)
+    expected, exhaustive_seconds = [], 0.0
+    for features in workload:
+        t = time.perf_counter()
+        expected.append(_exhaustive(features, cases))
+        exhaustive_seconds += time.perf_counter() - t
+
+    print(f"\n{len(workload)} queries (case patterns + random answer sheets), exhaustive: "
+          f"{n} cases scored, {exhaustive_seconds / len(workload) * 1000:.3f} ms per query")
+    print(f"{'probes':<8} {'scored/query':>13} {'work':>7} {'ms/query':>9} {'same best':>10} {'same score':>11}")
+    for probes in probe_settings:
+        scored, same_id, same_score, seconds = 0, 0, 0, 0.0
+        for features, (case_id, score) in zip(workload, expected):
+            t = time.perf_counter()
+            match, found_score, count = index.query(features, probes)
+            seconds += time.perf_counter() - t
+            scored += count
+            same_id += (match["id"] if match else None) == case_id
+            same_score += abs(found_score - score) <= 1e-9
+        q = len(workload)
+        label = "exact" if probes is None else str(probes)
+        print(f"{label:<8} {scored / q:>13.1f} {scored / q / max(n, 1):>7.1%} {seconds / q * 1000:>9.3f} "
+              f"{same_id / q:>10.1%} {same_score / q:>11.1%}")
+    print("(scored/query = prototypes + distinct feature sets + cases rescored)")
+    return index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Condense the case base into prototypes for two-level retrieval")
+    parser.add_argument("command", nargs="?", choices=["report", "build"], default="report")
+    parser.add_argument("--library", default=LIBRARY_PATH)
+    parser.add_argument("--radius", type=float, default=DEFAULT_RADIUS)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default=PROTOTYPES_PATH)
+    args = parser.parse_args(argv)
+
+    cases = load_case_index(args.library)
+    if args.command == "report":
+        report(cases, args.radius, args.queries, args.seed)
+        return 0
+
+    index = PrototypeIndex(cases, args.radius)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(index.to_json(), f, indent=1)
+    print(f"💾 {len(index.prototypes)} prototypes for {len(cases)} cases -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
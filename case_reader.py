@@ -0,0 +1,244 @@
+"""
+[CASE LIBRARY READER - Streaming mmap Access]
+Reads case_library.txt through a read-only memory map. Lines are yielded as
+byte offsets and only decoded into strings when a caller needs them, so
+scanning a multi-GB library keeps memory flat: the OS pages the file in and
+out, and only candidate cases are ever copied into Python objects.
+
+Line format (see expert_engine.parse_case_record):
+    CASE-ID | STATUS | features... | Solution [| feedback_score [| created]]
+    CASE-ID | features... | Solution                     (legacy)
+"""
+import contextlib
+import heapq
+import mmap
+import os
+import re
+import tempfile
+
+COPY_CHUNK = 1 << 20  # Bytes copied per write when splicing a library
+
+# A non-blank line: leading blanks skipped, CR of a CRLF ending excluded
+_LINE = re.compile(rb"^[ \t]*(\S[^\n]*?)\r?$", re.MULTILINE)
+
+
+@contextlib.contextmanager
+def open_library_with_stat(path):
+    """
+    (map, os.stat_result) of the library. The stat belongs to the mapped file
+    itself, so its identity (st_dev, st_ino) cannot race with a rename.
+    The map is None if the file is missing or empty, the stat None if it is missing.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        yield None, None
+        return
+    with f:
+        stat = os.fstat(f.fileno())
+        if stat.st_size == 0:
+            yield None, stat  # mmap cannot map an empty file
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm, stat
+
+
+@contextlib.contextmanager
+def open_library(path):
+    """Read-only memory map of the library, or None if it is missing or empty."""
+    with open_library_with_stat(path) as (mm, _):
+        yield mm
+
+
+class LazyCase:
+    """One library line as byte offsets into the map; fields are located and decoded on demand."""
+    __slots__ = ("mm", "start", "end", "next_offset", "_bars")
+
+    def __init__(self, mm, start, end, next_offset):
+        self.mm = mm
+        self.start = start            # First byte of the line
+        self.end = end                # End of the content, line terminator excluded
+        self.next_offset = next_offset  # First byte after the line terminator
+        self._bars = None
+
+    def _field_bounds(self):
+        if self._bars is None:
+            bars, pos = [], self.mm.find(b"|", self.start, self.end)
+            while pos != -1:
+                bars.append(pos)
+                pos = self.mm.find(b"|", pos + 1, self.end)
+            self._bars = bars
+        return self._bars
+
+    def field_count(self):
+        return len(self._field_bounds()) + 1
+
+    def field_span(self, index):
+        bars = self._field_bounds()
+        start = self.start if index == 0 else bars[index - 1] + 1
+        end = bars[index] if index < len(bars) else self.end
+        return start, end
+
+    def field(self, index):
+        start, end = self.field_span(index)
+        return self.mm[start:end].decode("utf-8").strip()
+
+    def features_span(self):
+        """Byte span of the feature list (third field, second in the legacy format)."""
+        return self.field_span(2 if self.field_count() >= 4 else 1)
+
+    def features_contain(self, needles, require_all=False):
+        """
+        Byte-level prefilter: does the feature field contain any (or all) of the needles?
+        A substring hit may be a false positive, never a false negative.
+        """
+        if require_all and not all(self.mm.find(needle, self.start, self.end) != -1 for needle in needles):
+            return False  # Cheap whole-line check before the fields are located
+        start, end = self.features_span()
+        hits = (self.mm.find(needle, start, end) != -1 for needle in needles)
+        return all(hits) if require_all else any(hits)
+
+    def startswith(self, prefix):
+        return self.mm[self.start:self.start + len(prefix)] == prefix
+
+    def text(self):
+        return self.mm[self.start:self.end].decode("utf-8")
+
+
+def _lazy_case(mm, start, end):
+    newline = mm.find(b"\n", end)
+    return LazyCase(mm, start, end, len(mm) if newline == -1 else newline + 1)
+
+
+def iter_cases(mm, start=0):
+    """
+    Yields a LazyCase for every non-blank line from byte offset `start`
+    (which must be a line start). A final line without a terminator is yielded as well.
+    """
+    if mm is None:
+        return
+    for match in _LINE.finditer(mm, start):
+        yield _lazy_case(mm, match.start(), match.end(1))
+
+
+def _hit_lines(mm, needle, start):
+    """Start offsets of the lines containing `needle`, ascending, one per line."""
+    pos = start
+    while True:
+        hit = mm.find(needle, pos)
+        if hit == -1:
+            return
+        yield max(mm.rfind(b"\n", start, hit) + 1, start)
+        newline = mm.find(b"\n", hit)
+        if newline == -1:
+            return
+        pos = newline + 1
+
+
+def iter_cases_containing(mm, needles, start=0):
+    """
+    Yields (once, in file order) every non-blank line holding at least one of the
+    needles. The map is searched for each needle directly (mmap.find) and the hit
+    streams are merged, so lines without a hit cost nothing in Python.
+    """
+    if mm is None or not needles:
+        return
+    previous = None
+    for line_start in heapq.merge(*(_hit_lines(mm, needle, start) for needle in set(needles))):
+        if line_start == previous:
+            continue
+        previous = line_start
+        match = _LINE.match(mm, line_start)
+        yield _lazy_case(mm, match.start(), match.end(1))
+
+
+def feature_needles(features):
+    return [feature.encode("utf-8") for feature in features]
+
+
+@contextlib.contextmanager
+def atomic_writer(path, mode="wb", encoding=None):
+    """
+    File object that replaces `path` crash-safely: the block writes a temp file
+    in the same directory, which is fsynced and renamed over `path` when the
+    block exits cleanly and removed if it raises. Readers see the old or the
+    new file, never a mix. Every rewrite in the repo goes through here.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", dir=directory)
+    try:
+        with os.fdopen(fd, mode, encoding=encoding) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
+
+
+def write_lines_atomic(path, lines):
+    """Replaces a text file with `lines` through atomic_writer."""
+    with atomic_writer(path, "w", encoding="utf-8") as f:
+        f.writelines(lines)
+
+
+def splice_many(path, edits, tail=b""):
+    """
+    Replaces several byte spans of the library and appends `tail`, in one
+    crash-safe rewrite (atomic_writer). The unchanged bytes between the spans
+    are copied in fixed-size chunks straight from the map.
+
+    Args:
+        edits: (start, end, replacement, expected) tuples, non-overlapping;
+               `expected` is the bytes the caller read at [start:end) or None.
+               The rewrite is refused (ValueError) if the library changed in between
+        tail: Bytes appended after the last line (a missing terminator is added first)
+    """
+    # The map is closed before the writer renames (required on Windows)
+    with atomic_writer(path) as out, open_library(path) as mm:
+        if mm is None:
+            if edits:
+                raise ValueError(f"{path} changed while it was being updated")
+            out.write(tail)
+            return
+        position = 0
+        for start, end, replacement, expected in sorted(edits, key=lambda edit: edit[0]):
+            if start < position or (expected is not None and mm[start:end] != expected):
+                raise ValueError(f"{path} changed while it was being updated")
+            _copy_range(mm, out, position, start)
+            out.write(replacement)
+            position = end
+        _copy_range(mm, out, position, len(mm))
+        if tail:
+            if mm[len(mm) - 1:] != b"\n":
+                out.write(b"\n")
+            out.write(tail)
+
+
+def _copy_range(mm, out, start, end):
+    for chunk_start in range(start, end, COPY_CHUNK):
+        out.write(mm[chunk_start:min(chunk_start + COPY_CHUNK, end)])
+
+
+def splice_atomic(path, start, end, replacement, expected=None):
+    """Replaces bytes [start:end) of the library with `replacement` (splice_many with one edit)."""
+    splice_many(path, [(start, end, replacement, expected)])
+
+
+def append_lines(path, lines):
+    """
+    Appends complete lines in place (one write + fsync). The file keeps its
+    identity, so incremental readers only parse the new tail. A missing final
+    line terminator is added first so the new lines never merge into the last case.
+    """
+    data = "".join(lines).encode("utf-8")
+    with open(path, "a+b") as f:
+        if f.seek(0, os.SEEK_END) > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                data = b"\n" + data
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
@@ -0,0 +1,305 @@
+"""
+[DIAGNOSIS EVENT LOG - Buffered JSONL with Rotation]
+Records every completed diagnosis as one JSON line: features, asserted
+facts, ranked RBR diagnoses, the CBR match, the verdict and stage timings.
+
+- emit() only appends to an in-memory queue; a background thread serializes
+  and writes in batches (`max_batch` events or `max_delay` seconds), so a
+  diagnosis never waits on disk I/O
+- A full queue drops events (counted) instead of blocking the UI
+- When the active file reaches `max_bytes` it is renamed to a timestamped
+  segment and gzipped; only the newest `keep_segments` segments are kept
+- Every Streamlit process writes the same file: each batch is appended and
+  rotated under file_lock(path), and a writer whose file was rotated away by
+  another process reopens the new active file before appending
+- Pending events are written on interpreter shutdown (atexit)
+
+Configuration (environment):
+    EXPERT_DIAGNOSIS_LOG             active log file (default logs/diagnoses.jsonl, empty = disabled)
+    EXPERT_DIAGNOSIS_LOG_MAX_MB      rotation size (default 10)
+    EXPERT_DIAGNOSIS_LOG_SEGMENTS    gzipped segments kept (default 20)
+"""
+import atexit
+import glob
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from case_reader import atomic_writer
+from expert_engine import answer_symptoms
+from file_lock import file_lock
+from metrics import REGISTRY
+
+LOG_PATH = os.path.join("logs", "diagnoses.jsonl")
+MAX_BYTES = 10 * 1024 * 1024
+KEEP_SEGMENTS = 20
+MAX_QUEUE = 10000
+
+
+class DiagnosisEventLog:
+    """Process-wide, non-blocking JSONL writer with size-based rotation."""
+
+    def __init__(self, path=LOG_PATH, max_bytes=MAX_BYTES, keep_segments=KEEP_SEGMENTS,
+                 max_queue=MAX_QUEUE, max_batch=200, max_delay=1.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.keep_segments = keep_segments
+        self.max_queue = max_queue
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._write_lock = threading.Lock()  # One writer (worker, flush, close) at a time
+        self._queue = deque()
+        self._first_pending = None
+        self._stopped = False
+        self._file = None
+
+        self.stats = {"written": 0, "dropped": 0, "rotations": 0, "errors": 0}
+        REGISTRY.gauge("expert_event_log_pending", "Diagnosis events waiting to be written",
+                       callback=lambda: {(): len(self._queue)})
+        REGISTRY.gauge("expert_event_log", "Diagnosis event log totals (written, dropped, rotations, errors)",
+                       ["kind"], callback=lambda: {(kind,): count for kind, count in self.stats.items()})
+
+        self._worker = threading.Thread(target=self._run, name="diagnosis-log", daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    # ----------------------------------
+    # Producer side (UI thread)
+    # ----------------------------------
+
+    def emit(self, event):
+        """Queues one event. Returns False if it was dropped (queue full or log closed)."""
+        with self._lock:
+            if self._stopped or len(self._queue) >= self.max_queue:
+                self.stats["dropped"] += 1
+                return False
+            self._queue.append(event)
+            if self._first_pending is None:
+                self._first_pending = time.monotonic()
+            if len(self._queue) >= self.max_batch:
+                self._wakeup.notify()
+        return True
+
+    # ----------------------------------
+    # Consumer side (worker thread)
+    # ----------------------------------
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._stopped:
+                    count = len(self._queue)
+                    if count >= self.max_batch:
+                        break
+                    if count and time.monotonic() - self._first_pending >= self.max_delay:
+                        break
+                    timeout = self.max_delay - (time.monotonic() - self._first_pending) if count else None
+                    self._wakeup.wait(timeout)
+                if self._stopped:
+                    return
+            self.flush()
+
+    def flush(self):
+        """
+        Writes every queued event, rotating whenever the active file reaches max_bytes.
+
+        Returns:
+            int: Number of events written
+        """
+        with self._write_lock:
+            with self._lock:
+                events, self._queue, self._first_pending = self._queue, deque(), None
+            if not events:
+                return 0
+
+            try:
+                self._write(events)
+            except Exception as e:
+                print(f"Error writing diagnosis events: {e}")
+                with self._lock:
+                    self.stats["errors"] += 1
+                    self.stats["dropped"] += len(events)
+                return 0
+
+            with self._lock:
+                self.stats["written"] += len(events)
+            return len(events)
+
+    def _write(self, events):
+        # Caller holds the write lock. ASCII JSON, so characters == bytes
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with file_lock(self.path):
+            self._reopen_if_rotated()
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            size, chunk = os.fstat(self._file.fileno()).st_size, []
+            for event in events:
+                line = json.dumps(event, separators=(",", ":"), default=str) + "\n"
+                chunk.append(line)
+                size += len(line)
+                if size >= self.max_bytes:
+                    self._file.write("".join(chunk))
+                    self._rotate()
+                    self._file = open(self.path, "a", encoding="utf-8")
+                    size, chunk = 0, []
+            self._file.write("".join(chunk))
+            self._file.flush()
+
+    def _reopen_if_rotated(self):
+        # Caller holds the file lock. Another process may have renamed our file to a segment
+        if self._file is None:
+            return
+        opened = os.fstat(self._file.fileno())
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            current = None
+        if current is None or (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino):
+            self._file.close()
+            self._file = None
+
+    def _rotate(self):
+        # Caller holds the write lock and the file lock
+        self._file.close()
+        self._file = None
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        segment = f"{_stem(self.path)}.{stamp}.jsonl"
+        os.replace(self.path, segment)
+        _gzip_segment(segment)
+        for old in segment_paths(self.path)[:-self.keep_segments or None]:
+            os.remove(old)
+        with self._lock:
+            self.stats["rotations"] += 1
+
+    def close(self):
+        """Stops the worker and writes everything still queued (flush-on-shutdown)."""
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._wakeup.notify_all()
+        self._worker.join(timeout=5)
+        self.flush()
+        with self._write_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+# ======================================
+# SEGMENTS
+# ======================================
+
+def _stem(path):
+    return path[:-len(".jsonl")] if path.endswith(".jsonl") else path
+
+
+def _gzip_segment(segment):
+    """segment -> segment.gz (atomic_writer), then removes the plain segment."""
+    with open(segment, "rb") as src, atomic_writer(f"{segment}.gz") as raw, \
+            gzip.GzipFile(fileobj=raw, mode="wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(segment)
+
+
+def segment_paths(path=LOG_PATH):
+    """Rotated segments of a log, oldest first (the timestamps sort chronologically)."""
+    return sorted(glob.glob(f"{glob.escape(_stem(path))}.*.jsonl.gz"))
+
+
+def log_files(path=LOG_PATH):
+    """Every file of a log in write order: gzipped segments, then the active file."""
+    return segment_paths(path) + ([path] if os.path.exists(path) else [])
+
+
+def iter_events(path=LOG_PATH):
+    """Yields the logged events, oldest first; a torn last line (crash mid-write) is skipped."""
+    for file_path in log_files(path):
+        opener = gzip.open if file_path.endswith(".gz") else open
+        with opener(file_path, "rt", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def compress_leftover_segments(path=LOG_PATH):
+    """Gzips plain segments left behind by a crash between rename and gzip."""
+    if not os.path.isdir(os.path.dirname(path) or "."):
+        return
+    with file_lock(path):  # Not a segment another process is still gzipping
+        for segment in glob.glob(f"{glob.escape(_stem(path))}.*.jsonl"):
+            _gzip_segment(segment)
+
+
+# ======================================
+# EVENTS
+# ======================================
+
+def asserted_facts(answers):
+    """[symptom, value, cf] of every fact the answers assert (expert_engine.answer_symptoms)."""
+    return [list(symptom) for symptom in answer_symptoms(answers)]
+
+
+def diagnosis_event(answers, bundle, timings, rules_version=None, cases_version=None):
+    """
+    One diagnosis as a JSON-ready dict.
+
+    Args:
+        answers: the session's answers dict (symptom -> answer code)
+        bundle: get_diagnosis_bundle() result
+        timings: stage -> seconds (stages that were served from the session cache are absent)
+    """
+    rbr_result, cbr_result = bundle["rbr_result"], bundle["cbr_result"]
+    resolution = bundle["resolution"]
+    return {
+        "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+        "rules_version": rules_version,
+        "cases_version": cases_version,
+        "features": sorted(bundle["user_features"]),
+        "facts": asserted_facts(answers),
+        "rbr": [{"fault": str(d["fault"]), "category": str(d["category"]), "cf": float(d["cf"])}
+                for d in ([rbr_result] if rbr_result else []) + list(bundle["rbr_alternatives"])],
+        "cbr": {
+            "case_id": cbr_result["id"],
+            "status": cbr_result["status"],
+            "score": round(bundle["cbr_score"], 4),
+        } if cbr_result else None,
+        "resolution": {
+            "primary": resolution["primary"],
+            "conflict": bool(resolution.get("requires_comparison", False)),
+            "confidence": round(float(resolution["confidence"]), 4),
+            "partial": resolution.get("partial", []),
+        },
+        "timings_ms": {stage: round(seconds * 1000, 3) for stage, seconds in timings.items()},
+    }
+
+
+_log = None
+_log_lock = threading.Lock()
+
+
+def get_event_log():
+    """Process-wide event log shared by all Streamlit sessions, or None if disabled."""
+    global _log
+    with _log_lock:
+        if _log is None:
+            path = os.environ.get("EXPERT_DIAGNOSIS_LOG", LOG_PATH)
+            if not path:
+                return None
+            compress_leftover_segments(path)
+            _log = DiagnosisEventLog(
+                path,
+                max_bytes=int(float(os.environ.get("EXPERT_DIAGNOSIS_LOG_MAX_MB", "10")) * 1024 * 1024),
+                keep_segments=int(os.environ.get("EXPERT_DIAGNOSIS_LOG_SEGMENTS", str(KEEP_SEGMENTS))),
+            )
+        return _log
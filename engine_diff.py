@@ -0,0 +1,316 @@
+"""
+[DIFFERENTIAL EQUIVALENCE HARNESS - Reference vs Optimized Engines]
+Replays wizard answer sheets through the reference pipeline and through every
+alternate engine mode, and diffs what the user would see:
+- ranked RBR diagnoses (ties in CF compared as a set) and triggered symptoms
+- best-case ID and similarity score (within a tolerance)
+- the resolve_conflict verdict (primary engine, recommendation, confidence)
+
+Reference pipeline: CLIPS over rules.clp (run_rbr_analysis) + run_cbr_analysis
+over the in-memory case index + resolve_conflict, exactly as step 6 runs it.
+
+Alternate modes swap one engine at a time:
+    rbr-table          precomputed lookup table (rbr_table.py), CLIPS on a miss
+    compiled-rules     CLIPS over rules_compiled.clp (rule_compiler.py)
+    mmap-cbr           CBR streamed from the memory-mapped library (candidate cases only)
+    incremental-index  CBR over the knowledge base's incremental case index
+    anytime            anytime engines (priority-ordered CBR, sliced CLIPS) with no deadline hit
+    prototypes         CBR through the exact two-level prototype index (case_prototypes.py)
+
+Answer sheets: every single answer on its own, then random (partial) sheets.
+
+Usage:
+    python engine_diff.py                          # all modes, 2000 random sheets
+    python engine_diff.py --modes rbr-table --samples 20000
+"""
+import argparse
+import math
+import os
+import random
+import time
+
+import clips
+
+from expert_engine import (
+    IncrementalCaseIndex,
+    get_user_features,
+    iter_candidate_records,
+    load_case_index,
+    prioritize_cases,
+    resolve_conflict,
+    run_cbr_analysis,
+    run_cbr_analysis_anytime,
+    run_rbr_analysis,
+    run_rbr_analysis_anytime,
+)
+from case_prototypes import PrototypeIndex
+from questions import QUESTIONS, answer_label, record_answer
+from rbr_table import TABLE_PATH, RbrLookup, file_sha256, random_answers
+from rule_compiler import COMPILED_RULES_PATH
+
+RULES_PATH = "rules.clp"
+LIBRARY_PATH = "case_library.txt"
+
+SCORE_TOLERANCE = 1e-6  # CBR score / verdict confidence points
+
+
+# ======================================
+# 1. ENGINES
+# ======================================
+
+def _clips_engine(rules_path):
+    env = clips.Environment()
+    env.load(rules_path)
+    return lambda answers: run_rbr_analysis(env, answers)
+
+
+def _table_engine(config):
+    lookup = RbrLookup.load(config.table, file_sha256(config.rules))
+    if lookup is None:
+        raise FileNotFoundError(f"no {config.table} matching {config.rules} (run: python rbr_table.py build)")
+    fallback = _clips_engine(config.rules)
+
+    def rbr(answers):
+        hit = lookup.lookup(answers)
+        return hit if hit is not None else fallback(answers)
+    return rbr
+
+
+def _index_engine(cases):
+    return lambda features: run_cbr_analysis(features, cases)
+
+
+def _anytime_rbr_engine(config):
+    env = clips.Environment()
+    env.load(config.rules)
+    return lambda answers: run_rbr_analysis_anytime(env, answers, math.inf)[:2]
+
+
+def _anytime_cbr_engine(config):
+    cases = load_case_index(config.library)
+    priority = prioritize_cases(cases)
+    return lambda features: run_cbr_analysis_anytime(features, cases, priority, math.inf)[:2]
+
+
+RBR_ENGINES = {
+    "clips": lambda config: _clips_engine(config.rules),
+    "compiled": lambda config: _clips_engine(config.compiled),
+    "table": _table_engine,
+    "anytime": _anytime_rbr_engine,
+}
+
+CBR_ENGINES = {
+    "index": lambda config: _index_engine(load_case_index(config.library)),
+    "stream": lambda config: lambda features: run_cbr_analysis(
+        features, iter_candidate_records(features, config.library)),
+    "incremental": lambda config: _index_engine(IncrementalCaseIndex(config.library).cases),
+    "anytime": _anytime_cbr_engine,
+    "prototypes": lambda config: PrototypeIndex(load_case_index(config.library)).query_best,
+}
+
+REFERENCE = ("clips", "index")
+
+# mode -> (RBR engine, CBR engine)
+MODES = {
+    "rbr-table": ("table", "index"),
+    "compiled-rules": ("compiled", "index"),
+    "mmap-cbr": ("clips", "stream"),
+    "incremental-index": ("clips", "incremental"),
+    "anytime": ("anytime", "anytime"),
+    "prototypes": ("clips", "prototypes"),
+}
+
+
+def diagnose(rbr, cbr, answers):
+    """
+    Step 6 for one answer sheet with the given engines.
+
+    Returns:
+        tuple: (outcome: dict, rbr seconds, cbr + resolve seconds)
+    """
+    start = time.perf_counter()
+    diagnoses, triggered = rbr(answers)
+    rbr_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cbr_result, cbr_score = cbr(get_user_features(answers))
+    rbr_result = diagnoses[0] if diagnoses else None
+    resolution = resolve_conflict(rbr_result, rbr_result["cf"] if rbr_result else 0, cbr_result, cbr_score)
+    cbr_seconds = time.perf_counter() - start
+
+    outcome = {
+        "diagnoses": diagnoses,
+        "triggered": triggered,
+        "case_id": cbr_result["id"] if cbr_result else None,
+        "score": cbr_score,
+        "resolution": resolution,
+    }
+    return outcome, rbr_seconds, cbr_seconds
+
+
+# ======================================
+# 2. DIFFING
+# ======================================
+
+def _plain(value):
+    """CLIPS symbols/numbers -> comparable Python values (floats rounded like rule_compiler)."""
+    return round(float(value), 9) if isinstance(value, (int, float)) else str(value)
+
+
+def ranked_diagnoses(diagnoses):
+    """Diagnoses in CF order; the order among equal CFs is not part of the contract."""
+    rows = [tuple(sorted((k, _plain(v)) for k, v in d.items())) for d in diagnoses]
+    return sorted(rows, key=lambda row: (-dict(row)["cf"], row))
+
+
+def compare(reference, candidate, tolerance=SCORE_TOLERANCE):
+    """Names of the outcome parts that differ (empty list = equivalent)."""
+    differences = []
+    if ranked_diagnoses(reference["diagnoses"]) != ranked_diagnoses(candidate["diagnoses"]):
+        differences.append("diagnoses")
+    if ranked_diagnoses(reference["triggered"]) != ranked_diagnoses(candidate["triggered"]):
+        differences.append("triggered")
+    if reference["case_id"] != candidate["case_id"]:
+        differences.append("best_case")
+    if abs(reference["score"] - candidate["score"]) > tolerance:
+        differences.append("score")
+
+    expected, actual = reference["resolution"], candidate["resolution"]
+    if (expected["primary"] != actual["primary"]
+            or expected["recommendation"] != actual["recommendation"]
+            or expected.get("alternative_solution") != actual.get("alternative_solution")
+            or abs(expected["confidence"] - actual["confidence"]) > tolerance):
+        differences.append("verdict")
+    return differences
+
+
+def answer_sheets(samples, seed=0):
+    """Every single answer alone (each rule input in isolation), then random partial sheets."""
+    sheets = []
+    for question in QUESTIONS.values():
+        for label in question["mapping"]:
+            answers = {}
+            record_answer(answers, question, label)
+            sheets.append(answers)
+    rng = random.Random(seed)
+    sheets.extend(random_answers(rng) for _ in range(samples))
+    return sheets
+
+
+def run_diff(config, modes, sheets):
+    """
+    Returns:
+        list of dict: one report per mode {"mode", "engines", "skipped", "checked",
+                      "differences": {part: count}, "examples", "seconds": {...}}
+    """
+    rbr_ref, cbr_ref = RBR_ENGINES[REFERENCE[0]](config), CBR_ENGINES[REFERENCE[1]](config)
+    reference, ref_rbr_seconds, ref_cbr_seconds = [], 0.0, 0.0
+    for answers in sheets:
+        outcome, rbr_seconds, cbr_seconds = diagnose(rbr_ref, cbr_ref, answers)
+        reference.append(outcome)
+        ref_rbr_seconds += rbr_seconds
+        ref_cbr_seconds += cbr_seconds
+
+    reports = []
+    for mode in modes:
+        rbr_name, cbr_name = MODES[mode]
+        report = {"mode": mode, "engines": (rbr_name, cbr_name), "skipped": None, "checked": 0,
+                  "differences": {}, "examples": []}
+        reports.append(report)
+        try:
+            rbr = RBR_ENGINES[rbr_name](config)
+            cbr = CBR_ENGINES[cbr_name](config)
+        except (OSError, clips.CLIPSError) as e:
+            report["skipped"] = str(e)
+            continue
+
+        rbr_total, cbr_total = 0.0, 0.0
+        for answers, expected in zip(sheets, reference):
+            outcome, rbr_seconds, cbr_seconds = diagnose(rbr, cbr, answers)
+            rbr_total += rbr_seconds
+            cbr_total += cbr_seconds
+            differences = compare(expected, outcome, config.tolerance)
+            for part in differences:
+                report["differences"][part] = report["differences"].get(part, 0) + 1
+            if differences and len(report["examples"]) < 5:
+                report["examples"].append((answers, differences, expected, outcome))
+        report["checked"] = len(sheets)
+        report["seconds"] = {"rbr": (ref_rbr_seconds, rbr_total), "cbr": (ref_cbr_seconds, cbr_total)}
+    return reports
+
+
+# ======================================
+# 3. COMMAND LINE
+# ======================================
+
+def _speedup(reference, alternate):
+    return f"{reference / alternate:.1f}x" if alternate > 0 else "-"
+
+
+def _faults(outcome):
+    return [(str(d["fault"]), round(float(d["cf"]), 3)) for d in outcome["diagnoses"]]
+
+
+def print_report(report):
+    rbr_name, cbr_name = report["engines"]
+    print(f"\n=== {report['mode']} (RBR: {rbr_name}, CBR: {cbr_name}) ===")
+    if report["skipped"]:
+        print(f"   ⚠️ skipped: {report['skipped']}")
+        return
+
+    checked = report["checked"]
+    print(f"{'stage':<6} {'reference ms':>13} {'alternate ms':>13} {'speedup':>8}   (per sheet)")
+    totals = [0.0, 0.0]
+    for stage, (reference, alternate) in report["seconds"].items():
+        totals[0] += reference
+        totals[1] += alternate
+        print(f"{stage:<6} {reference / checked * 1000:>13.3f} {alternate / checked * 1000:>13.3f} "
+              f"{_speedup(reference, alternate):>8}")
+    print(f"{'total':<6} {totals[0] / checked * 1000:>13.3f} {totals[1] / checked * 1000:>13.3f} "
+          f"{_speedup(*totals):>8}")
+
+    if not report["differences"]:
+        print(f"✅ Equivalent on {checked} answer sheets")
+        return
+    mismatched = ", ".join(f"{part} {count}" for part, count in report["differences"].items())
+    print(f"❌ Mismatches on {checked} answer sheets: {mismatched}")
+    for answers, differences, expected, actual in report["examples"]:
+        sheet = {name: answer_label(name, code) for name, code in answers.items()}
+        print(f"   {', '.join(differences)} | {sheet}")
+        if "diagnoses" in differences:
+            print(f"     diagnoses: {_faults(expected)} -> {_faults(actual)}")
+        if "best_case" in differences or "score" in differences:
+            print(f"     best case: {expected['case_id']} ({expected['score']:.2f}) -> "
+                  f"{actual['case_id']} ({actual['score']:.2f})")
+        if "verdict" in differences:
+            before, after = expected["resolution"], actual["resolution"]
+            print(f"     verdict: {before['primary']} ({before['confidence']:.1f}) -> "
+                  f"{after['primary']} ({after['confidence']:.1f})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Diff optimized engine modes against the reference pipeline")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--samples", type=int, default=2000, help="Random answer sheets (after the single answers)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tolerance", type=float, default=SCORE_TOLERANCE)
+    parser.add_argument("--rules", default=RULES_PATH)
+    parser.add_argument("--compiled", default=COMPILED_RULES_PATH)
+    parser.add_argument("--table", default=TABLE_PATH)
+    parser.add_argument("--library", default=LIBRARY_PATH)
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.library):
+        parser.error(f"{args.library} not found")
+    sheets = answer_sheets(args.samples, args.seed)
+    print(f"🔬 Replaying {len(sheets)} answer sheets through the reference pipeline "
+          f"(RBR: {REFERENCE[0]}, CBR: {REFERENCE[1]})")
+
+    reports = run_diff(args, args.modes, sheets)
+    for report in reports:
+        print_report(report)
+    return 1 if any(report["differences"] for report in reports) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,971 @@
+"""
+[HYBRID EXPERT SYSTEM - ENGINE]
+Reasoning code shared by the Streamlit UI (streamlit_app.py) and the offline
+maintenance tools: CBR retrieval, meta-reasoning, NLP endorsement, the learning
+and feedback system, and the CLIPS fact helper.
+"""
+import array
+import bisect
+import time
+
+import clips
+
+from case_reader import (
+    append_lines,
+    feature_needles,
+    iter_cases,
+    iter_cases_containing,
+    open_library,
+    open_library_with_stat,
+    splice_atomic,
+)
+from file_lock import file_lock
+from metrics import PROMOTIONS
+from questions import resolve_answer
+from similarity_backends import endorsement_points, load_backend
+
+# NLP for Semantic Similarity
+# Backend chosen by EXPERT_SIMILARITY_BACKEND (similarity_backends.py); by default the
+# memory-mapped vector export, then the in-process Spacy model
+similarity_backend = load_backend()
+NLP_AVAILABLE = similarity_backend is not None
+NLP_BACKEND = similarity_backend.description if NLP_AVAILABLE else None
+
+# ======================================
+# 0. KNOWLEDGE CONFIGURATION
+# ======================================
+
+# Feature Weights for Weighted CBR Algorithm
+# Higher weight = More diagnostic significance
+FEATURE_WEIGHTS = {
+    # Hardware Direct Evidence - Highest Priority
+    "error-message": 3.0,
+    "beep-code": 3.0,
+    "beep-duration": 3.0,
+    "screen-visuals": 2.5,
+    
+    # System Behavior - High Priority
+    "system-state": 2.0,
+    "cpu-temp": 2.0,
+    "temp-pattern": 2.0,
+    "power-lights": 2.0,
+    "fan-status": 2.0,
+    "boot-warning": 2.0,
+    "hdd-status": 2.0,
+    
+    # Software/Indirect Evidence - Medium Priority
+    "sound-quality": 1.5,
+    "sound-output": 1.5,
+    "volume-bar": 1.5,
+    "volume-behavior": 1.5,
+    "sound-card-status": 1.5,
+    "system-behavior": 1.5,
+    
+    # Environmental Factors - Lower Priority
+    "device-age": 0.8,
+    "system-age": 0.8,
+}
+
+# Anytime (latency-budgeted) diagnosis: work done between two clock reads
+CBR_DEADLINE_CHECK = 64    # Cases scored
+RBR_FIRING_SLICE = 8       # Rule firings
+
+# Answers at or below this confidence assert no fact and add no CBR feature
+MIN_SYMPTOM_CF = 0.2
+
+# ======================================
+# 1. CBR ENGINE (PYTHON / MEMORY)
+# ======================================
+
+def answer_symptoms(user_answers):
+    """
+    The (name, value, cf) symptoms the answers assert. The single source of the
+    fact shape and the confidence cut-off: the RBR engine asserts these, the CBR
+    features are derived from them, and the diagnosis log records them for replay.
+    
+    Returns:
+        list of (symptom name, CLIPS value, cf), in answer order
+    """
+    symptoms = []
+    for key, answer_code in user_answers.items():
+        outcome = resolve_answer(key, answer_code)
+        # Ignore low confidence answers to prevent bad logic
+        if outcome is not None and outcome[1] > MIN_SYMPTOM_CF:
+            symptoms.append((key, outcome[0], outcome[1]))
+    return symptoms
+
+def symptom_features(symptoms):
+    """
+    CBR feature strings of asserted symptoms; 'unknown' values are left out to keep the vector clean.
+    Format: {"volume-bar:moving", "sound-output:none", ...}
+    """
+    return {f"{name}:{value}" for name, value, _ in symptoms if value and value != "unknown"}
+
+def get_user_features(user_answers):
+    """
+    Converts user UI selections into a Set of feature strings.
+    Format: {"volume-bar:moving", "sound-output:none", ...}
+    """
+    return symptom_features(answer_symptoms(user_answers))
+
+def parse_case_record(line):
+    """
+    Parses one library line. The single parser of the line format: the CBR engine
+    and the maintenance tools (archive, moderation, analytics, tuning) all read
+    cases through it, so they accept and reject the same lines.
+    Expected Format: CASE-ID | STATUS | features... | Solution [| feedback_score [| created]]
+    
+    Returns:
+        dict | None: {"id", "status", "features": set, "solution", "feedback", "created"}, None for
+                     blank/short lines. Raises ValueError for a malformed feedback score.
+                     "created" is None for undated cases.
+    """
+    line = line.strip()
+    if not line:
+        return None
+    
+    parts = line.split("|")
+    if len(parts) < 4: 
+        # Legacy format support (old cases without status)
+        if len(parts) == 3:
+            case_id = parts[0].strip()
+            status = "VERIFIED"  # Assume legacy cases are verified
+            case_features_str = parts[1].strip()
+            solution = parts[2].strip()
+            feedback_score = 0
+            created = None
+        else:
+            return None
+    else:
+        case_id = parts[0].strip()
+        status = parts[1].strip()
+        case_features_str = parts[2].strip()
+        solution = parts[3].strip()
+        feedback_score = int(parts[4].strip()) if len(parts) > 4 else 0
+        created = (parts[5].strip() or None) if len(parts) > 5 else None
+    
+    return {
+        "id": case_id,
+        "status": status,
+        # Convert stored case string to Set
+        "features": set(case_features_str.split()),
+        "solution": solution,
+        "feedback": feedback_score,
+        "created": created
+    }
+
+def try_parse_case_record(line):
+    """parse_case_record for tools that set malformed lines aside: None instead of ValueError."""
+    try:
+        return parse_case_record(line)
+    except ValueError:
+        return None
+
+def matchable_case(lazy_case):
+    """Parses one LazyCase (case_reader.py); None if unparseable or disqualified."""
+    line = lazy_case.text()
+    try:
+        case = parse_case_record(line)
+    except Exception as e:
+        print(f"Error parsing case line: {line.strip()} - {e}")
+        return None
+    
+    # 🛡️ QUALITY CONTROL: Skip cases with negative feedback
+    if case is None or case["feedback"] < -2:
+        return None
+    return case
+
+def iter_case_records(path="case_library.txt"):
+    """
+    Yields parsed cases the CBR engine may match, skipping unparseable lines
+    and cases disqualified by negative feedback.
+    """
+    with open_library(path) as mm:
+        for lazy_case in iter_cases(mm):
+            case = matchable_case(lazy_case)
+            if case is not None:
+                yield case
+
+def iter_candidate_records(user_features, path="case_library.txt"):
+    """
+    Streams only the cases that share at least one feature with the user.
+    Every other case scores 0 and can never be the best match, so it is
+    rejected on the raw bytes without being decoded or parsed.
+    """
+    needles = feature_needles(user_features)
+    with open_library(path) as mm:
+        for lazy_case in iter_cases_containing(mm, needles):
+            if not lazy_case.features_contain(needles):
+                continue  # The hit was outside the feature list
+            case = matchable_case(lazy_case)
+            if case is not None:
+                yield case
+
+def load_case_index(path="case_library.txt"):
+    """In-memory case index: every matchable case, parsed once."""
+    return list(iter_case_records(path))
+
+class IncrementalCaseIndex:
+    """
+    [INCREMENTAL CASE INDEX]
+    Matchable cases of the library plus the byte offset they were parsed up to.
+    refresh() parses only the appended tail while the file keeps its identity
+    (same device/inode, not shorter, same first bytes and same bytes just before the
+    offset). A rewrite such as the atomic feedback update replaces the inode and
+    triggers a full rebuild. In-place edits elsewhere in the file are not detected;
+    the tools in this repo always rewrite through a rename.
+    
+    `cases` is replaced, never mutated, so readers holding the old list are unaffected.
+    """
+    FINGERPRINT_BYTES = 256
+    HEAD_BYTES = 4096
+    
+    def __init__(self, path="case_library.txt"):
+        self.path = path
+        self.cases = []
+        self.offset = 0          # End of the last complete (newline-terminated) line indexed
+        self.identity = None     # (st_dev, st_ino) of the indexed file
+        self.fingerprint = b""   # Bytes just before `offset`, to detect in-place rewrites
+        self.head = b""          # First bytes of the file, likewise
+        self._complete = []      # Cases from complete lines; a trailing partial line is re-read
+        self.unchanged = 0       # Leading cases the last refresh carried over as they were
+        self.refresh()
+    
+    def refresh(self):
+        """
+        Brings the index up to date with the file.
+        
+        Returns:
+            str: "appended" (tail parsed) or "rebuilt" (full parse)
+        """
+        with open_library_with_stat(self.path) as (mm, stat):
+            identity = (stat.st_dev, stat.st_ino) if stat is not None else None
+            size = len(mm) if mm is not None else 0
+            appendable = (
+                identity == self.identity
+                and size >= self.offset
+                and (mm[:len(self.head)] if mm is not None else b"") == self.head
+                and (mm[self.offset - len(self.fingerprint):self.offset] if mm is not None else b"") == self.fingerprint
+            )
+            start = self.offset if appendable else 0
+            
+            # Only newline-terminated lines are committed; a line still being written is parsed but re-read next time
+            last_newline = mm.rfind(b"\n", start) if mm is not None else -1
+            complete_end = last_newline + 1 if last_newline != -1 else start
+            complete, partial = [], []
+            for lazy_case in iter_cases(mm, start):
+                case = matchable_case(lazy_case)
+                if case is not None:
+                    (complete if lazy_case.next_offset <= complete_end else partial).append(case)
+            
+            self.unchanged = len(self._complete) if appendable else 0
+            self._complete = self._complete + complete if appendable else complete
+            self.cases = self._complete + partial
+            self.offset = complete_end
+            self.fingerprint = mm[max(0, complete_end - self.FINGERPRINT_BYTES):complete_end] if mm is not None else b""
+            self.head = mm[:min(complete_end, self.HEAD_BYTES)] if mm is not None else b""
+            self.identity = identity
+        return "appended" if appendable else "rebuilt"
+
+def score_case(user_features, case):
+    """
+    Weighted Jaccard similarity (0-100) of the user's features against one case,
+    with the verification penalty and feedback bonus applied.
+    
+    Returns:
+        tuple: (score: float, matched_features: set)
+    """
+    case_features = case["features"]
+    
+    # === ALGORITHM: WEIGHTED JACCARD SIMILARITY ===
+    intersection_weight = 0.0
+    union_weight = 0.0
+    
+    all_features = user_features.union(case_features)
+    matched_features = user_features.intersection(case_features)
+    
+    for feature in all_features:
+        # Extract feature type (e.g., "cpu-temp:above-85" -> "cpu-temp")
+        feature_type = feature.split(":")[0] if ":" in feature else feature
+        weight = FEATURE_WEIGHTS.get(feature_type, 1.0)
+        
+        union_weight += weight
+        
+        if feature in matched_features:
+            intersection_weight += weight
+    
+    if union_weight == 0:
+        score = 0
+    else:
+        score = (intersection_weight / union_weight) * 100
+    
+    # 🆕 VERIFICATION PENALTY: Unverified cases get 50% score reduction
+    if case["status"] == "PENDING":
+        score *= 0.5
+        
+    # Bonus for positive feedback
+    if case["feedback"] > 0:
+        score *= (1 + case["feedback"] * 0.05)  # +5% per positive vote
+    
+    return score, matched_features
+
+def run_cbr_analysis(user_features, cases=None):
+    """
+    [CBR ENGINE - Enhanced with Weighted Jaccard + Verification Status]
+    Reads the text file -> Calculates Weighted Jaccard Similarity -> Returns Best Match.
+    Math: Weighted Intersection / Weighted Union
+    
+    Key Improvements:
+    1. Features with higher diagnostic significance contribute more
+    2. VERIFIED cases get full score, PENDING cases get 50% penalty
+    3. Quality control prevents knowledge pollution
+    
+    Args:
+        user_features: Set of feature strings
+        cases: Optional pre-parsed case index (see load_case_index); streamed from file if None
+    """
+    best_match = None
+    max_score = 0.0
+    
+    if cases is None:
+        cases = iter_candidate_records(user_features)
+    
+    for case in cases:
+        score, matched_features = score_case(user_features, case)
+        
+        # Keep the highest score
+        if score > max_score:
+            max_score = score
+            best_match = _match_result(case, score, matched_features)
+                
+    return best_match, max_score
+
+def _match_result(case, score, matched_features):
+    return {
+        "id": case["id"],
+        "solution": case["solution"],
+        "matched_features": list(matched_features),
+        "match_quality": "High" if score > 70 else "Medium" if score > 40 else "Low",
+        "status": case["status"],
+        "feedback": case["feedback"]
+    }
+
+def case_score_ceiling(case):
+    """Highest score score_case can give this case (every feature matched)."""
+    ceiling = 50.0 if case["status"] == "PENDING" else 100.0
+    if case["feedback"] > 0:
+        ceiling *= (1 + case["feedback"] * 0.05)
+    return ceiling
+
+def prioritize_cases(cases):
+    """
+    Anytime scan order of a case index: highest score ceiling first (VERIFIED and
+    well-rated cases), file order within ties.
+    
+    Returns:
+        array.array: Indexes into `cases`
+    """
+    order = sorted(range(len(cases)), key=lambda i: -case_score_ceiling(cases[i]))
+    return array.array("I", order)
+
+def extend_priority(priority, cases, start):
+    """
+    prioritize_cases(cases) for an index whose first `start` cases are unchanged
+    since `priority` was computed (an appended library): the cases from `start`
+    on are inserted into a copy of the existing order instead of re-sorting all.
+    They come last in the file, so each goes after every case with the same ceiling.
+    
+    Returns:
+        array.array: Indexes into `cases`
+    """
+    if len(priority) == start:
+        order = array.array("I", priority)
+    else:
+        # Drop cases the old index held past `start` (a line that was still being written)
+        order = array.array("I", (i for i in priority if i < start))
+    for i in range(start, len(cases)):
+        ceiling = -case_score_ceiling(cases[i])
+        order.insert(bisect.bisect_right(order, ceiling, key=lambda j: -case_score_ceiling(cases[j])), i)
+    return order
+
+def run_cbr_analysis_anytime(user_features, cases, priority, deadline):
+    """
+    [CBR ENGINE - Anytime Mode]
+    run_cbr_analysis over an in-memory index, scanned in priority order
+    (see prioritize_cases) until `deadline` (time.monotonic()) passes.
+    
+    The scan also ends early, with an exact result, once no remaining case can
+    beat the best score. Ties go to the earlier case in the file, so a complete
+    scan returns exactly what run_cbr_analysis returns.
+    
+    Returns:
+        tuple: (best_match, score, complete: bool, scanned: int)
+    """
+    best_match, max_score, best_index = None, 0.0, None
+    scanned, complete = 0, True
+    
+    for index in priority:
+        case = cases[index]
+        if scanned % CBR_DEADLINE_CHECK == 0:
+            if case_score_ceiling(case) < max_score:
+                break  # Ceilings only decrease from here on
+            if scanned and time.monotonic() >= deadline:
+                complete = False
+                break
+        scanned += 1
+        score, matched_features = score_case(user_features, case)
+        if score > max_score or (score == max_score and best_index is not None and index < best_index):
+            max_score, best_index = score, index
+            best_match = _match_result(case, score, matched_features)
+    
+    return best_match, max_score, complete, scanned
+
+def resolve_conflict(rbr_result, rbr_cf, cbr_result, cbr_score, rbr_partial=False, cbr_partial=False):
+    """
+    [META-REASONING ENGINE]
+    Intelligently integrates RBR and CBR results when they conflict.
+    rbr_partial / cbr_partial flag best-so-far results of an engine that ran out of
+    time (anytime mode); the verdict then lists them under "partial" and says so in the reason.
+    
+    Decision Strategy:
+    1. High RBR confidence (>80%) -> Prefer rule-based diagnosis
+    2. High CBR similarity (>70%) + Low RBR confidence -> Prefer case-based diagnosis
+    3. Similar confidence levels -> Provide hybrid recommendation
+    4. Default -> Prefer RBR (rules are more reliable when confident)
+    
+    Returns:
+        dict: {
+            "primary": "rbr" | "cbr" | "hybrid",
+            "recommendation": str,
+            "reason": str,
+            "confidence": float,
+            "partial": list of "rbr" / "cbr" (only if an engine was cut short)
+        }
+    """
+    result = _resolve_strategy(rbr_result, rbr_cf, cbr_result, cbr_score)
+    
+    partial = [engine for engine, cut_short in (("rbr", rbr_partial), ("cbr", cbr_partial)) if cut_short]
+    if partial:
+        stopped = " and ".join(PARTIAL_ENGINE_NAMES[engine] for engine in partial)
+        result["partial"] = partial
+        result["reason"] += f" ⏱️ Time budget reached before the {stopped} finished; this is the best result found so far."
+    return result
+
+PARTIAL_ENGINE_NAMES = {"rbr": "rule engine", "cbr": "case scan"}
+
+def _resolve_strategy(rbr_result, rbr_cf, cbr_result, cbr_score):
+    rbr_confidence = rbr_cf * 100 if rbr_result else 0
+    cbr_confidence = cbr_score if cbr_result else 0
+    
+    # Strategy 1: High-confidence rule
+    if rbr_confidence > 80:
+        result = {
+            "primary": "rbr",
+            "recommendation": rbr_result['solution'],
+            "reason": f"Rule-based engine highly confident ({int(rbr_confidence)}%)",
+            "confidence": rbr_confidence
+        }
+        if cbr_result and cbr_confidence > 40:
+            result["alternative_solution"] = cbr_result['solution']
+            result["alternative_reason"] = f"Historical case match ({int(cbr_confidence)}% similarity)"
+            result["alternative_confidence"] = cbr_confidence
+        return result
+    
+    # Strategy 2: Strong case match with weak rule
+    elif cbr_confidence > 70 and rbr_confidence < 50:
+        return {
+            "primary": "cbr",
+            "recommendation": cbr_result['solution'],
+            "reason": f"Strong match with historical case ({int(cbr_confidence)}% similarity)",
+            "confidence": cbr_confidence
+        }
+    
+    # Strategy 3: Both engines have similar confidence
+    elif abs(rbr_confidence - cbr_confidence) < 20 and rbr_result and cbr_result:
+        # Check if solutions actually differ
+        solutions_differ = rbr_result['solution'] != cbr_result['solution']
+        
+        if solutions_differ:
+            reason = (f"🔍 **Comparative Analysis**: Logic engine diagnoses '{rbr_result['fault']}' "
+                     f"based on expert rules, while memory bank found a {int(cbr_score)}% similar "
+                     f"historical case with different resolution. Both approaches are valid - "
+                     f"consider checking hardware connections first.")
+        else:
+            reason = "Both reasoning engines converge on the same solution with similar confidence"
+        
+        return {
+            "primary": "hybrid",
+            "recommendation": f"**Solution A (Logic-Based)**: {rbr_result['solution']}\n\n**Solution B (Case-Based)**: {cbr_result['solution']}",
+            "reason": reason,
+            "confidence": (rbr_confidence + cbr_confidence) / 2,
+            "requires_comparison": solutions_differ
+        }
+    
+    # Strategy 4: Default to RBR
+    elif rbr_result:
+        return {
+            "primary": "rbr",
+            "recommendation": rbr_result['solution'],
+            "reason": "Rule-based diagnosis (based on domain expert knowledge)",
+            "confidence": rbr_confidence
+        }
+    
+    # Fallback: Only CBR available
+    elif cbr_result:
+        return {
+            "primary": "cbr",
+            "recommendation": cbr_result['solution'],
+            "reason": "Case-based diagnosis only (no matching rules found)",
+            "confidence": cbr_confidence
+        }
+    
+    # No results from either engine
+    else:
+        return {
+            "primary": "none",
+            "recommendation": "Unable to diagnose - Please consult a technical professional",
+            "reason": "Symptom combination does not match any known patterns",
+            "confidence": 0
+        }
+
+def get_triggered_symptoms(env):
+    """
+    [EXPLANATION FACILITY]
+    Extracts all symptoms that triggered the CLIPS inference.
+    Used for explaining WHY a diagnosis was made.
+    
+    Returns:
+        list: [(symptom_name, value, confidence), ...]
+    """
+    triggered = []
+    for fact in env.facts():
+        if fact.template.name == "symptom" and fact['cf'] > 0.5:
+            triggered.append({
+                "name": fact['name'],
+                "value": fact['value'],
+                "cf": fact['cf']
+            })
+    return triggered
+
+def update_similarity_corpus(cases, start=0):
+    """
+    Keeps a corpus-fitted similarity backend (hashing TF-IDF) in step with the
+    case index: cases[start:] were appended, start=0 means the library was re-read.
+    """
+    update = getattr(similarity_backend, "update_corpus", None)
+    if update is not None:
+        update([case["solution"] for case in cases[start:]], appended=start > 0)
+
+def semantic_similarity(text1, text2):
+    """
+    Cosine similarity of two texts (lowercased) with the configured similarity backend.
+    """
+    return similarity_backend.similarity(text1.lower(), text2.lower())
+
+def get_semantic_endorsement_score(user_solution, rbr_solution):
+    """
+    [NLP SEMANTIC SIMILARITY]
+    Calculates semantic similarity between user-submitted solution and RBR diagnosis.
+    Uses the configured similarity backend (Spacy word embeddings by default).
+    
+    Args:
+        user_solution: User-contributed solution text
+        rbr_solution: RBR engine's recommended solution
+    
+    Returns:
+        int: Endorsement points (0-50) based on semantic similarity
+    
+    Scoring (Spacy vectors; each backend carries its own thresholds):
+    - Similarity > 0.85: +50 pts (Highly aligned with expert knowledge)
+    - Similarity > 0.65: +30 pts (Semantically related)
+    - Similarity > 0.45: +15 pts (Weak correlation)
+    - Otherwise: 0 pts
+    """
+    if not NLP_AVAILABLE or not rbr_solution:
+        # Fallback to simple string matching if NLP unavailable
+        rbr_normalized = rbr_solution.strip().lower()
+        user_normalized = user_solution.strip().lower()
+        
+        if rbr_normalized == user_normalized:
+            return 50
+        elif any(key_phrase in user_normalized for key_phrase in rbr_normalized.split()[:3]):
+            return 25
+        return 0
+    
+    try:
+        # Calculate cosine similarity between document vectors
+        similarity = semantic_similarity(user_solution, rbr_solution)
+        
+        # Convert similarity to endorsement points
+        return endorsement_points(similarity, similarity_backend.tiers)
+    
+    except Exception as e:
+        print(f"Error in semantic analysis: {e}")
+        return 0
+
+def build_case_entry(user_features, correct_solution, is_verified=False):
+    """
+    [LEARNING ENGINE - Validation & Formatting]
+    Validates a submitted solution and formats its library line.
+    Format: ID | STATUS | feature1 feature2 | Solution | feedback_score | created
+    
+    Returns:
+        (success: bool, case_id: str | None, entry_or_message: str)
+    """
+    # 🛡️ INPUT VALIDATION
+    if not correct_solution or len(correct_solution.strip()) < 10:
+        return False, None, "Solution too brief (minimum 10 characters required)"
+    
+    # Check for spam patterns
+    spam_patterns = ["test", "asdf", "1234", "xxx"]
+    if any(pattern in correct_solution.lower() for pattern in spam_patterns):
+        return False, None, "Invalid input detected"
+    
+    # 1. Generate unique ID
+    case_id = f"CASE-{int(time.time() * 1000) % 100000:05d}"
+    
+    # 2. Set verification status
+    status = "VERIFIED" if is_verified else "PENDING"
+    
+    # 3. Format features as space-separated string
+    feature_str = " ".join(list(user_features))
+    
+    # 4. Initial feedback score of 0
+    # Creation date lets the retention policy (case_archive.py) age out stale PENDING cases
+    created = time.strftime("%Y-%m-%d")
+    entry = f"{case_id} | {status} | {feature_str} | {correct_solution} | 0 | {created}\n"
+    return True, case_id, entry
+
+def submission_message(is_verified):
+    """User-facing confirmation for an accepted submission."""
+    if is_verified:
+        return "✅ Verified case added to knowledge base!"
+    return "✅ Suggestion submitted! It will be reviewed by domain experts."
+
+def save_new_case(user_features, correct_solution, is_verified=False):
+    """
+    [LEARNING ENGINE - Enhanced with Quality Control]
+    Saves a new case to the text file with verification status.
+    Format: ID | STATUS | feature1 feature2 | Solution | feedback_score | created
+    
+    Args:
+        user_features: Set of symptom features
+        correct_solution: User-provided solution
+        is_verified: Whether this is an expert-verified case
+    
+    Returns:
+        (success: bool, message: str)
+    """
+    try:
+        success, case_id, entry = build_case_entry(user_features, correct_solution, is_verified)
+        if not success:
+            return False, entry
+        
+        # Appended in place: incremental indexes pick it up without a full reload
+        with file_lock("case_library.txt"):
+            append_lines("case_library.txt", [entry])
+        
+        return True, submission_message(is_verified)
+            
+    except Exception as e:
+        return False, f"Error saving case: {str(e)}"
+
+def check_numerical_convergence(user_features, solution):
+    """
+    [NUMERICAL CONVERGENCE CHECK]
+    Checks if multiple cases with identical symptom combinations exist.
+    This indicates pattern stability in the knowledge base.
+    
+    Returns:
+        int: Convergence bonus points (0-40)
+    """
+    if user_features is None:
+        return 0
+    
+    matching_cases = 0
+    needles = feature_needles(user_features)
+    try:
+        with open_library("case_library.txt") as mm:
+            # Only lines holding every user feature are decoded
+            lines = iter_cases_containing(mm, needles[:1]) if needles else iter_cases(mm)
+            for lazy_case in lines:
+                if lazy_case.field_count() < 4 or not lazy_case.features_contain(needles, require_all=True):
+                    continue
+                case_features = set(lazy_case.field(2).split())
+                
+                # Check if feature sets are identical
+                if user_features == case_features:
+                    matching_cases += 1
+        
+        # Award points based on convergence strength
+        if matching_cases >= 3:
+            return 40  # Strong pattern detected
+        elif matching_cases == 2:
+            return 20  # Moderate pattern
+        else:
+            return 0
+    except Exception as e:
+        print(f"Error checking convergence: {e}")
+        return 0
+
+def check_and_promote_hybrid(case_id, current_score, user_features, solution, rbr_result):
+    """
+    [MULTI-DIMENSIONAL AUTO-PROMOTION SYSTEM - Enhanced with NLP]
+    Promotes cases to VERIFIED based on weighted scoring across multiple criteria.
+    
+    Scoring System:
+    - Community Approval: +20 points per upvote (current_score * 20)
+    - NLP Semantic Endorsement: 0-50 points based on similarity with RBR diagnosis
+    - Numerical Convergence: +40 points if pattern repeats in knowledge base
+    
+    Promotion Threshold: 100 points
+    
+    Args:
+        case_id: The case identifier
+        current_score: Current community feedback score (net upvotes)
+        user_features: Set of symptom features for this case
+        solution: The proposed solution
+        rbr_result: Current RBR engine diagnosis result
+    
+    Returns:
+        tuple: (should_promote: bool, total_points: int, breakdown: dict)
+    """
+    breakdown = {
+        "community": 0,
+        "nlp_endorsement": 0,
+        "convergence": 0,
+        "semantic_score": 0.0  # For display purposes
+    }
+    
+    # Criterion 1: Community Approval (20 points per upvote)
+    community_points = current_score * 20
+    breakdown["community"] = community_points
+    
+    # Criterion 2: NLP Semantic Endorsement (0-50 points)
+    # Uses Spacy to measure semantic similarity with expert system diagnosis
+    if rbr_result and rbr_result.get('solution'):
+        nlp_points = get_semantic_endorsement_score(
+            solution, 
+            rbr_result['solution']
+        )
+        breakdown["nlp_endorsement"] = nlp_points
+        
+        # Calculate semantic similarity percentage for display
+        if NLP_AVAILABLE:
+            try:
+                breakdown["semantic_score"] = round(semantic_similarity(solution, rbr_result['solution']) * 100, 1)
+            except:
+                breakdown["semantic_score"] = 0.0
+    
+    # Criterion 3: Numerical Convergence (0-40 points)
+    # Check if similar symptom patterns exist in knowledge base
+    convergence_points = check_numerical_convergence(user_features, solution)
+    breakdown["convergence"] = convergence_points
+    
+    # Calculate total score
+    total_points = sum([v for k, v in breakdown.items() if k != "semantic_score"])
+    
+    # Promotion threshold: 100 points
+    should_promote = total_points >= 100
+    
+    return should_promote, total_points, breakdown
+
+def log_promotion(case_id, score, total_points, breakdown):
+    print(f"✅ AUTO-PROMOTION: Case {case_id} elevated to VERIFIED")
+    print(f"   Total Points: {total_points}/100")
+    print(f"   - Community: {breakdown['community']} pts ({score} votes × 20)")
+    print(f"   - NLP Semantic Match: {breakdown['nlp_endorsement']} pts (Similarity: {breakdown.get('semantic_score', 0)}%)")
+    print(f"   - Convergence: {breakdown['convergence']} pts")
+
+def apply_vote_to_line(line, vote, user_features=None, rbr_result=None, evaluate_promotion=True):
+    """
+    Applies a (net) vote to one library line and evaluates auto-promotion.
+    With evaluate_promotion=False only the score changes; the caller decides
+    promotion later (see promotion_worker.py) and applies it with apply_promotion_to_line.
+    
+    Returns:
+        tuple: (new_line: str | None, promoted: bool, details: dict)
+               new_line is None if the line is not a valid case
+    """
+    parts = line.strip().split("|")
+    if len(parts) < 4:
+        return None, False, {}
+    
+    case_id = parts[0].strip()
+    status = parts[1].strip()
+    case_features_str = parts[2].strip()
+    current_solution = parts[3].strip()
+    current_score = int(parts[4].strip()) if len(parts) > 4 else 0
+    
+    # Update vote score
+    new_score = current_score + vote
+    promoted = False
+    promotion_details = {}
+    
+    # 🆕 MULTI-DIMENSIONAL AUTO-PROMOTION
+    if status == "PENDING" and evaluate_promotion:
+        # Parse features for convergence check
+        if user_features is None and case_features_str:
+            user_features = set(case_features_str.split())
+        
+        # Run hybrid promotion check
+        should_promote, total_points, breakdown = check_and_promote_hybrid(
+            case_id, 
+            new_score, 
+            user_features, 
+            current_solution, 
+            rbr_result
+        )
+        
+        if should_promote:
+            status = "VERIFIED"
+            promoted = True
+            PROMOTIONS.inc()
+            promotion_details = {
+                "total_points": total_points,
+                "breakdown": breakdown,
+                "case_id": case_id
+            }
+            
+            # Detailed logging
+            log_promotion(case_id, new_score, total_points, breakdown)
+    
+    # Reconstruct the line with updated score and status (keep trailing fields like created date)
+    extra = "".join(f" | {p.strip()}" for p in parts[5:])
+    new_line = f"{case_id} | {status} | {case_features_str} | {current_solution} | {new_score}{extra}\n"
+    return new_line, promoted, promotion_details
+
+def apply_promotion_to_line(line):
+    """
+    Sets a PENDING case line to VERIFIED, keeping every other field.
+    
+    Returns:
+        str | None: The new line, or None if the line is not a PENDING case
+    """
+    parts = [p.strip() for p in line.strip().split("|")]
+    if len(parts) < 4 or parts[1] != "PENDING":
+        return None
+    parts[1] = "VERIFIED"
+    return " | ".join(parts) + "\n"
+
+def update_case_feedback(case_id, vote, user_features=None, rbr_result=None):
+    """
+    [FEEDBACK SYSTEM - Enhanced with Multi-Dimensional Scoring]
+    Updates the feedback score and evaluates auto-promotion using hybrid criteria.
+    
+    Args:
+        case_id: The case identifier
+        vote: +1 for helpful, -1 for not helpful
+        user_features: Set of symptom features (for convergence check)
+        rbr_result: Current RBR diagnosis result (for endorsement check)
+    
+    Returns:
+        tuple: (success: bool, promoted: bool, details: dict)
+    """
+    try:
+        # Held from read to rewrite, so no other writer's change is overwritten
+        with file_lock("case_library.txt"):
+            # Find the matching case without loading the library
+            prefix = case_id.encode("utf-8")
+            with open_library("case_library.txt") as mm:
+                for lazy_case in iter_cases_containing(mm, [prefix]):
+                    # Exact ID: CASE-1000 must not match CASE-10001
+                    if lazy_case.field(0) != case_id:
+                        continue
+                    new_line, promoted, promotion_details = apply_vote_to_line(
+                        lazy_case.text(), vote, user_features, rbr_result
+                    )
+                    if new_line is None:
+                        continue
+                    span = (lazy_case.start, lazy_case.end)
+                    old_bytes = mm[lazy_case.start:lazy_case.end]
+                    break
+                else:
+                    return False, False, {}
+            
+            # Write back to file: only this line changes, its line ending is kept
+            splice_atomic("case_library.txt", *span, new_line.rstrip("\r\n").encode("utf-8"), expected=old_bytes)
+        return True, promoted, promotion_details
+        
+    except Exception as e:
+        print(f"Error updating feedback: {e}")
+        return False, False, {}
+
+# ======================================
+# 2. RBR HELPER (CLIPS / LOGIC)
+# ======================================
+
+def assert_symptoms(env, symptoms):
+    """
+    Asserts (name, value, cf) symptoms (see answer_symptoms) as CLIPS facts.
+    """
+    for name, value, cf in symptoms:
+        env.assert_string(f"(symptom (name {name}) (value {value}) (cf {cf}))")
+
+def assert_fact_with_mapping(env, symptom_name, answer_code):
+    """
+    Translates User Choice (answer code, see questions.ANSWER_REGISTRY) -> CLIPS Fact
+    """
+    assert_symptoms(env, answer_symptoms({symptom_name: answer_code}))
+
+def run_rbr_analysis(env, user_answers):
+    """
+    [RBR ENGINE]
+    Resets CLIPS, asserts the user's answers as facts, runs inference and harvests results.
+    Facts are copied into plain dicts so results outlive the next env.reset().
+    
+    Returns:
+        tuple: (diagnoses sorted by cf desc: list of dict, triggered_symptoms: list of dict)
+    """
+    env.reset()
+    # Convert UI answers to CLIPS Facts
+    assert_symptoms(env, answer_symptoms(user_answers))
+    
+    env.run()
+    
+    return _harvest_diagnoses(env), get_triggered_symptoms(env)
+
+def run_rbr_analysis_anytime(env, user_answers, deadline):
+    """
+    [RBR ENGINE - Anytime Mode]
+    run_rbr_analysis with a deadline (time.monotonic()): rules fire in slices of
+    RBR_FIRING_SLICE (at least one slice) and inference stops once the deadline
+    has passed. The diagnoses asserted so far are returned.
+    
+    Returns:
+        tuple: (diagnoses sorted by cf desc, triggered_symptoms, complete: bool)
+    """
+    env.reset()
+    assert_symptoms(env, answer_symptoms(user_answers))
+    
+    # Only while rules fire: every router is queried for every CLIPS string conversion
+    notice = _FiringLimitNotice()
+    env.add_router(notice)
+    try:
+        complete = True
+        while env.run(RBR_FIRING_SLICE) == RBR_FIRING_SLICE:
+            if time.monotonic() >= deadline:
+                complete = not any(True for _ in env.activations())
+                break
+    finally:
+        notice.delete()
+    
+    return _harvest_diagnoses(env), get_triggered_symptoms(env), complete
+
+class _FiringLimitNotice(clips.Router):
+    """Drops the notice CLIPS prints whenever env.run(limit) stops at its limit; other output passes through."""
+    
+    def __init__(self):
+        super().__init__("firing-limit-notice", 40)
+    
+    def query(self, name):
+        return name == "stdout"
+    
+    def write(self, name, message):
+        if message != "rule firing limit reached\n":
+            self.share_message(name, message)
+
+def _harvest_diagnoses(env):
+    diagnoses = [dict(fact) for fact in env.facts() if fact.template.name == "diagnosis"]
+    diagnoses.sort(key=lambda d: d['cf'], reverse=True)
+    return diagnoses
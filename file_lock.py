@@ -0,0 +1,79 @@
+"""
+[FILE LOCK - Inter-process Lock Next to a Shared File]
+The case library and the diagnosis log are written by the Streamlit workers
+and by the maintenance commands (case_archive.py, case_moderation.py). Every
+writer takes file_lock(path) around its read-modify-write, so a rewrite
+never overwrites votes or cases another process wrote in the meantime.
+
+The lock is an OS lock (flock / msvcrt) on `path` + ".lock"; it is released
+when the holder exits or crashes. It is re-entrant within a process: nested
+holders in the same thread share the outer OS lock, other threads wait.
+"""
+import contextlib
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+LOCK_SUFFIX = ".lock"
+
+_held = {}  # lock path -> {"rlock", "depth", "fd"}
+_held_guard = threading.Lock()
+
+
+def lock_path(path):
+    return os.path.abspath(path) + LOCK_SUFFIX
+
+
+def _acquire(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        return
+    while True:
+        try:
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            time.sleep(0.05)  # LK_LOCK gives up after ~10s; keep waiting
+
+
+def _release(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Holds the exclusive inter-process lock of `path` for the duration of the block."""
+    key = lock_path(path)
+    with _held_guard:
+        entry = _held.setdefault(key, {"rlock": threading.RLock(), "depth": 0, "fd": None})
+
+    with entry["rlock"]:
+        if entry["depth"] == 0:
+            fd = os.open(key, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                _acquire(fd)
+            except BaseException:
+                os.close(fd)
+                raise
+            entry["fd"] = fd
+        entry["depth"] += 1
+        try:
+            yield
+        finally:
+            entry["depth"] -= 1
+            if entry["depth"] == 0:
+                fd, entry["fd"] = entry["fd"], None
+                try:
+                    _release(fd)
+                finally:
+                    os.close(fd)
@@ -0,0 +1,249 @@
+"""
+[KNOWLEDGE BASE - Cached Engines with Hot Reload]
+Keeps one CLIPS environment (rules.clp) and one parsed case index
+(case_library.txt) per process, instead of rebuilding them on every rerun.
+
+A watcher thread polls both files. When one changes, the new version is
+built in the background and swapped in with a single reference assignment:
+diagnoses already running keep the snapshot they started with. A rule file
+that fails to load is rejected; the last good rules keep serving and the
+error is reported on the snapshot.
+
+Cases appended to the library are parsed incrementally from the last indexed
+byte offset and inserted into the existing anytime scan order; only a rewrite
+of the file (new identity) re-parses and re-sorts all of it. A corpus-fitted
+similarity backend (hashing TF-IDF) follows the same way: appended solutions
+are added to its document frequencies, a rewrite refits it.
+
+The precomputed RBR lookup table (rbr_table.py, next to the rules file) is
+attached to the snapshot when it matches the loaded rules. A missing or stale
+table is picked up by the watcher when `python rbr_table.py build` lands it;
+with EXPERT_RBR_TABLE_BUILD=1 the knowledge base also starts that build in
+the background (one request per rules version, per process).
+"""
+import array
+import os
+import threading
+from dataclasses import dataclass, field, replace
+
+import clips
+
+from expert_engine import IncrementalCaseIndex, extend_priority, prioritize_cases, update_similarity_corpus
+from metrics import REGISTRY
+from rbr_table import TABLE_PATH as RBR_TABLE_PATH
+from rbr_table import RbrLookup, build_in_progress, file_sha256, start_build_process, table_path_for
+
+RULES_PATH = "rules.clp"
+LIBRARY_PATH = "case_library.txt"
+
+
+def file_version(path):
+    """(mtime_ns, size) identity of a file, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+@dataclass(frozen=True)
+class KnowledgeSnapshot:
+    """
+    One immutable version of the knowledge. The CLIPS env is guarded by `lock`;
+    rules_version is the version of the rules actually loaded into env, and
+    rbr_table (if set) was computed from exactly those rules. case_priority is
+    the anytime scan order of `cases` (prioritize_cases).
+    """
+    env: clips.Environment
+    rules_version: tuple
+    cases: list
+    cases_version: tuple
+    case_priority: array.array = None
+    rules_error: str = None
+    rbr_table: RbrLookup = None
+    lock: threading.Lock = field(default_factory=threading.Lock, compare=False)
+
+
+def build_environment(rules_path=RULES_PATH):
+    """Loads rules into a fresh CLIPS environment. Raises on a bad rule file."""
+    env = clips.Environment()
+    env.load(rules_path)
+    return env
+
+
+class KnowledgeBase:
+    def __init__(self, rules_path=RULES_PATH, library_path=LIBRARY_PATH, poll_interval=1.0,
+                 rbr_table_path=RBR_TABLE_PATH, build_rbr_table=None):
+        self.rules_path = rules_path
+        self.library_path = library_path
+        self.poll_interval = poll_interval
+        # None disables the lookup table; a relative path is relative to the rules file
+        self.rbr_table_path = None if rbr_table_path is None else table_path_for(rules_path, rbr_table_path)
+        if build_rbr_table is None:
+            build_rbr_table = os.environ.get("EXPERT_RBR_TABLE_BUILD", "0") == "1"
+        self.build_rbr_table = build_rbr_table
+        self.reloads = {"rules": 0, "cases": 0, "appends": 0, "rejected": 0, "rbr_table": 0}
+        self._rejected_version = None
+        self._swap_lock = threading.Lock()  # Serializes snapshot replacement (watcher vs table pickup)
+        self._rbr_table_version = None
+        self._rbr_build_requested = None
+        self._rbr_build_process = None
+
+        # Initial load is synchronous; a bad rule file still yields an (empty) env
+        # Appended cases are parsed incrementally; only a rewrite re-parses the library
+        self._case_index = IncrementalCaseIndex(library_path)
+        rules_version = file_version(rules_path)
+        self._rules_sha = file_sha256(rules_path)
+        try:
+            env, error = build_environment(rules_path), None
+        except Exception as e:
+            env, error = clips.Environment(), str(e)
+            self._rules_sha = None
+        self._snapshot = KnowledgeSnapshot(
+            env=env,
+            rules_version=rules_version,
+            cases=self._case_index.cases,
+            cases_version=file_version(library_path),
+            case_priority=prioritize_cases(self._case_index.cases),
+            rules_error=error,
+        )
+
+        REGISTRY.gauge("expert_case_library_cases", "Matchable cases in the live library by status",
+                       ["status"], callback=self._case_counts)
+        REGISTRY.gauge("expert_knowledge_reloads", "Hot reloads since start", ["kind"],
+                       callback=lambda: {(kind,): count for kind, count in self.reloads.items()})
+
+        self._maintain_rbr_table()
+
+        self._stop = threading.Event()
+        self._watcher = threading.Thread(target=self._watch, name="knowledge-watcher", daemon=True)
+        self._watcher.start()
+
+    def current(self):
+        """The snapshot to use for one diagnosis (hold on to it for the whole request)."""
+        return self._snapshot
+
+    def reload(self):
+        """
+        Checks both files once and swaps in rebuilt parts that changed.
+
+        Returns:
+            bool: True if a new snapshot was published
+        """
+        with self._swap_lock:
+            changed = self._reload_files()
+        self._maintain_rbr_table()
+        return changed
+
+    def _reload_files(self):
+        # Caller holds _swap_lock
+        old = self._snapshot
+        env, rules_version, error = old.env, old.rules_version, old.rules_error
+        cases, cases_version, case_priority = old.cases, old.cases_version, old.case_priority
+        changed = False
+
+        new_rules_version = file_version(self.rules_path)
+        if new_rules_version not in (old.rules_version, self._rejected_version):
+            try:
+                rules_sha = file_sha256(self.rules_path)
+                env, error = build_environment(self.rules_path), None
+                rules_version, self._rules_sha = new_rules_version, rules_sha
+                self.reloads["rules"] += 1
+                print(f"♻️ Reloaded {self.rules_path}")
+            except Exception as e:
+                # Keep serving the last good rules; remember the bad version so it isn't retried
+                error = f"{self.rules_path} rejected, serving previous rules: {e}"
+                self._rejected_version = new_rules_version
+                self.reloads["rejected"] += 1
+                print(f"⚠️ {error}")
+            changed = True
+
+        new_cases_version = file_version(self.library_path)
+        if new_cases_version != old.cases_version:
+            kind = self._case_index.refresh()
+            cases, cases_version = self._case_index.cases, new_cases_version
+            if kind == "appended":
+                # Only the new cases are placed; the order of the others is kept
+                case_priority = extend_priority(old.case_priority, cases, self._case_index.unchanged)
+                update_similarity_corpus(cases, self._case_index.unchanged)
+            else:
+                case_priority = prioritize_cases(cases)
+                update_similarity_corpus(cases)
+            self.reloads["appends" if kind == "appended" else "cases"] += 1
+            changed = True
+
+        if changed:
+            self._snapshot = KnowledgeSnapshot(
+                env=env,
+                rules_version=rules_version,
+                cases=cases,
+                cases_version=cases_version,
+                case_priority=case_priority,
+                rules_error=error,
+                # The table belongs to the rules, it survives case reloads only
+                rbr_table=old.rbr_table if env is old.env else None,
+                # Same env -> same lock, so a shared env is never run concurrently
+                lock=old.lock if env is old.env else threading.Lock(),
+            )
+        return changed
+
+    def _maintain_rbr_table(self):
+        """
+        Attaches a matching lookup table if one is on disk, else (build_rbr_table)
+        requests one background build per rules version.
+        """
+        if self.rbr_table_path is None:
+            return
+        if self._rbr_build_process is not None and self._rbr_build_process.poll() is not None:
+            self._rbr_build_process = None  # Reap the finished build
+
+        with self._swap_lock:
+            rules_sha, snapshot = self._rules_sha, self._snapshot
+            if rules_sha is None or (snapshot.rbr_table is not None and snapshot.rbr_table.rules_sha256 == rules_sha):
+                return
+
+            table_version = file_version(self.rbr_table_path)
+            if table_version is not None and table_version != self._rbr_table_version:
+                self._rbr_table_version = table_version
+                table = RbrLookup.load(self.rbr_table_path, rules_sha)
+                if table is not None:
+                    self._snapshot = replace(snapshot, rbr_table=table)
+                    self.reloads["rbr_table"] += 1
+                    print(f"📦 RBR lookup table attached ({self.rbr_table_path})")
+                    return
+
+            if not self.build_rbr_table:
+                return
+            if self._rbr_build_requested != rules_sha and not build_in_progress(self.rbr_table_path):
+                self._rbr_build_requested = rules_sha
+                print(f"🛠️ Building the RBR lookup table for {self.rules_path} in the background")
+                self._rbr_build_process = start_build_process(self.rules_path, self.rbr_table_path)
+
+    def _case_counts(self):
+        counts = {("VERIFIED",): 0, ("PENDING",): 0}
+        for case in self._snapshot.cases:
+            counts[(case["status"],)] = counts.get((case["status"],), 0) + 1
+        return counts
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"Error reloading knowledge base: {e}")
+
+    def close(self):
+        self._stop.set()
+
+
+_knowledge_base = None
+_knowledge_base_lock = threading.Lock()
+
+
+def get_knowledge_base():
+    """Process-wide knowledge base shared by all Streamlit sessions and reruns."""
+    global _knowledge_base
+    with _knowledge_base_lock:
+        if _knowledge_base is None:
+            _knowledge_base = KnowledgeBase()
+        return _knowledge_base
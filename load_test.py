@@ -0,0 +1,259 @@
+"""
+[CONCURRENT-SESSION LOAD TEST]
+Drives simulated users through wizard steps 1-6 headlessly with Streamlit's
+AppTest API, including a 👍 vote and a knowledge submission per session.
+AppTest instances are not thread-safe, so every in-flight session runs in its
+own worker process; all workers share one case library, which is exactly the
+file-rewrite contention update_case_feedback sees in production.
+
+Each concurrency level runs in a scratch copy of the knowledge files so the
+real case library is never touched. Background RBR table builds are turned
+off for the run (EXPERT_RBR_TABLE_BUILD=0), and a scratch directory is only
+removed once no build is writing into it. Reported per level:
+- p50/p95/p99 latency per step
+- errors (exceptions raised by the app script)
+- lost writes (votes / submissions that never reached case_library.txt)
+- worker RSS growth across the sessions each worker served
+
+Usage:
+    python load_test.py --concurrency 1 2 4 8 --sessions 16
+"""
+import argparse
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit_app.py")
+KNOWLEDGE_FILES = ["rules.clp", "case_library.txt"]
+
+# A build that has not touched its lock for this long is dead (rbr_table.STALE_LOCK_SECONDS)
+BUILD_WAIT_SECONDS = 600
+
+# Must pass save_new_case validation (no spam keywords, >= 10 chars)
+SUBMISSION_TEMPLATE = "Synthetic load probe {tag}: reseat the memory modules and clean contacts."
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB (Linux /proc, falls back to peak RSS)."""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)  # Nearest-rank
+    return ordered[index]
+
+
+def read_library_state(path):
+    """Returns ({case_id: feedback_score}, full text) for lost-write accounting."""
+    scores = {}
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    for line in text.splitlines():
+        parts = line.split("|")
+        if len(parts) >= 5:
+            try:
+                scores[parts[0].strip()] = int(parts[4].strip())
+            except ValueError:
+                continue
+    return scores, text
+
+
+# ======================================
+# 1. ONE SIMULATED USER
+# ======================================
+
+def run_session(session_no, seed, timeout):
+    """
+    Walks one session through the wizard.
+
+    Returns:
+        dict: {"timings": {step: seconds}, "errors": [...], "voted": case_id|None,
+               "submitted": tag|None, "pid": int, "rss": MB after the session}
+    """
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed)
+    result = {"timings": {}, "errors": [], "voted": None, "submitted": None, "pid": os.getpid()}
+
+    def timed(step, action):
+        start = time.perf_counter()
+        at = action()
+        result["timings"][step] = time.perf_counter() - start
+        result["errors"].extend(f"{step}: {e.value}" for e in at.exception)
+        return at
+
+    try:
+        at = timed("load", lambda: AppTest.from_file(APP_PATH, default_timeout=timeout).run())
+
+        # Steps 1-5: random answers, then "Next"
+        for step in range(1, 6):
+            for radio in at.radio:
+                radio.set_value(rng.choice(radio.options))
+            next_button = [b for b in at.button if "Next" in b.label][0]
+            at = timed(f"step{step}", lambda: next_button.click().run())
+
+        # Step 6: run the hybrid diagnosis
+        run_button = [b for b in at.button if "Run Diagnosis" in b.label][0]
+        at = timed("diagnosis", lambda: run_button.click().run())
+
+        # Vote on the matched historical case, if one is shown
+        votes = [b for b in at.button if b.key == "thumbs_up" and not b.disabled]
+        if votes:
+            case_ids = [m.value for m in at.markdown if m.value.startswith("**Case ID**")]
+            case_id = case_ids[0].split(":", 1)[1].strip() if case_ids else None
+            at = timed("vote", lambda: votes[0].click().run())
+            result["voted"] = case_id
+
+        # Knowledge submission through the learning form
+        tag = f"s{session_no}-{seed}"
+        at.text_area[0].input(SUBMISSION_TEMPLATE.format(tag=tag))
+        submit = [b for b in at.button if "Submit Solution" in b.label][0]
+        at = timed("submit", lambda: submit.click().run())
+        if any("submitted" in s.value or "added" in s.value for s in at.success):
+            result["submitted"] = tag
+    except Exception as e:
+        result["errors"].append(f"harness: {e!r}")
+
+    result["rss"] = current_rss_mb()
+    return result
+
+
+def _session_job(args):
+    result = run_session(*args)
+    # Workers exit without atexit hooks: drain the app's write-behind buffer explicitly
+    write_behind = sys.modules.get("write_behind")
+    if write_behind is not None:
+        write_behind.get_buffer().flush()
+    return result
+
+
+# ======================================
+# 2. CONCURRENCY LEVELS
+# ======================================
+
+def run_level(concurrency, sessions, timeout, seed):
+    """Runs `sessions` simulated users with `concurrency` in flight at once."""
+    initial_scores, _ = read_library_state("case_library.txt")
+
+    start = time.perf_counter()
+    jobs = [(n, seed * 100003 + n, timeout) for n in range(sessions)]
+    # Reference the job through the importable module: AppTest swaps out __main__ in the workers
+    from load_test import _session_job
+    with ProcessPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(_session_job, jobs))
+    wall = time.perf_counter() - start
+
+    final_scores, final_text = read_library_state("case_library.txt")
+
+    # Lost writes: votes not reflected in the score, submissions missing from the file
+    expected_votes = defaultdict(int)
+    for r in results:
+        if r["voted"]:
+            expected_votes[r["voted"]] += 1
+    lost_votes = sum(
+        max(0, count - (final_scores.get(case_id, 0) - initial_scores.get(case_id, 0)))
+        for case_id, count in expected_votes.items()
+    )
+    submitted = [r["submitted"] for r in results if r["submitted"]]
+    lost_cases = sum(1 for tag in submitted if SUBMISSION_TEMPLATE.format(tag=tag) not in final_text)
+
+    timings = defaultdict(list)
+    worker_rss = defaultdict(list)
+    for r in results:
+        for step, seconds in r["timings"].items():
+            timings[step].append(seconds)
+        worker_rss[r["pid"]].append(r["rss"])
+
+    # Memory growth per worker: RSS after its first session vs after its last one
+    first = [values[0] for values in worker_rss.values()]
+    last = [values[-1] for values in worker_rss.values()]
+
+    return {
+        "concurrency": concurrency,
+        "sessions": sessions,
+        "wall": wall,
+        "timings": timings,
+        "errors": [e for r in results for e in r["errors"]],
+        "votes": sum(expected_votes.values()),
+        "lost_votes": lost_votes,
+        "submissions": len(submitted),
+        "lost_cases": lost_cases,
+        "workers": len(worker_rss),
+        "rss_first": sum(first) / len(first),
+        "rss_last": sum(last) / len(last),
+        "rss_total": sum(last),
+    }
+
+
+def wait_for_builds(directory, timeout=BUILD_WAIT_SECONDS):
+    """Waits until no RBR table build holds a lock in `directory` (True) or the timeout passes (False)."""
+    from rbr_table import BUILD_LOCK_SUFFIX
+    deadline = time.monotonic() + timeout
+    while any(name.endswith(BUILD_LOCK_SUFFIX) for name in os.listdir(directory)):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.5)
+    return True
+
+
+def print_level(report):
+    print(f"\n=== Concurrency {report['concurrency']} | {report['sessions']} sessions | "
+          f"{report['wall']:.1f}s wall ({report['sessions'] / report['wall']:.2f} sessions/s) ===")
+    print(f"{'step':<10} {'n':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for step, values in report["timings"].items():
+        print(f"{step:<10} {len(values):>4} {percentile(values, 50) * 1000:>9.1f} "
+              f"{percentile(values, 95) * 1000:>9.1f} {percentile(values, 99) * 1000:>9.1f}")
+    print(f"errors: {len(report['errors'])} | lost votes: {report['lost_votes']}/{report['votes']} | "
+          f"lost submissions: {report['lost_cases']}/{report['submissions']}")
+    print(f"worker RSS (avg of {report['workers']}): {report['rss_first']:.0f} MB -> {report['rss_last']:.0f} MB "
+          f"({report['rss_last'] - report['rss_first']:+.0f} MB), all workers: {report['rss_total']:.0f} MB")
+    for error in report["errors"][:5]:
+        print(f"   ⚠️ {error}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for streamlit_app.py")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--sessions", type=int, default=16, help="Simulated users per concurrency level")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-rerun timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    source_dir = os.path.dirname(APP_PATH)
+    original_cwd = os.getcwd()
+    # Inherited by the session workers: no app process spends the run building a lookup table
+    os.environ["EXPERT_RBR_TABLE_BUILD"] = "0"
+    for concurrency in args.concurrency:
+        with tempfile.TemporaryDirectory(prefix="expert_load_") as scratch:
+            for name in KNOWLEDGE_FILES:
+                shutil.copy(os.path.join(source_dir, name), scratch)
+            os.chdir(scratch)  # The app resolves its knowledge files relative to the cwd
+            try:
+                print_level(run_level(concurrency, args.sessions, args.timeout, args.seed))
+            finally:
+                os.chdir(original_cwd)
+                if not wait_for_builds(scratch):
+                    print(f"⚠️ An RBR table build is still running in {scratch}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
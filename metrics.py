@@ -0,0 +1,329 @@
+"""
+[METRICS REGISTRY - Prometheus Text Exposition]
+In-process counters, gauges and histograms for operations dashboards.
+
+Hot-path updates are a dict lookup plus an add under a per-metric lock;
+rendering happens only when the exposition is scraped or written.
+
+Exposition (both optional, configured by environment variables):
+    EXPERT_METRICS_PORT=9108         serve http://127.0.0.1:9108/metrics
+    EXPERT_METRICS_FILE=metrics.prom rewrite the file every EXPERT_METRICS_INTERVAL seconds (default 15)
+"""
+import bisect
+import collections
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# ======================================
+# 1. METRIC TYPES
+# ======================================
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+        return tuple(str(v) for v in labels)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = collections.defaultdict(float)
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] += amount
+
+    def value(self, *labels):
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """Set directly, or computed at scrape time by `callback` -> {label tuple: value}."""
+    type_name = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+        self.callback = callback
+
+    def set(self, value, *labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self):
+        if self.callback is not None:
+            try:
+                items = [(self._key(tuple(k)), v) for k, v in self.callback().items()]
+            except Exception as e:
+                print(f"Error collecting metric {self.name}: {e}")
+                items = []
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # key -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value, *labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def time(self, *labels):
+        """Context manager observing the elapsed seconds of the block."""
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram, self.labels = histogram, labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        self.histogram.observe(self.elapsed, *self.labels)
+        return False
+
+
+class RateWindow:
+    """Events per minute over a sliding window, e.g. diagnoses per minute."""
+
+    def __init__(self, window=60.0):
+        self.window = window
+        self._events = collections.deque()
+        self._lock = threading.Lock()
+
+    def mark(self):
+        now = time.monotonic()
+        with self._lock:
+            self._events.append(now)
+            self._trim(now)
+
+    def per_minute(self):
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            return len(self._events) * 60.0 / self.window
+
+    def _trim(self, now):
+        while self._events and now - self._events[0] > self.window:
+            self._events.popleft()
+
+
+# ======================================
+# 2. REGISTRY & EXPOSITION
+# ======================================
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        # Idempotent: Streamlit reruns and module reloads get the existing metric back
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif kwargs.get("callback") is not None:
+                metric.callback = kwargs["callback"]
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=(), callback=None):
+        return self._register(Gauge, name, documentation, labelnames, callback=callback)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep scrapes out of the app log
+
+
+def start_http_server(port, host="127.0.0.1"):
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def write_metrics_file(path):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(REGISTRY.render())
+    os.replace(tmp_path, path)
+
+
+def start_file_writer(path, interval=15.0):
+    def run():
+        while True:
+            try:
+                write_metrics_file(path)
+            except Exception as e:
+                print(f"Error writing metrics file: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name="metrics-file", daemon=True)
+    thread.start()
+    return thread
+
+
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+
+def start_exporters_from_env():
+    """Starts the HTTP and/or file exporter once per process, as configured."""
+    global _exporters_started
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+
+    port = os.environ.get("EXPERT_METRICS_PORT")
+    if port:
+        try:
+            start_http_server(int(port))
+        except OSError as e:
+            # Another worker on this box already owns the port
+            print(f"⚠️ Metrics port {port} unavailable: {e}")
+
+    path = os.environ.get("EXPERT_METRICS_FILE")
+    if path:
+        start_file_writer(path, float(os.environ.get("EXPERT_METRICS_INTERVAL", "15")))
+
+
+# ======================================
+# 3. EXPERT SYSTEM METRICS
+# ======================================
+
+DIAGNOSIS_RATE = RateWindow()
+
+DIAGNOSES = REGISTRY.counter(
+    "expert_diagnoses_total", "Completed diagnoses, one per wizard submission (session-cache hits included)")
+DIAGNOSES_PER_MINUTE = REGISTRY.gauge(
+    "expert_diagnoses_per_minute", "Diagnoses over the last 60 seconds",
+    callback=lambda: {(): DIAGNOSIS_RATE.per_minute()})
+STAGE_SECONDS = REGISTRY.histogram(
+    "expert_stage_seconds", "Latency per diagnosis stage", ["stage"])
+RESOLUTIONS = REGISTRY.counter(
+    "expert_resolutions_total", "resolve_conflict outcomes", ["primary"])
+PROMOTIONS = REGISTRY.counter(
+    "expert_case_promotions_total", "PENDING cases auto-promoted to VERIFIED")
+VOTES = REGISTRY.counter(
+    "expert_votes_total", "Feedback votes received", ["direction"])
+PARTIAL_RESULTS = REGISTRY.counter(
+    "expert_partial_results_total", "Engine results cut short by the diagnosis time budget", ["engine"])
+CACHE_REQUESTS = REGISTRY.counter(
+    "expert_cache_requests_total", "Cache lookups by cache and result", ["cache", "result"])
+
+
+def record_diagnosis(primary):
+    DIAGNOSES.inc()
+    DIAGNOSIS_RATE.mark()
+    RESOLUTIONS.inc(primary)
+
+
+def record_partial(engine):
+    PARTIAL_RESULTS.inc(engine)
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache, "hit" if hit else "miss")
@@ -0,0 +1,93 @@
+"""
+[PROMOTION WORKER - Background Auto-Promotion Scoring]
+Evaluates check_and_promote_hybrid (NLP endorsement + convergence scan) for
+voted PENDING cases on its own thread, so neither the 👍 click nor the
+write-behind flush waits for spaCy or a library scan.
+
+- Jobs are coalesced per case ID: only the latest score is evaluated
+- A positive decision is handed to `on_promote(case_id, details)`; the
+  write-behind buffer applies it as a status change in its next flush
+- Jobs still queued at shutdown are drained (bounded by a timeout)
+"""
+import threading
+
+from expert_engine import check_and_promote_hybrid, log_promotion
+from metrics import REGISTRY
+
+
+class PromotionWorker:
+    def __init__(self, on_promote):
+        self.on_promote = on_promote
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._jobs = {}      # case_id -> (score, user_features, solution, rbr_result)
+        self._busy = False
+        self._stopped = False
+        self.stats = {"evaluated": 0, "promoted": 0, "errors": 0}
+
+        REGISTRY.gauge("expert_promotion_queue", "PENDING cases waiting for promotion scoring",
+                       callback=lambda: {(): self.pending_count()})
+
+        self._worker = threading.Thread(target=self._run, name="promotion-worker", daemon=True)
+        self._worker.start()
+
+    def submit(self, case_id, score, user_features, solution, rbr_result):
+        """Queues (or replaces) the promotion evaluation of one case. Never blocks on scoring."""
+        with self._lock:
+            self._jobs[case_id] = (score, user_features, solution, rbr_result)
+            self._wakeup.notify()
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._jobs) + (1 if self._busy else 0)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._jobs and not self._stopped:
+                    self._wakeup.wait()
+                if not self._jobs:
+                    return  # Stopped and drained
+                case_id = next(iter(self._jobs))
+                job = self._jobs.pop(case_id)
+                self._busy = True
+            try:
+                self._evaluate(case_id, *job)
+            finally:
+                with self._lock:
+                    self._busy = False
+                    self._wakeup.notify_all()
+
+    def _evaluate(self, case_id, score, user_features, solution, rbr_result):
+        try:
+            should_promote, total_points, breakdown = check_and_promote_hybrid(
+                case_id, score, user_features, solution, rbr_result
+            )
+        except Exception as e:
+            print(f"Error scoring promotion of {case_id}: {e}")
+            self.stats["errors"] += 1
+            return
+        self.stats["evaluated"] += 1
+        if not should_promote:
+            return
+
+        self.stats["promoted"] += 1
+        log_promotion(case_id, score, total_points, breakdown)
+        self.on_promote(case_id, {
+            "total_points": total_points,
+            "breakdown": breakdown,
+            "case_id": case_id
+        })
+
+    def wait_idle(self, timeout=None):
+        """Blocks until every queued job has been evaluated. Returns False on timeout."""
+        with self._lock:
+            return self._wakeup.wait_for(lambda: not self._jobs and not self._busy, timeout)
+
+    def close(self, timeout=10):
+        """Stops the worker after draining the queue (or after `timeout` seconds)."""
+        with self._lock:
+            self._stopped = True
+            self._wakeup.notify_all()
+        self._worker.join(timeout=timeout)
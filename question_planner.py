@@ -0,0 +1,547 @@
+"""
+[ADAPTIVE QUESTION PLANNER - Expected Information Gain]
+Chooses the next wizard question that is expected to tell the most about the
+fault, and ends the interview as soon as the leading diagnosis is decisive.
+
+Hypotheses are the rules of rules.clp that the wizard can actually fire plus
+the matchable cases of case_library.txt (single-fault assumption). Identical
+hypotheses share one column (a case submitted ten times is one column with
+ten times the weight), and columns are grouped by diagnosis: the fault of a
+rule, the solution of a case. Information gain and the posterior stop are
+measured over those diagnoses, not over individual cases. For every
+question the planner precomputes a likelihood table P(answer | hypothesis):
+- an answer consistent with the hypothesis' expected symptom values gets the
+  bulk of the mass, an inconsistent one only EPSILON
+- hypotheses that say nothing about a question follow the answer frequencies
+  observed in the case library (Laplace-smoothed)
+- "Not sure" style answers (no fact asserted) are uninformative
+
+Asking a question is then a few small matrix products. The decision tree is
+materialized lazily: every node (answers so far) is decided once per planner
+and cached.
+
+A new version of the case library does not rebuild the planner: updated()
+returns a copy with columns appended for new hypotheses and the prior
+re-weighted (answer frequencies are refreshed by a full rebuild once the
+library has grown by REBUILD_GROWTH). The copy keeps the decision cache when
+nothing the planner uses changed. The best-case check only scores cases that
+share a feature with the answers (an inverted index), never the whole library.
+
+The interview stops when
+- an answered rule fires with CF >= DECISIVE_CF
+- a case already matches at >= DECISIVE_CASE_SCORE (CBR score)
+- one hypothesis holds >= DECISIVE_POSTERIOR of the posterior
+- no remaining question is worth MIN_INFORMATION_GAIN bits
+
+Validation replays answer sets the planner was not built from: held-out
+library cases (--holdout) and logged diagnoses (diagnosis_log.py, --log). A
+replay reports the questions asked and how often the early stop reaches the
+same diagnosis as the full answer sheet. Interviews simulated from the
+planner's own model are optimistic and only reported for comparison.
+
+Usage:
+    python question_planner.py                  # ranking, held-out and logged replays, simulation
+    python question_planner.py --sessions 5000 --holdout 0.3 --log logs/diagnoses.jsonl
+"""
+import argparse
+import copy
+import functools
+import os
+import threading
+from collections import Counter
+
+import numpy as np
+
+from diagnosis_log import LOG_PATH, iter_events
+from expert_engine import MIN_SYMPTOM_CF, get_user_features, load_case_index, score_case
+from questions import QUESTIONS, record_answer
+from rule_compiler import extract_table
+
+RULES_PATH = "rules.clp"
+LIBRARY_PATH = "case_library.txt"
+
+DECISIVE_CF = 0.9
+DECISIVE_CASE_SCORE = 90
+DECISIVE_POSTERIOR = 0.9
+MIN_INFORMATION_GAIN = 0.01  # bits
+EPSILON = 0.02               # P(inconsistent answer | hypothesis): users make mistakes
+REBUILD_GROWTH = 1.25        # Library growth since the last build that refreshes the answer frequencies
+
+def _asserts(mapping, label):
+    """True if the answer asserts a fact and adds a CBR feature (expert_engine.MIN_SYMPTOM_CF)."""
+    value, cf = mapping[label]
+    return value != "unknown" and cf > MIN_SYMPTOM_CF
+
+
+def _entropy(p, axis=-1):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terms = np.where(p > 0, -p * np.log2(p), 0.0)
+    return terms.sum(axis=axis)
+
+
+def load_rules(path=RULES_PATH):
+    """Standard rules of rules.clp as {"rule", "conditions": [(name, value)], "factor", "fault"}."""
+    with open(path, "r", encoding="utf-8") as f:
+        rows, _ = extract_table(f.read())
+    return [{
+        "rule": row["rule"],
+        "conditions": [tuple(c.split("=", 1)) for c in row["conditions"].split("; ")],
+        "factor": float(row["factor"]),
+        "fault": row["fault"],
+    } for row in rows]
+
+
+def _case_column(case):
+    """Column key and expected symptom values of a case hypothesis."""
+    expected = dict(f.split(":", 1) for f in case["features"] if ":" in f)
+    return ("case", case["solution"], frozenset(expected.items())), expected
+
+
+def _case_weights(cases):
+    """Prior weight per case column: the same 50% penalty the CBR engine gives unverified cases."""
+    weights, expected = Counter(), {}
+    for case in cases:
+        key, expected[key] = _case_column(case)
+        weights[key] += 0.5 if case["status"] == "PENDING" else 1.0
+    return weights, expected
+
+
+class MatchIndex:
+    """
+    The cases best_case() can return, indexed by feature. Of identical cases
+    (features, status, feedback) only the first in file order is kept: it wins
+    every tie, like in run_cbr_analysis.
+    """
+
+    def __init__(self, cases):
+        self.cases, self.postings, seen = [], {}, set()
+        for case in cases:
+            key = (frozenset(case["features"]), case["status"], case["feedback"])
+            if key in seen:
+                continue
+            seen.add(key)
+            for feature in case["features"]:
+                self.postings.setdefault(feature, []).append(len(self.cases))
+            self.cases.append(case)
+        self.keys = [(case["id"], case["status"], case["feedback"], frozenset(case["features"])) for case in self.cases]
+
+    def best(self, features):
+        """(score, case) of the best match; only cases sharing a feature can score above 0."""
+        candidates = sorted({i for feature in features for i in self.postings.get(feature, ())})
+        best = (0.0, None)
+        for i in candidates:
+            score, _ = score_case(features, self.cases[i])
+            if score > best[0]:
+                best = (score, self.cases[i])
+        return best
+
+
+class QuestionPlanner:
+    """
+    Likelihood tables for one version of the rules and the case library.
+    Treated as immutable once built: updated() returns a new planner.
+    """
+
+    def __init__(self, rules, cases):
+        self.all_rules = rules
+        self.questions = list(QUESTIONS)
+        self.options = {key: list(QUESTIONS[key]["mapping"]) for key in self.questions}
+
+        # Only rules every condition of which some wizard answer can assert
+        producible = {
+            (s, QUESTIONS[key]["mapping"][label][0])
+            for key in self.questions for label in self.options[key]
+            if _asserts(QUESTIONS[key]["mapping"], label)
+            for s in QUESTIONS[key]["symptoms"]
+        }
+        self.rules = [r for r in rules if all(c in producible for c in r["conditions"])]
+
+        # Answer frequencies of this library version stand in for silent hypotheses
+        feature_counts = Counter(feature for case in cases for feature in case["features"])
+        self.background = {key: self._background(key, feature_counts) for key in self.questions}
+        self.built_cases = len(cases)
+
+        self.columns = []         # {symptom: expected value} per likelihood column
+        self.column_index = {}    # (kind, label, frozenset of expected items) -> column
+        self.groups = []          # Diagnosis per group: rule fault or case solution
+        self.group_index = {}
+        self.group_of = np.zeros(0, dtype=np.intp)
+        self.likelihood = {key: np.empty((len(self.options[key]), 0)) for key in self.questions}
+
+        rule_expected = {}
+        for rule in self.rules:
+            rule_expected[("rule", rule["fault"], frozenset(rule["conditions"]))] = dict(rule["conditions"])
+        self.rule_weights = Counter(("rule", r["fault"], frozenset(r["conditions"])) for r in self.rules)
+        self._add_columns(rule_expected)
+
+        self.case_weights, case_expected = _case_weights(cases)
+        self._add_columns(case_expected)
+        self.prior = self._prior()
+        self.match_index = MatchIndex(cases)
+
+        self._decide_cached = functools.lru_cache(maxsize=8192)(self._decide)
+
+    def updated(self, cases):
+        """
+        The planner for a new version of the case library: new hypotheses get
+        columns, weights and the best-case index follow the library. Returns
+        self if nothing the planner uses changed (e.g. a rewrite that only
+        reordered lines), a full rebuild once the library has grown by REBUILD_GROWTH.
+        """
+        if len(cases) > self.built_cases * REBUILD_GROWTH:
+            return QuestionPlanner(self.all_rules, cases)
+
+        case_weights, case_expected = _case_weights(cases)
+        match_index = MatchIndex(cases)
+        if case_weights == self.case_weights and match_index.keys == self.match_index.keys:
+            return self
+
+        planner = copy.copy(self)
+        planner.columns, planner.column_index = list(self.columns), dict(self.column_index)
+        planner.groups, planner.group_index = list(self.groups), dict(self.group_index)
+        planner._add_columns({key: expected for key, expected in case_expected.items()
+                              if key not in self.column_index})
+        planner.case_weights = case_weights
+        planner.prior = planner._prior()
+        planner.match_index = match_index
+        planner._decide_cached = functools.lru_cache(maxsize=8192)(planner._decide)
+        return planner
+
+    def _add_columns(self, expected_by_key):
+        """Appends one likelihood column per new hypothesis (new arrays; readers of the old ones are unaffected)."""
+        keys = [key for key in expected_by_key if key not in self.column_index]
+        if not keys:
+            return
+        groups = []
+        for kind, label, _ in keys:
+            if label not in self.group_index:
+                self.group_index[label] = len(self.groups)
+                self.groups.append(label)
+            groups.append(self.group_index[label])
+        for key in keys:
+            self.column_index[key] = len(self.columns)
+            self.columns.append(expected_by_key[key])
+        self.group_of = np.concatenate([self.group_of, np.array(groups, dtype=np.intp)])
+        expected = [expected_by_key[key] for key in keys]
+        self.likelihood = {question: np.hstack([self.likelihood[question], self._likelihood_columns(question, expected)])
+                           for question in self.questions}
+
+    def _prior(self):
+        weights = np.zeros(len(self.columns))
+        for key, weight in list(self.rule_weights.items()) + list(self.case_weights.items()):
+            weights[self.column_index[key]] += weight
+        return weights / weights.sum()
+
+    def _background(self, key, feature_counts):
+        """Laplace-smoothed answer frequencies of a question in the case library."""
+        question = QUESTIONS[key]
+        background = np.array([
+            1.0 + sum(feature_counts.get(f"{s}:{question['mapping'][label][0]}", 0) for s in question["symptoms"])
+            for label in self.options[key]
+        ])
+        return background / background.sum()
+
+    def _likelihood_columns(self, key, hypotheses):
+        """P(option | hypothesis) as an options x hypotheses array."""
+        question = QUESTIONS[key]
+        mapping, options = question["mapping"], self.options[key]
+        values = [mapping[label][0] for label in options]
+        informative = np.array([_asserts(mapping, label) for label in options])
+        background = self.background[key]
+        uninformative_mass = background[~informative].sum()
+
+        table = np.empty((len(options), len(hypotheses)))
+        for h, expected in enumerate(hypotheses):
+            wanted = {expected[s] for s in question["symptoms"] if s in expected}
+            consistent = informative & np.array([v in wanted for v in values])
+            if not consistent.any():
+                # The hypothesis says nothing this question can confirm
+                table[:, h] = background
+                continue
+            weights = np.where(consistent, background, background * EPSILON) * informative
+            table[:, h] = np.where(informative, weights / weights.sum() * (1 - uninformative_mass), background)
+        return table
+
+    # ----------------------------------
+    # Inference over answers so far
+    # ----------------------------------
+
+    def by_group(self, weights):
+        """Sums the columns of (rows x columns) `weights` per diagnosis group."""
+        return np.stack([np.bincount(self.group_of, weights=row, minlength=len(self.groups))
+                         for row in np.atleast_2d(weights)])
+
+    def posterior(self, selections):
+        """Posterior over hypothesis columns (see by_group for diagnoses)."""
+        p = self.prior.copy()
+        for key, label in selections.items():
+            p *= self.likelihood[key][self.options[key].index(label)]
+        total = p.sum()
+        return p / total if total > 0 else self.prior.copy()
+
+    def information_gain(self, posterior, key):
+        """Expected entropy reduction (bits) of the diagnosis from asking `key`."""
+        joint = self.by_group(self.likelihood[key] * posterior[None, :])
+        p_answer = joint.sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            conditional = np.where(p_answer[:, None] > 0, joint / p_answer[:, None], 0.0)
+        return float(_entropy(self.by_group(posterior)[0]) - (p_answer * _entropy(conditional)).sum())
+
+    def fired_rules(self, selections):
+        """(cf, fault) of every rule the answers fire, CF computed like rules.clp."""
+        facts = {}
+        for key, label in selections.items():
+            mapping = QUESTIONS[key]["mapping"]
+            if _asserts(mapping, label):
+                value, cf = mapping[label]
+                for s in QUESTIONS[key]["symptoms"]:
+                    facts[s] = (value, cf)
+        fired = []
+        for rule in self.rules:
+            cfs = [facts[s][1] for s, v in rule["conditions"] if s in facts and facts[s][0] == v]
+            if len(cfs) == len(rule["conditions"]):
+                fired.append((min(cfs) * rule["factor"], rule["fault"]))
+        return sorted(fired, reverse=True)
+
+    def best_match(self, selections):
+        """(CBR score, case) of the best library match for the answers, like run_cbr_analysis."""
+        answers = {}
+        for key, label in selections.items():
+            record_answer(answers, QUESTIONS[key], label)
+        return self.match_index.best(get_user_features(answers))
+
+    def best_case(self, selections):
+        score, case = self.best_match(selections)
+        return score, case["id"] if case is not None else None
+
+    def verdict(self, selections):
+        """The diagnosis the answers lead to: the top fired rule's fault, else the best case's solution."""
+        fired = self.fired_rules(selections)
+        if fired:
+            return fired[0][1]
+        _, case = self.best_match(selections)
+        return case["solution"] if case is not None else None
+
+    # ----------------------------------
+    # Decision tree (lazily materialized)
+    # ----------------------------------
+
+    def decide(self, selections):
+        """
+        Next question for the answers given so far, or the reason to stop.
+
+        Args:
+            selections: {question key: selected answer label}
+
+        Returns:
+            dict: {"question": key | None, "stop": kind | None, "reason": str, "gain": bits, "asked": int}
+        """
+        return self._decide_cached(tuple(sorted(selections.items())))
+
+    def _decide(self, node):
+        selections = dict(node)
+        asked = len(selections)
+
+        fired = self.fired_rules(selections)
+        if fired and fired[0][0] >= DECISIVE_CF:
+            return self._stop("rule", f"rule '{fired[0][1]}' fired with CF {fired[0][0]:.2f}", asked)
+
+        case_score, case_id = self.best_case(selections)
+        if case_score >= DECISIVE_CASE_SCORE:
+            return self._stop("case", f"case {case_id} already matches at {case_score:.0f}%", asked)
+
+        posterior = self.posterior(selections)
+        diagnoses = self.by_group(posterior)[0]
+        top = int(np.argmax(diagnoses))
+        if diagnoses[top] >= DECISIVE_POSTERIOR:
+            return self._stop("posterior", f"'{self.groups[top]}' holds {diagnoses[top]:.0%} of the evidence", asked)
+
+        remaining = [key for key in self.questions if key not in selections]
+        if not remaining:
+            return self._stop("exhausted", "all questions answered", asked)
+
+        gains = [(self.information_gain(posterior, key), -i, key) for i, key in enumerate(remaining)]
+        gain, _, key = max(gains)  # Ties go to the earlier wizard question
+        if gain < MIN_INFORMATION_GAIN:
+            return self._stop("gain", "no remaining question changes the diagnosis", asked)
+        return {"question": key, "stop": None, "reason": None, "gain": gain, "asked": asked}
+
+    @staticmethod
+    def _stop(kind, reason, asked):
+        return {"question": None, "stop": kind, "reason": reason, "gain": 0.0, "asked": asked}
+
+
+_planner = None
+_planner_key = None
+_planner_cases_version = None
+_planner_lock = threading.Lock()
+
+
+def get_planner(rules_path, rules_version, cases, cases_version):
+    """Process-wide planner: rebuilt when the rules change, updated() when the case library does."""
+    global _planner, _planner_key, _planner_cases_version
+    key = (rules_path, rules_version)
+    with _planner_lock:
+        if _planner is None or _planner_key != key:
+            _planner = QuestionPlanner(load_rules(rules_path), cases)
+            _planner_key = key
+        elif _planner_cases_version != cases_version:
+            _planner = _planner.updated(cases)
+        _planner_cases_version = cases_version
+        return _planner
+
+
+# ======================================
+# VALIDATION (OFFLINE REPORT)
+# ======================================
+
+def simulate(planner, sessions=2000, seed=0):
+    """
+    Interviews users drawn from the planner's own model: pick a hypothesis from
+    the prior, answer every question from its likelihood column. Optimistic by
+    construction; see replay() for answer sets the planner was not built from.
+
+    Returns:
+        tuple: (questions asked per session: np.ndarray, {stop reason kind: count})
+    """
+    rng = np.random.default_rng(seed)
+    asked, reasons = [], {}
+    for _ in range(sessions):
+        h = rng.choice(len(planner.prior), p=planner.prior)
+        selections = {}
+        while True:
+            decision = planner.decide(selections)
+            if decision["question"] is None:
+                break
+            key = decision["question"]
+            column = planner.likelihood[key][:, h]
+            selections[key] = planner.options[key][rng.choice(len(column), p=column / column.sum())]
+        asked.append(len(selections))
+        reasons[decision["stop"]] = reasons.get(decision["stop"], 0) + 1
+    return np.array(asked), reasons
+
+
+def answer_sheet(planner, facts, rng):
+    """
+    A full answer sheet ({question key: label}) for known facts.
+
+    Args:
+        facts: {symptom: (value, cf | None)}; cf None matches any answer asserting the value
+        rng: answers to questions the facts say nothing about: the uninformative
+             answer if the question has one, else drawn from the library's answer frequencies
+    """
+    sheet = {}
+    for key in planner.questions:
+        mapping, options = QUESTIONS[key]["mapping"], planner.options[key]
+        known = [facts[s] for s in QUESTIONS[key]["symptoms"] if s in facts]
+        matching = [label for label in options if _asserts(mapping, label) and any(
+            mapping[label][0] == value and (cf is None or abs(mapping[label][1] - cf) < 1e-9) for value, cf in known)]
+        silent = [label for label in options if not _asserts(mapping, label)]
+        if matching:
+            sheet[key] = matching[0]
+        elif silent:
+            sheet[key] = silent[0]
+        else:
+            sheet[key] = options[rng.choice(len(options), p=planner.background[key])]
+    return sheet
+
+
+def held_out_sheets(cases, fraction=0.2, seed=0):
+    """
+    Splits the library: (training cases, answer sheets of the held-out cases as facts).
+    At least one case is held out, and one kept, whenever the library has two cases.
+    """
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(cases))
+    n_held = min(max(1, round(len(cases) * fraction)), len(cases) - 1) if len(cases) > 1 else 0
+    held = set(order[:n_held].tolist())
+    training = [case for i, case in enumerate(cases) if i not in held]
+    facts = [{s: (v, None) for s, v in (f.split(":", 1) for f in cases[i]["features"] if ":" in f)}
+             for i in sorted(held)]
+    return training, facts
+
+
+def logged_facts(path=LOG_PATH):
+    """The asserted facts of every logged diagnosis, as {symptom: (value, cf)}."""
+    for event in iter_events(path):
+        facts = {symptom: (value, cf) for symptom, value, cf in event.get("facts", [])}
+        if facts:
+            yield facts
+
+
+def replay(planner, facts_list, seed=0):
+    """
+    Interviews answered from fixed answer sheets.
+
+    Returns:
+        dict: asked (np.ndarray), agreement (share of interviews whose early stop reaches
+              the verdict of the full sheet), reasons ({stop reason kind: count})
+    """
+    rng = np.random.default_rng(seed)
+    asked, agreed, reasons = [], 0, {}
+    for facts in facts_list:
+        sheet = answer_sheet(planner, facts, rng)
+        selections = {}
+        while True:
+            decision = planner.decide(selections)
+            if decision["question"] is None:
+                break
+            selections[decision["question"]] = sheet[decision["question"]]
+        asked.append(len(selections))
+        agreed += planner.verdict(selections) == planner.verdict(sheet)
+        reasons[decision["stop"]] = reasons.get(decision["stop"], 0) + 1
+    return {"asked": np.array(asked), "agreement": agreed / max(len(asked), 1), "reasons": reasons}
+
+
+def print_replay(title, result, n_questions):
+    asked = result["asked"]
+    if not len(asked):
+        print(f"\n{title}: no answer sets")
+        return
+    print(f"\n{title}: {len(asked)} interviews, {asked.mean():.2f} questions on average "
+          f"(median {np.median(asked):.0f}, max {asked.max()}) vs {n_questions} in the fixed wizard")
+    print(f"   same diagnosis as the full answer sheet: {result['agreement']:.1%}")
+    for kind, count in sorted(result["reasons"].items(), key=lambda item: -item[1]):
+        print(f"   stopped by {kind}: {count / len(asked):.1%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Adaptive question ordering report")
+    parser.add_argument("--rules", default=RULES_PATH)
+    parser.add_argument("--library", default=LIBRARY_PATH)
+    parser.add_argument("--log", default=LOG_PATH, help="Diagnosis event log to replay (skipped if missing)")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Share of library cases held out for replay")
+    parser.add_argument("--sessions", type=int, default=2000, help="Simulated interviews")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rules = load_rules(args.rules)
+    cases = load_case_index(args.library)
+    planner = QuestionPlanner(rules, cases)
+    n_rules = len(planner.rules)
+    print(f"🧭 {len(planner.groups)} diagnoses in {len(planner.columns)} hypotheses "
+          f"({n_rules} of {len(rules)} rules reachable from the wizard, {len(cases)} cases), "
+          f"{len(planner.questions)} questions")
+
+    print("\nFirst-question ranking (expected information gain):")
+    for key in sorted(planner.questions, key=lambda k: -planner.information_gain(planner.prior, k)):
+        print(f"   {planner.information_gain(planner.prior, key):.3f} bits  {QUESTIONS[key]['prompt']}")
+
+    if args.holdout > 0:
+        training, held_out = held_out_sheets(cases, args.holdout, args.seed)
+        print_replay(f"Held-out cases ({len(held_out)} of {len(cases)}, planner built without them)",
+                     replay(QuestionPlanner(rules, training), held_out, args.seed), len(planner.questions))
+    if os.path.exists(args.log):
+        print_replay(f"Logged diagnoses ({args.log})",
+                     replay(planner, logged_facts(args.log), args.seed), len(planner.questions))
+
+    asked, reasons = simulate(planner, args.sessions, args.seed)
+    print(f"\nSimulated {args.sessions} interviews from the planner's own model (optimistic): "
+          f"{asked.mean():.2f} questions on average (median {np.median(asked):.0f}, max {asked.max()})")
+    for kind, count in sorted(reasons.items(), key=lambda item: -item[1]):
+        print(f"   stopped by {kind}: {count / args.sessions:.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
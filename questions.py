@@ -0,0 +1,290 @@
+"""
+[DIAGNOSTIC WIZARD - Question Catalog]
+Every wizard question with its answer mapping, shared by the fixed six-step
+wizard, the adaptive question planner (question_planner.py) and offline tools.
+
+Each question:
+    key       stable identifier of the question
+    prompt    radio label shown to the user
+    mapping   {answer label: (CLIPS value, confidence)}
+    symptoms  symptom names the answer is recorded under (one answer may feed several rules)
+
+Answers dict (session state and the engines): {symptom: answer code}, where
+the code is the position of the selected label in the question's mapping.
+The labels and (CLIPS value, confidence) pairs live once per process in the
+read-only ANSWER_REGISTRY, so a session holds a few small integers instead
+of a copy of every mapping per symptom.
+"""
+from dataclasses import dataclass
+from types import MappingProxyType
+
+WIZARD_STEPS = [
+    # ------------------------------------------------------------------
+    # STEP 1: VISUAL & DISPLAY
+    # ------------------------------------------------------------------
+    {
+        "step": 1,
+        "title": "🖥️ Display & Visuals",
+        "caption": "Reference: Kiray & Sianturi (2020), Qurashi et al. (2017)",
+        "questions": [
+            {
+                "key": "display",
+                "prompt": "What do you see on the screen?",
+                # Mapping logic for Display Rules
+                "mapping": {
+                    "Lines, black blocks, or artifacts":     ("artifacts", 1.0),
+                    "Distorted / Corrupted image":           ("distorted", 1.0),
+                    "Completely black screen":               ("black", 1.0),
+                    "Normal clear display":                  ("clear", 1.0),
+                    "Not sure":                              ("unknown", 0.0)
+                },
+                "symptoms": ["screen-visuals"],
+            },
+        ],
+    },
+    # ------------------------------------------------------------------
+    # STEP 2: AUDIO SYSTEM
+    # ------------------------------------------------------------------
+    {
+        "step": 2,
+        "title": "🔊 Audio System",
+        "caption": "Reference: Jern et al. (2021), Bassil (2012)",
+        "questions": [
+            {
+                # Q1: Volume Bar (Source A)
+                "key": "volume",
+                "prompt": "Check Volume Mixer. Is the bar moving?",
+                "mapping": {
+                    "Green bar is moving":           ("bar-moving", 1.0), # Changed from 'moving'
+                    "Bar moves irregularly/randomly": ("bar-irregular", 1.0),
+                    "Bar is frozen/gray":            ("bar-frozen", 1.0),
+                    "Not sure":                      ("unknown", 0.0)
+                },
+                "symptoms": ["volume-bar", "volume-behavior"],  # volume-behavior: for interference rule
+            },
+            {
+                # Q2: Sound Output (Source A)
+                "key": "sound",
+                "prompt": "What do you hear?",
+                "mapping": {
+                    "No sound at all":               ("sound-none", 1.0), # Changed from 'none'
+                    "Scratchy, distorted, rattling": ("sound-distorted", 1.0),
+                    "Sound is normal":               ("sound-normal", 1.0)
+                },
+                "symptoms": ["sound-output", "sound-quality"],
+            },
+            {
+                # Q3: Hardware Detection (Source B)
+                "key": "sound-card",
+                "prompt": "Is the Sound Card detected in Device Manager?",
+                "mapping": {
+                    "Sound card NOT detected / Red X": ("not-detected", 1.0),
+                    "Sound card is detected":          ("detected", 1.0),
+                    "I can't check this":              ("unknown", 0.0)
+                },
+                "symptoms": ["sound-card-status"],
+            },
+        ],
+    },
+    # ------------------------------------------------------------------
+    # STEP 3: THERMAL & CPU
+    # ------------------------------------------------------------------
+    {
+        "step": 3,
+        "title": "🌡️ Thermal & CPU",
+        "caption": "Reference: Chinnathampy et al. (2025), Miracle (2024)",
+        "questions": [
+            {
+                # Q1: Temperature (Source A)
+                "key": "temperature",
+                "prompt": "CPU Temperature Status:",
+                "mapping": {
+                    "Above 85°C (Measured)":         ("temp-above-85", 1.0),
+                    "Rising rapidly/Unusual":        ("temp-rising-rapidly", 0.8),
+                    "Hot to the touch":              ("temp-above-85", 0.6),
+                    "Normal":                        ("temp-normal", 1.0),
+                    "Not sure":                      ("unknown", 0.0)
+                },
+                "symptoms": ["cpu-temp", "temp-pattern"],
+            },
+            {
+                # Q2: Boot Warning (Source B)
+                "key": "boot-warning",
+                "prompt": "Did you see a CPU Overheat warning at boot?",
+                "mapping": {
+                    "Yes, 'CPU Overheat' warning":   ("warn-cpu-overheat", 1.0), # Changed from 'cpu-overheat'
+                    "No warning":                    ("none", 1.0)
+                },
+                "symptoms": ["boot-warning"],
+            },
+        ],
+    },
+    # ------------------------------------------------------------------
+    # STEP 4: POWER & STARTUP (Source B Heavy)
+    # ------------------------------------------------------------------
+    {
+        "step": 4,
+        "title": "⚡ Power & Startup",
+        "caption": "Reference: Miracle (2024), Laksana (2024)",
+        "questions": [
+            {
+                # Q1: Lights
+                "key": "power-lights",
+                "prompt": "Power LED Status:",
+                "mapping": {
+                    "Lights are ON":       ("light-on", 1.0), # Added 'light-' prefix
+                    "No lights (OFF)":     ("light-off", 1.0),
+                    "Not sure":            ("unknown", 0.0)
+                },
+                "symptoms": ["power-lights"],
+            },
+            {
+                # Q2: Fans
+                "key": "fans",
+                "prompt": "Fan Status:",
+                "mapping": {
+                    "Silent (No noise)":   ("fan-silent", 1.0), # Added 'fan-' prefix
+                    "Spinning / Noisy":    ("fan-spinning", 1.0),
+                    "Not sure":            ("unknown", 0.0)
+                },
+                "symptoms": ["fan-status"],
+            },
+            {
+                # Q3: System State (For Laksana rules)
+                "key": "system-state",
+                "prompt": "System Behavior:",
+                "mapping": {
+                    "Computer is On but Black Screen (No Boot)": ("on-no-boot", 1.0),
+                    "Computer shuts down randomly":              ("random-shutdowns", 1.0), # For PSU aging
+                    "Completely dead":                           ("shutdown", 1.0),
+                    "Boots normally":                            ("booted", 1.0)
+                },
+                "symptoms": ["system-state", "system-behavior"],
+            },
+        ],
+    },
+    # ------------------------------------------------------------------
+    # STEP 5: STORAGE & BEEPS & MESSAGES
+    # ------------------------------------------------------------------
+    {
+        "step": 5,
+        "title": "💾 Storage, Beeps & Errors",
+        "caption": "Reference: Bassil (2012), Jern et al. (2021)",
+        "questions": [
+            {
+                # Q1: Error Messages (Source A & B)
+                "key": "error-message",
+                "prompt": "Do you see any text errors?",
+                "mapping": {
+                    "DISK BOOT FAILURE":             ("disk-boot-failure", 1.0),
+                    "SMART Warning / Backup":        ("smart-warning", 1.0),
+                    "IDE Drive Not Ready":           ("ide-not-ready", 1.0),
+                    "No specific error":             ("none", 1.0)
+                },
+                "symptoms": ["error-message", "hdd-status"],  # hdd-status: reuse mapping
+            },
+            {
+                # Q2: Beep Codes (Source B)
+                "key": "beeps",
+                "prompt": "Beep Code Pattern:",
+                "mapping": {
+                    "One very short beep":           ("very-short", 1.0),
+                    "One short beep":                ("short", 1.0),
+                    "Long beeps":                    ("long", 1.0),
+                    "Repeated long beeps":           ("repeated-long", 1.0),
+                    "Continuous tone":               ("continuous", 1.0),
+                    "No beeps":                      ("none", 1.0)
+                },
+                "symptoms": ["beep-duration", "beep-code"],
+            },
+            {
+                # Q3: Age (Source A)
+                "key": "device-age",
+                "prompt": "Device Age:",
+                "mapping": {
+                    "Old (> 3 years)":               ("old", 1.0),
+                    "New (< 3 years)":               ("new", 1.0)
+                },
+                # boot-behavior: placeholder, mapped in step 4 actually
+                "symptoms": ["system-age", "device-age", "boot-behavior"],
+            },
+        ],
+    },
+]
+
+WIZARD_STEP_COUNT = len(WIZARD_STEPS) + 1  # + the diagnosis step
+
+# Flat view in wizard order: key -> question
+QUESTIONS = {q["key"]: q for step in WIZARD_STEPS for q in step["questions"]}
+
+
+@dataclass(frozen=True)
+class AnswerChoices:
+    """Immutable answer table of one question, shared by all of its symptoms."""
+    key: str
+    labels: tuple               # code -> answer label
+    outcomes: tuple             # code -> (CLIPS value, confidence)
+    codes: MappingProxyType     # answer label -> code
+
+
+def _answer_choices(question):
+    labels = tuple(question["mapping"])
+    return AnswerChoices(
+        key=question["key"],
+        labels=labels,
+        outcomes=tuple(tuple(question["mapping"][label]) for label in labels),
+        codes=MappingProxyType({label: code for code, label in enumerate(labels)}),
+    )
+
+
+def _answer_registry():
+    registry = {}
+    for question in QUESTIONS.values():
+        choices = _answer_choices(question)
+        for symptom in question["symptoms"]:
+            registry[symptom] = choices
+    return MappingProxyType(registry)
+
+
+# Process-global, read-only: symptom -> AnswerChoices of the question it belongs to
+ANSWER_REGISTRY = _answer_registry()
+
+
+def step_info(step):
+    """The catalog entry for a fixed wizard step (1-5)."""
+    return WIZARD_STEPS[step - 1]
+
+
+def question_step(key):
+    """The wizard step a question belongs to (for its title and references)."""
+    return next(step for step in WIZARD_STEPS if any(q["key"] == key for q in step["questions"]))
+
+
+def record_answer(answers, question, selection):
+    """Stores one selection (as its answer code) under every symptom the question feeds."""
+    code = ANSWER_REGISTRY[question["symptoms"][0]].codes[selection]
+    for symptom in question["symptoms"]:
+        answers[symptom] = code
+
+
+def resolve_answer(symptom, code):
+    """(CLIPS value, confidence) of a recorded answer, or None for an unknown symptom/code."""
+    choices = ANSWER_REGISTRY.get(symptom)
+    if choices is None or not 0 <= code < len(choices.outcomes):
+        return None
+    return choices.outcomes[code]
+
+
+def answer_label(symptom, code):
+    """The answer label a recorded code stands for."""
+    return ANSWER_REGISTRY[symptom].labels[code]
+
+
+def answered_questions(answers):
+    """question key -> selected label, recovered from the engines' answers dict."""
+    selections = {}
+    for key, question in QUESTIONS.items():
+        symptom = question["symptoms"][0]
+        if symptom in answers:
+            selections[key] = answer_label(symptom, answers[symptom])
+    return selections
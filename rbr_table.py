@@ -0,0 +1,409 @@
+"""
+[PRECOMPUTED RBR LOOKUP TABLE]
+Every wizard question has a handful of answers (plus "not answered"), so the
+whole answer space is a finite product and every RBR outcome can be computed
+ahead of time. Step 6 then answers RBR with one table lookup instead of a
+CLIPS run.
+
+The raw product is 72.6M answer sheets, but an answer only matters to the
+rules through the facts it asserts that some rule condition matches. Answers
+asserting the same such facts (with the same CF) form one class per question,
+and one representative sheet per class combination goes through the reference
+path (assert_fact_with_mapping + env.run() via run_rbr_analysis). Facts no
+rule matches cannot fire anything, and their relative order does not change
+the agenda, so the table is exact for sheets recorded in wizard order.
+
+The table is keyed by the SHA-256 of rules.clp and of the question catalog;
+a stale table is never used. Builds run in at most MAX_WORKERS worker
+processes (EXPERT_RBR_TABLE_WORKERS), fed a bounded number of chunks at a
+time. With EXPERT_RBR_TABLE_BUILD=1 the knowledge base (knowledge_base.py)
+starts one in the background when rules.clp changes; otherwise it only picks
+up a table built from the command line. The table, its temp file and the
+build lock live next to the rules file, not in the working directory.
+
+Usage:
+    python rbr_table.py build [--workers N]
+    python rbr_table.py verify [--samples 2000]      # random sheets vs CLIPS
+"""
+import argparse
+import contextlib
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import clips
+
+from case_reader import atomic_writer
+from expert_engine import MIN_SYMPTOM_CF, run_rbr_analysis
+from questions import ANSWER_REGISTRY, QUESTIONS, record_answer, resolve_answer
+from rule_compiler import extract_table
+
+RULES_PATH = "rules.clp"
+TABLE_PATH = "rbr_table.json"
+BUILD_LOCK_SUFFIX = ".building"
+STALE_LOCK_SECONDS = 600
+CHUNK_SIZE = 64
+MAX_WORKERS = 4  # A build shares the machine with the Streamlit workers
+
+
+def table_path_for(rules_path, path=TABLE_PATH):
+    """`path` anchored on the directory of the rules file (absolute paths are kept)."""
+    return os.path.join(os.path.dirname(os.path.abspath(rules_path)), path)
+
+
+def default_workers():
+    return max(1, min(os.cpu_count() or 1, int(os.environ.get("EXPERT_RBR_TABLE_WORKERS", MAX_WORKERS))))
+
+
+def file_sha256(path):
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def catalog_sha256():
+    """Identity of the question catalog: keys, symptoms and mappings in wizard order."""
+    catalog = [(key, q["symptoms"], list(q["mapping"].items())) for key, q in QUESTIONS.items()]
+    return hashlib.sha256(json.dumps(catalog).encode("utf-8")).hexdigest()
+
+
+# ======================================
+# 1. ANSWER CLASSES
+# ======================================
+
+def rule_conditions(rules_text):
+    """
+    (symptom, value) pairs any rule can match, or None if some rule matches
+    symptoms in a way the table extraction cannot see (then every fact counts).
+    """
+    rows, meta_source = extract_table(rules_text)
+    if "(symptom" in meta_source:
+        return None
+    return {tuple(c.split("=", 1)) for row in rows for c in row["conditions"].split("; ")}
+
+
+def answer_classes(conditions):
+    """
+    Groups each question's answers by the rule-relevant facts they assert.
+
+    Returns:
+        list: per question in wizard order, {"key", "labels": {label: class},
+              "representatives": [label | None per class]}; class 0 asserts nothing
+              relevant and is also the class of an unanswered question
+    """
+    classes = []
+    for key, question in QUESTIONS.items():
+        projections = {frozenset(): 0}
+        representatives = [None]
+        labels = {}
+        for label, (value, cf) in question["mapping"].items():
+            asserted = cf > MIN_SYMPTOM_CF
+            facts = frozenset(
+                (s, value, cf) for s in question["symptoms"]
+                if asserted and (conditions is None or (s, value) in conditions)
+            )
+            if facts not in projections:
+                projections[facts] = len(representatives)
+                representatives.append(label)
+            labels[label] = projections[facts]
+        classes.append({"key": key, "labels": labels, "representatives": representatives})
+    return classes
+
+
+def representative_answers(classes, combo):
+    """The answers dict (wizard order) for one class combination."""
+    answers = {}
+    for question_classes, class_index in zip(classes, combo):
+        label = question_classes["representatives"][class_index]
+        if label is not None:
+            record_answer(answers, QUESTIONS[question_classes["key"]], label)
+    return answers
+
+
+# ======================================
+# 2. PARALLEL BUILD
+# ======================================
+
+_worker_env = None
+_worker_classes = None
+
+
+def _init_worker(rules_path, classes):
+    global _worker_env, _worker_classes
+    _worker_env = clips.Environment()
+    _worker_env.load(rules_path)
+    _worker_classes = classes
+
+
+def _run_chunk(combos):
+    outcomes = []
+    for combo in combos:
+        diagnoses, _ = run_rbr_analysis(_worker_env, representative_answers(_worker_classes, combo))
+        outcomes.append([{k: (float(v) if k == "cf" else str(v)) for k, v in d.items()} for d in diagnoses])
+    return outcomes
+
+
+def iter_chunks(classes):
+    """The class combinations in index order, CHUNK_SIZE at a time, generated lazily."""
+    combos = itertools.product(*(range(len(c["representatives"])) for c in classes))
+    while True:
+        chunk = list(itertools.islice(combos, CHUNK_SIZE))
+        if not chunk:
+            return
+        yield chunk
+
+
+def bounded_map(pool, fn, items, in_flight):
+    """pool.map() that submits at most `in_flight` items ahead of the results it yields, in order."""
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def build_table(rules_path=RULES_PATH, workers=None):
+    """
+    Runs every class combination through CLIPS in worker processes
+    (default_workers() unless `workers` is given).
+
+    Returns:
+        dict: JSON-serializable table
+    """
+    with open(rules_path, "rb") as f:
+        rules_bytes = f.read()
+    classes = answer_classes(rule_conditions(rules_bytes.decode("utf-8")))
+
+    workers = workers or default_workers()
+
+    outcome_ids, outcomes, index = {}, [], []
+    # spawn: never fork a process that may be running other threads
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker, initargs=(rules_path, classes)) as pool:
+        for chunk_outcomes in bounded_map(pool, _run_chunk, iter_chunks(classes), 4 * workers):
+            for diagnoses in chunk_outcomes:
+                key = json.dumps(diagnoses, sort_keys=True)
+                if key not in outcome_ids:
+                    outcome_ids[key] = len(outcomes)
+                    outcomes.append(diagnoses)
+                index.append(outcome_ids[key])
+
+    return {
+        "rules_sha256": hashlib.sha256(rules_bytes).hexdigest(),
+        "catalog_sha256": catalog_sha256(),
+        "questions": [{"key": c["key"], "labels": c["labels"], "classes": len(c["representatives"])} for c in classes],
+        "outcomes": outcomes,
+        "index": index,
+    }
+
+
+def save_table(table, path=TABLE_PATH):
+    # Temp file next to the table, whatever the working directory
+    with atomic_writer(path, "w", encoding="utf-8") as f:
+        json.dump(table, f, separators=(",", ":"))
+
+
+def build_lock_path(path=TABLE_PATH):
+    return os.path.abspath(path) + BUILD_LOCK_SUFFIX
+
+
+def build_in_progress(path=TABLE_PATH):
+    try:
+        return time.time() - os.path.getmtime(build_lock_path(path)) < STALE_LOCK_SECONDS
+    except OSError:
+        return False
+
+
+def start_build_process(rules_path=RULES_PATH, path=TABLE_PATH, workers=None):
+    """
+    Builds the table in a separate process (the caller never blocks). Relative
+    paths are passed on absolute, so the build does not depend on the caller's
+    working directory. Returns the Popen or None.
+    """
+    if build_in_progress(path):
+        return None
+    return subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "build", "--rules", os.path.abspath(rules_path),
+         "--output", os.path.abspath(path), "--workers", str(workers or default_workers())],
+        stdout=subprocess.DEVNULL,
+    )
+
+
+# ======================================
+# 3. LOOKUP (STEP 6)
+# ======================================
+
+class RbrLookup:
+    """O(1) RBR results for answers recorded from the question catalog."""
+
+    def __init__(self, table):
+        self.rules_sha256 = table["rules_sha256"]
+        self.outcomes = table["outcomes"]
+        self.index = table["index"]
+        # Per question: (first symptom, answer code -> class, class count)
+        self.questions = []
+        self._position = {}
+        for position, entry in enumerate(table["questions"]):
+            symptoms = QUESTIONS[entry["key"]]["symptoms"]
+            code_classes = [entry["labels"].get(label, 0) for label in ANSWER_REGISTRY[symptoms[0]].labels]
+            self.questions.append((symptoms[0], code_classes, entry["classes"]))
+            self._position.update((s, position) for s in symptoms)
+
+    @classmethod
+    def load(cls, path=TABLE_PATH, rules_sha256=None):
+        """The table at `path` if it matches the rules and the question catalog, else None."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                table = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if table.get("catalog_sha256") != catalog_sha256():
+            return None
+        if rules_sha256 is not None and table.get("rules_sha256") != rules_sha256:
+            return None
+        return cls(table)
+
+    def lookup(self, answers):
+        """
+        Same result as run_rbr_analysis(env, answers), or None if the answers
+        are not covered (foreign symptoms, or not in wizard order).
+
+        Returns:
+            tuple | None: (diagnoses sorted by cf desc: list of dict, triggered_symptoms: list of dict)
+        """
+        # Ties in CF are ordered by firing order, which follows assertion order
+        last = -1
+        for symptom in answers:
+            position = self._position.get(symptom)
+            if position is None or position < last:
+                return None
+            last = position
+
+        code = 0
+        for symptom, code_classes, n_classes in self.questions:
+            answer_code = answers.get(symptom)
+            class_index = 0 if answer_code is None else code_classes[answer_code]
+            code = code * n_classes + class_index
+
+        diagnoses = [dict(d) for d in self.outcomes[self.index[code]]]
+        return diagnoses, triggered_symptoms(answers)
+
+
+def triggered_symptoms(answers):
+    """get_triggered_symptoms() of the env the answers would produce, without CLIPS."""
+    triggered = []
+    for symptom, answer_code in answers.items():
+        outcome = resolve_answer(symptom, answer_code)
+        if outcome is None:
+            continue
+        value, cf = outcome
+        if cf > 0.5:  # Asserted (> 0.2) and reported (> 0.5)
+            triggered.append({"name": symptom, "value": value, "cf": cf})
+    return triggered
+
+
+# ======================================
+# 4. VERIFICATION & CLI
+# ======================================
+
+def random_answers(rng, order=None):
+    """A random (possibly partial) answer sheet in wizard order."""
+    answers = {}
+    for key in order or QUESTIONS:
+        question = QUESTIONS[key]
+        labels = list(question["mapping"]) + [None]
+        label = rng.choice(labels)
+        if label is not None:
+            record_answer(answers, question, label)
+    return answers
+
+
+def verify(lookup, rules_path=RULES_PATH, samples=2000, seed=0):
+    """
+    Returns:
+        tuple: (mismatching answer sheets, seconds in CLIPS, seconds in the table)
+    """
+    env = clips.Environment()
+    env.load(rules_path)
+    rng = random.Random(seed)
+    mismatches, clips_time, table_time = [], 0.0, 0.0
+    for _ in range(samples):
+        answers = random_answers(rng)
+        start = time.perf_counter()
+        expected = run_rbr_analysis(env, answers)
+        clips_time += time.perf_counter() - start
+        start = time.perf_counter()
+        actual = lookup.lookup(answers)
+        table_time += time.perf_counter() - start
+        if actual != expected:
+            mismatches.append(answers)
+    return mismatches, clips_time, table_time
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precomputed RBR lookup table over the wizard answer space")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build")
+    p_build.add_argument("--rules", default=RULES_PATH)
+    p_build.add_argument("--output", default=TABLE_PATH)
+    p_build.add_argument("--workers", type=int, help=f"default: EXPERT_RBR_TABLE_WORKERS or {MAX_WORKERS}")
+
+    p_verify = sub.add_parser("verify")
+    p_verify.add_argument("--rules", default=RULES_PATH)
+    p_verify.add_argument("--table", default=TABLE_PATH)
+    p_verify.add_argument("--samples", type=int, default=2000)
+    p_verify.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        lock_path = build_lock_path(args.output)
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if build_in_progress(args.output):
+                print(f"Another build of {args.output} is running.")
+                return 1
+            fd = os.open(lock_path, os.O_CREAT | os.O_WRONLY | os.O_TRUNC)  # Take over a stale lock
+        os.close(fd)
+        try:
+            start = time.perf_counter()
+            table = build_table(args.rules, args.workers)
+            save_table(table, args.output)
+        finally:
+            # A build that took over this one's stale lock may have removed it already
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(lock_path)
+        sheets = 1
+        for q in table["questions"]:
+            sheets *= len(q["labels"]) + 1
+        print(f"📦 {len(table['index'])} answer classes ({sheets} answer sheets) -> "
+              f"{len(table['outcomes'])} distinct outcomes in {time.perf_counter() - start:.1f}s -> {args.output}")
+        return 0
+
+    lookup = RbrLookup.load(args.table, file_sha256(args.rules))
+    if lookup is None:
+        print(f"{args.table} is missing or stale; run: python rbr_table.py build")
+        return 1
+    mismatches, clips_time, table_time = verify(lookup, args.rules, args.samples, args.seed)
+    print(f"Checked {args.samples} random answer sheets: {len(mismatches)} mismatches")
+    print(f"   CLIPS {clips_time / args.samples * 1e6:.0f} µs/sheet vs table {table_time / args.samples * 1e6:.1f} µs/sheet "
+          f"({clips_time / table_time:.0f}x)")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,383 @@
+"""
+[DATA-DRIVEN RULE COMPILER]
+Builds the CLIPS rule base from a compact knowledge table.
+
+Knowledge source (rules_table.csv), one row per expert rule:
+    rule, conditions, factor, fault, solution, category, citation
+    conditions = "symptom-name=value; other-name=value"
+
+Single-condition rows are compiled into (rule-map ...) lookup facts matched by
+one generic rule, so the Rete network grows by facts instead of rules.
+Multi-condition rows are emitted as explicit defrules and meta-rules
+(rules_meta.clp) are copied verbatim.
+
+Usage:
+    python rule_compiler.py extract                # rules.clp -> rules_table.csv + rules_meta.clp
+    python rule_compiler.py compile                # -> rules_compiled.clp
+    python rule_compiler.py check                  # compiled vs hand-written equivalence
+"""
+import argparse
+import csv
+import itertools
+import random
+import re
+
+SOURCE_RULES_PATH = "rules.clp"
+TABLE_PATH = "rules_table.csv"
+META_RULES_PATH = "rules_meta.clp"
+COMPILED_RULES_PATH = "rules_compiled.clp"
+
+TABLE_COLUMNS = ["rule", "conditions", "factor", "fault", "solution", "category", "citation"]
+
+TEMPLATES = """\
+(deftemplate symptom
+   (slot name) (slot value) (slot cf (type FLOAT) (default 1.0)))
+
+(deftemplate diagnosis
+   (slot fault) (slot solution) (slot category) (slot citation) (slot cf (type FLOAT) (default 0.0)))
+"""
+
+LOOKUP_RULE = """\
+(deftemplate rule-map
+   (slot rule) (slot name) (slot value) (slot factor (type FLOAT))
+   (slot fault) (slot solution) (slot category) (slot citation))
+
+;; Generic rule: one symptom -> diagnosis, driven by the rule-map lookup facts
+(defrule apply-rule-map
+   (symptom (name ?n) (value ?v) (cf ?c1))
+   (rule-map (name ?n) (value ?v) (factor ?f) (fault ?fault) (solution ?s) (category ?cat) (citation ?cit))
+   =>
+   (assert (diagnosis (fault ?fault) (solution ?s) (category ?cat) (citation ?cit) (cf (* ?c1 ?f)))))
+"""
+
+
+# ======================================
+# 1. CLIPS SOURCE READER (S-EXPRESSIONS)
+# ======================================
+
+_TOKEN = re.compile(r'\s+|;[^\n]*|"(?:\\.|[^"\\])*"|[()]|[^\s()";]+')
+
+
+def parse_sexprs(text):
+    """
+    Parses CLIPS source into top-level forms.
+
+    Returns:
+        list: [(form, start, end), ...] where form is a nested list of atoms
+              and start/end are character offsets into text
+    """
+    forms, stack, start = [], [], 0
+    for match in _TOKEN.finditer(text):
+        tok = match.group()
+        if tok[0].isspace() or tok[0] == ";":
+            continue
+        if tok == "(":
+            if not stack:
+                start = match.start()
+            stack.append([])
+        elif tok == ")":
+            form = stack.pop()
+            if stack:
+                stack[-1].append(form)
+            else:
+                forms.append((form, start, match.end()))
+        elif stack:
+            stack[-1].append(tok)
+    return forms
+
+
+def _unquote(atom):
+    return atom[1:-1].replace('\\"', '"') if atom.startswith('"') else atom
+
+
+def _quote(value):
+    return '"' + value.replace('"', '\\"') + '"'
+
+
+def _slots(pattern):
+    """(symptom (name x) (value y)) -> {"name": "x", "value": "y"}"""
+    return {slot[0]: slot[1] for slot in pattern[1:] if isinstance(slot, list) and len(slot) == 2}
+
+
+def _cf_factor(expr, cf_vars):
+    """Returns the constant factor of a cf expression, or None if it is not a simple product."""
+    if expr == cf_vars[0] and len(cf_vars) == 1:
+        return 1.0
+    if isinstance(expr, list) and len(expr) == 3 and expr[0] == "*":
+        base, factor = expr[1], expr[2]
+        if len(cf_vars) == 1 and base != cf_vars[0]:
+            return None
+        if len(cf_vars) > 1 and base != ["min"] + cf_vars:
+            return None
+        try:
+            return float(factor)
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+def rule_to_row(form):
+    """
+    Converts a defrule form into a table row if it has the standard shape:
+    symptom patterns only, optional (bind ?final_cf ...), one diagnosis assert.
+
+    Returns:
+        dict | None: Table row, or None for rules that must stay explicit (meta-rules)
+    """
+    if len(form) < 2 or form[0] != "defrule":
+        return None
+    name, body = form[1], form[2:]
+    if "=>" not in body:
+        return None
+    split = body.index("=>")
+    lhs, rhs = body[:split], body[split + 1:]
+
+    conditions, cf_vars = [], []
+    for pattern in lhs:
+        if not isinstance(pattern, list) or not pattern or pattern[0] != "symptom":
+            return None
+        slots = _slots(pattern)
+        if set(slots) != {"name", "value", "cf"} or not slots["cf"].startswith("?"):
+            return None
+        conditions.append(f"{slots['name']}={slots['value']}")
+        cf_vars.append(slots["cf"])
+
+    bound = {}
+    asserted = None
+    for action in rhs:
+        if isinstance(action, list) and action[:1] == ["bind"] and len(action) == 3:
+            bound[action[1]] = action[2]
+        elif isinstance(action, list) and action[:1] == ["assert"] and len(action) == 2 and asserted is None:
+            asserted = action[1]
+        else:
+            return None
+    if not asserted or asserted[0] != "diagnosis":
+        return None
+
+    slots = _slots(asserted)
+    if set(slots) != {"fault", "solution", "category", "citation", "cf"}:
+        return None
+    cf_expr = bound.get(slots["cf"], slots["cf"]) if isinstance(slots["cf"], str) else slots["cf"]
+    factor = _cf_factor(cf_expr, cf_vars)
+    if factor is None:
+        return None
+
+    return {
+        "rule": name,
+        "conditions": "; ".join(conditions),
+        "factor": repr(factor),
+        "fault": _unquote(slots["fault"]),
+        "solution": _unquote(slots["solution"]),
+        "category": _unquote(slots["category"]),
+        "citation": _unquote(slots["citation"]),
+    }
+
+
+def extract_table(source_text):
+    """
+    Splits a hand-written rule base into table rows and verbatim meta-rules.
+
+    Returns:
+        tuple: (rows: list of dict, meta_source: str)
+    """
+    rows, meta = [], []
+    for form, start, end in parse_sexprs(source_text):
+        if form and form[0] == "deftemplate":
+            continue  # Templates are emitted by the compiler
+        row = rule_to_row(form)
+        if row:
+            rows.append(row)
+        else:
+            meta.append(source_text[start:end])
+    return rows, "\n\n".join(meta) + "\n" if meta else ""
+
+
+# ======================================
+# 2. TABLE -> CLIPS COMPILER
+# ======================================
+
+def load_table(path=TABLE_PATH):
+    """Reads and validates the knowledge table."""
+    rows = []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for line_no, row in enumerate(csv.DictReader(f), start=2):
+            conditions = [c.strip() for c in row["conditions"].split(";") if c.strip()]
+            if not conditions or any("=" not in c for c in conditions):
+                raise ValueError(f"{path}:{line_no}: bad conditions '{row['conditions']}'")
+            try:
+                factor = float(row["factor"])
+            except ValueError:
+                raise ValueError(f"{path}:{line_no}: bad factor '{row['factor']}'")
+            rows.append({
+                "rule": row["rule"].strip(),
+                "conditions": [tuple(part.strip() for part in c.split("=", 1)) for c in conditions],
+                "factor": factor,
+                "fault": row["fault"],
+                "solution": row["solution"],
+                "category": row["category"],
+                "citation": row["citation"],
+            })
+    return rows
+
+
+def _diagnosis_slots(row):
+    return (f"(fault {_quote(row['fault'])}) (solution {_quote(row['solution'])}) "
+            f"(category {_quote(row['category'])}) (citation {_quote(row['citation'])})")
+
+
+def compile_rules(rows, meta_source=""):
+    """
+    Compiles table rows (+ verbatim meta-rules) into CLIPS source.
+
+    Returns:
+        str: Rule base text loadable with env.load()
+    """
+    single = [r for r in rows if len(r["conditions"]) == 1]
+    multi = [r for r in rows if len(r["conditions"]) > 1]
+
+    out = [";; Generated by rule_compiler.py from " + TABLE_PATH + " - do not edit by hand", "", TEMPLATES]
+
+    if single:
+        out.append(LOOKUP_RULE)
+        out.append("(deffacts rule-maps")
+        for row in single:
+            name, value = row["conditions"][0]
+            out.append(f"   (rule-map (rule {row['rule']}) (name {name}) (value {value}) "
+                       f"(factor {row['factor']!r}) {_diagnosis_slots(row)})")
+        out.append(")\n")
+
+    for row in multi:
+        patterns = "\n".join(f"   (symptom (name {name}) (value {value}) (cf ?c{i}))"
+                             for i, (name, value) in enumerate(row["conditions"], start=1))
+        cf_vars = " ".join(f"?c{i}" for i in range(1, len(row["conditions"]) + 1))
+        out.append(f"(defrule {row['rule']}\n{patterns}\n   =>\n"
+                   f"   (assert (diagnosis {_diagnosis_slots(row)} (cf (* (min {cf_vars}) {row['factor']!r})))))\n")
+
+    if meta_source.strip():
+        out.append(";; Meta-rules (copied verbatim from " + META_RULES_PATH + ")")
+        out.append(meta_source.strip() + "\n")
+
+    return "\n".join(out)
+
+
+# ======================================
+# 3. EQUIVALENCE CHECK
+# ======================================
+
+def _diagnoses(env, symptoms):
+    env.reset()
+    for name, value, cf in symptoms:
+        env.assert_string(f"(symptom (name {name}) (value {value}) (cf {cf}))")
+    env.run()
+    return sorted(
+        (f["fault"], f["solution"], f["category"], f["citation"], round(f["cf"], 9))
+        for f in env.facts() if f.template.name == "diagnosis"
+    )
+
+
+def generate_symptom_sets(rows, samples=500, seed=0):
+    """
+    Symptom sets exercising every rule: each rule's own conditions, every pair
+    of rules combined, plus random mixes of all known symptom values and CFs.
+    """
+    rng = random.Random(seed)
+    cfs = [1.0, 0.8, 0.6, 0.3]
+    pairs = sorted({c for r in rows for c in r["conditions"]})
+
+    sets = [[(n, v, 1.0) for n, v in r["conditions"]] for r in rows]
+    for a, b in itertools.combinations(rows, 2):
+        sets.append([(n, v, rng.choice(cfs)) for n, v in a["conditions"] + b["conditions"]])
+    for _ in range(samples):
+        picked = rng.sample(pairs, rng.randint(1, min(8, len(pairs))))
+        sets.append([(n, v, rng.choice(cfs)) for n, v in picked])
+    return sets
+
+
+def check_equivalence(reference_path=SOURCE_RULES_PATH, compiled_path=COMPILED_RULES_PATH,
+                      table_path=TABLE_PATH, samples=500):
+    """
+    Loads both rule bases into separate CLIPS environments and compares the
+    diagnoses fired for the same symptom sets.
+
+    Returns:
+        tuple: (checked: int, mismatches: list of (symptoms, reference, compiled))
+    """
+    import clips
+
+    reference, compiled = clips.Environment(), clips.Environment()
+    reference.load(reference_path)
+    compiled.load(compiled_path)
+
+    mismatches = []
+    symptom_sets = generate_symptom_sets(load_table(table_path), samples)
+    for symptoms in symptom_sets:
+        expected, actual = _diagnoses(reference, symptoms), _diagnoses(compiled, symptoms)
+        if expected != actual:
+            mismatches.append((symptoms, expected, actual))
+    return len(symptom_sets), mismatches
+
+
+# ======================================
+# 4. COMMAND LINE
+# ======================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile the CLIPS rule base from a knowledge table.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_extract = sub.add_parser("extract", help="Seed the table from a hand-written rule base")
+    p_extract.add_argument("--source", default=SOURCE_RULES_PATH)
+    p_extract.add_argument("--table", default=TABLE_PATH)
+    p_extract.add_argument("--meta", default=META_RULES_PATH)
+
+    p_compile = sub.add_parser("compile")
+    p_compile.add_argument("--table", default=TABLE_PATH)
+    p_compile.add_argument("--meta", default=META_RULES_PATH)
+    p_compile.add_argument("-o", "--output", default=COMPILED_RULES_PATH)
+
+    p_check = sub.add_parser("check")
+    p_check.add_argument("--reference", default=SOURCE_RULES_PATH)
+    p_check.add_argument("--compiled", default=COMPILED_RULES_PATH)
+    p_check.add_argument("--table", default=TABLE_PATH)
+    p_check.add_argument("--samples", type=int, default=500)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "extract":
+        with open(args.source, "r", encoding="utf-8") as f:
+            rows, meta = extract_table(f.read())
+        with open(args.table, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=TABLE_COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+        with open(args.meta, "w", encoding="utf-8") as f:
+            f.write(meta)
+        print(f"📄 Extracted {len(rows)} table rules -> {args.table}, meta-rules -> {args.meta}")
+        return 0
+
+    if args.command == "compile":
+        rows = load_table(args.table)
+        try:
+            with open(args.meta, "r", encoding="utf-8") as f:
+                meta = f.read()
+        except FileNotFoundError:
+            meta = ""
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(compile_rules(rows, meta))
+        single = sum(1 for r in rows if len(r["conditions"]) == 1)
+        print(f"⚙️ Compiled {len(rows)} rules: {single} lookup facts + 1 generic rule, "
+              f"{len(rows) - single} explicit rules -> {args.output}")
+        return 0
+
+    checked, mismatches = check_equivalence(args.reference, args.compiled, args.table, args.samples)
+    if mismatches:
+        print(f"❌ {len(mismatches)}/{checked} symptom sets diagnose differently")
+        for symptoms, expected, actual in mismatches[:10]:
+            print(f"   {symptoms}\n     reference: {expected}\n     compiled:  {actual}")
+        return 1
+    print(f"✅ Compiled rule base matches the reference on {checked} symptom sets")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
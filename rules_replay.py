@@ -0,0 +1,414 @@
+"""
+[RULE-BASE A/B REPLAY - Baseline vs Candidate rules.clp]
+Replays symptom sets through two rule-base versions before a changed
+rules.clp is deployed, and reports what would change for the user and
+what it costs.
+
+Symptom sets:
+- recorded: the facts of every logged diagnosis (diagnosis_log.py), each
+  distinct set replayed once and weighted by how often it occurred
+- generated: rule_compiler.generate_symptom_sets over the rules of both versions
+
+Both rule files are loaded once in the calling process first: a candidate
+that does not load is reported (RuleLoadError) before any worker starts.
+Each version is then loaded into its own CLIPS environments in worker
+processes (chunks of both versions run side by side). The CBR match is computed once
+per symptom set and resolve_conflict is applied to both RBR results, so the
+report shows:
+- top-fault changes and CF deltas of the ranked diagnoses
+- resolution flips (primary engine or recommendation)
+- per-version inference time (mean / p95 per set) and rule firings
+
+Usage:
+    python rules_replay.py candidate.clp                       # rules.clp vs candidate.clp
+    python rules_replay.py candidate.clp --baseline old.clp --source log
+    python rules_replay.py candidate.clp --samples 2000 --workers 4 --examples 20
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import clips
+import numpy as np
+
+from diagnosis_log import LOG_PATH, iter_events
+from expert_engine import assert_symptoms, load_case_index, resolve_conflict, run_cbr_analysis, symptom_features
+from rule_compiler import extract_table, generate_symptom_sets
+
+RULES_PATH = "rules.clp"
+LIBRARY_PATH = "case_library.txt"
+
+CHUNK_SIZE = 200
+CF_TOLERANCE = 1e-9
+SOURCES = ("all", "log", "generated")
+
+
+# ======================================
+# 1. SYMPTOM SETS
+# ======================================
+
+def recorded_symptom_sets(log_path=LOG_PATH):
+    """
+    Distinct fact sets of the logged diagnoses.
+
+    Returns:
+        list of (symptoms: list of (name, value, cf), weight: int)
+    """
+    counts = Counter()
+    for event in iter_events(log_path):
+        facts = event.get("facts")
+        if facts:
+            counts[tuple(sorted((name, value, float(cf)) for name, value, cf in facts))] += 1
+    return [(list(symptoms), weight) for symptoms, weight in counts.most_common()]
+
+
+def table_rows(rules_path):
+    """The table-shaped rules of a rule base, conditions as (name, value) pairs."""
+    with open(rules_path, "r", encoding="utf-8") as f:
+        rows, _ = extract_table(f.read())
+    return [dict(row, conditions=[tuple(part.strip() for part in c.split("=", 1))
+                                  for c in row["conditions"].split(";") if c.strip()])
+            for row in rows]
+
+
+def generated_symptom_sets(baseline_path, candidate_path, samples=500, seed=0):
+    """Rule-exercising symptom sets covering the rules of both versions (weight 1 each)."""
+    rows, seen = [], set()
+    for row in table_rows(baseline_path) + table_rows(candidate_path):
+        key = tuple(row["conditions"])
+        if key not in seen:
+            seen.add(key)
+            rows.append(row)
+    return [(symptoms, 1) for symptoms in generate_symptom_sets(rows, samples, seed)]
+
+
+# ======================================
+# 2. WORKERS
+# ======================================
+
+class RuleLoadError(ValueError):
+    """A rule file that CLIPS cannot load."""
+
+
+class _Silence(clips.Router):
+    """Swallows what the rules print (printout t ...), which would interleave across workers."""
+
+    def __init__(self):
+        super().__init__("replay-silence", 40)
+
+    def query(self, name):
+        return name == "stdout"
+
+    def write(self, name, message):
+        pass
+
+
+class _Capture(clips.Router):
+    """Collects everything CLIPS writes (load errors included) instead of printing it."""
+
+    def __init__(self):
+        super().__init__("replay-capture", 40)
+        self.messages = []
+
+    def query(self, name):
+        return True
+
+    def write(self, name, message):
+        self.messages.append(message)
+
+
+_worker_envs = {}
+
+
+def check_rule_files(paths):
+    """
+    Loads every rule file once in this process, so a broken one is reported
+    here instead of as an unpicklable CLIPS error in a worker (BrokenProcessPool).
+    Raises RuleLoadError.
+    """
+    for path in paths:
+        if not os.path.isfile(path):
+            raise RuleLoadError(f"{path}: no such rule file")
+        env = clips.Environment()
+        capture = _Capture()
+        env.add_router(capture)
+        try:
+            env.load(path)
+        except clips.CLIPSError as e:
+            message = " ".join("".join(capture.messages).split()) or str(e)
+            raise RuleLoadError(f"{path} does not load: {message}") from None
+
+
+def _worker_env(rules_path):
+    # One environment per rule version per worker process, loaded on first use
+    env = _worker_envs.get(rules_path)
+    if env is None:
+        env = clips.Environment()
+        try:
+            env.load(rules_path)
+        except clips.CLIPSError as e:
+            # CLIPSError does not pickle back to the parent; a changed file still fails cleanly
+            raise RuleLoadError(f"{rules_path} does not load: {' '.join(str(e).split())}") from None
+        env.add_router(_Silence())
+        _worker_envs[rules_path] = env
+    return env
+
+
+def _replay_chunk(rules_path, chunk):
+    """
+    Returns:
+        list of (diagnoses sorted by cf desc, rules fired, seconds) per symptom set
+    """
+    env = _worker_env(rules_path)
+    outcomes = []
+    for symptoms in chunk:
+        start = time.perf_counter()
+        env.reset()
+        assert_symptoms(env, symptoms)
+        fired = env.run()
+        diagnoses = [{k: (float(v) if k == "cf" else str(v)) for k, v in dict(fact).items()}
+                     for fact in env.facts() if fact.template.name == "diagnosis"]
+        diagnoses.sort(key=lambda d: d["cf"], reverse=True)
+        outcomes.append((diagnoses, fired, time.perf_counter() - start))
+    return outcomes
+
+
+def replay(versions, symptom_sets, workers=None):
+    """
+    Runs every symptom set through every rule version in worker processes.
+
+    Args:
+        versions: rule file paths
+        symptom_sets: list of symptom lists
+
+    Returns:
+        dict: rules path -> list of (diagnoses, fired, seconds), in symptom-set order
+    """
+    chunks = [symptom_sets[i:i + CHUNK_SIZE] for i in range(0, len(symptom_sets), CHUNK_SIZE)]
+    versions = list(dict.fromkeys(versions))  # The same file given twice runs once
+    results = {path: [] for path in versions}
+    # spawn: never fork a process that may be running other threads
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                             mp_context=multiprocessing.get_context("spawn")) as pool:
+        # Interleaved, so both versions run side by side on the same inputs
+        futures = [(path, pool.submit(_replay_chunk, path, chunk)) for chunk in chunks for path in versions]
+        for path, future in futures:
+            results[path].extend(future.result())
+    return results
+
+
+# ======================================
+# 3. COMPARISON
+# ======================================
+
+def cf_deltas(baseline, candidate):
+    """fault -> candidate CF - baseline CF for every fault whose best CF changed (absent = 0)."""
+    best_a, best_b = {}, {}
+    for diagnoses, best in ((baseline, best_a), (candidate, best_b)):
+        for d in diagnoses:
+            best[d["fault"]] = max(best.get(d["fault"], 0.0), d["cf"])
+    deltas = {}
+    for fault in best_a.keys() | best_b.keys():
+        delta = best_b.get(fault, 0.0) - best_a.get(fault, 0.0)
+        if abs(delta) > CF_TOLERANCE:
+            deltas[fault] = delta
+    return deltas
+
+
+def _verdict(diagnoses, cbr_result, cbr_score):
+    top = diagnoses[0] if diagnoses else None
+    return resolve_conflict(top, top["cf"] if top else 0.0, cbr_result, cbr_score)
+
+
+def compare(symptom_sets, baseline, candidate, cbr_matches):
+    """
+    Diffs the per-set outcomes of both versions.
+
+    Args:
+        symptom_sets: list of (symptoms, weight)
+        baseline, candidate: replay() results for each version
+        cbr_matches: per set (cbr_result, cbr_score)
+
+    Returns:
+        list of dict: one entry per symptom set that diagnoses or resolves differently
+    """
+    changes = []
+    for (symptoms, weight), (diag_a, _, _), (diag_b, _, _), (cbr_result, cbr_score) in zip(
+            symptom_sets, baseline, candidate, cbr_matches):
+        top_a = diag_a[0]["fault"] if diag_a else None
+        top_b = diag_b[0]["fault"] if diag_b else None
+        deltas = cf_deltas(diag_a, diag_b)
+        verdict_a = _verdict(diag_a, cbr_result, cbr_score)
+        verdict_b = _verdict(diag_b, cbr_result, cbr_score)
+        primary_flip = verdict_a["primary"] != verdict_b["primary"]
+        recommendation_flip = verdict_a["recommendation"] != verdict_b["recommendation"]
+        if top_a == top_b and not deltas and not primary_flip and not recommendation_flip:
+            continue
+        changes.append({
+            "symptoms": symptoms,
+            "weight": weight,
+            "top": (top_a, top_b),
+            "top_cf": (diag_a[0]["cf"] if diag_a else 0.0, diag_b[0]["cf"] if diag_b else 0.0),
+            "cf_deltas": deltas,
+            "primary": (verdict_a["primary"], verdict_b["primary"]),
+            "primary_flip": primary_flip,
+            "recommendation_flip": recommendation_flip,
+        })
+    return changes
+
+
+def cost_summary(outcomes, weights):
+    """Inference time and rule firings of one version, weighted like the traffic."""
+    fired = np.array([o[1] for o in outcomes], dtype=np.float64)
+    seconds = np.array([o[2] for o in outcomes], dtype=np.float64)
+    w = np.asarray(weights, dtype=np.float64)
+    total = w.sum() or 1.0
+    return {
+        "sets": len(outcomes),
+        "seconds": float(seconds @ w),
+        "mean_ms": float(seconds @ w / total * 1000),
+        "p95_ms": float(np.percentile(seconds, 95) * 1000) if len(seconds) else 0.0,
+        "firings": int(fired @ w),
+        "mean_firings": float(fired @ w / total),
+    }
+
+
+def run_replay(baseline_path=RULES_PATH, candidate_path=None, source="all", log_path=LOG_PATH,
+               library_path=LIBRARY_PATH, samples=500, workers=None):
+    """
+    [REPLAY ENTRY POINT]
+    Replays the selected symptom sets through both versions and diffs them.
+
+    Returns:
+        dict: symptom-set counts, changes (see compare), cost per version, elapsed seconds
+
+    Raises:
+        RuleLoadError: a rule file is missing or does not load
+    """
+    start = time.perf_counter()
+    check_rule_files((baseline_path, candidate_path))
+    symptom_sets = []
+    counts = {"recorded": 0, "recorded_events": 0, "generated": 0}
+    if source in ("all", "log"):
+        recorded = recorded_symptom_sets(log_path)
+        symptom_sets += recorded
+        counts["recorded"] = len(recorded)
+        counts["recorded_events"] = sum(weight for _, weight in recorded)
+    if source in ("all", "generated"):
+        generated = generated_symptom_sets(baseline_path, candidate_path, samples)
+        symptom_sets += generated
+        counts["generated"] = len(generated)
+
+    sets = [symptoms for symptoms, _ in symptom_sets]
+    results = replay((baseline_path, candidate_path), sets, workers)
+
+    # The CBR side is identical for both versions: one match per distinct feature set
+    cases = load_case_index(library_path)
+    matches = {}
+    cbr_matches = []
+    for symptoms in sets:
+        key = frozenset(symptom_features(symptoms))
+        if key not in matches:
+            matches[key] = run_cbr_analysis(set(key), cases)
+        cbr_matches.append(matches[key])
+
+    weights = [weight for _, weight in symptom_sets]
+    return {
+        "counts": counts,
+        "weights": sum(weights),
+        "changes": compare(symptom_sets, results[baseline_path], results[candidate_path], cbr_matches),
+        "cost": {path: cost_summary(results[path], weights) for path in (baseline_path, candidate_path)},
+        "seconds": time.perf_counter() - start,
+    }
+
+
+# ======================================
+# 4. REPORT
+# ======================================
+
+def print_report(report, baseline_path, candidate_path, examples=10):
+    counts, changes, total = report["counts"], report["changes"], report["weights"] or 1
+    print(f"🔁 Replay: {baseline_path} (A) vs {candidate_path} (B)")
+    print(f"   {counts['recorded']} recorded symptom sets ({counts['recorded_events']} diagnoses), "
+          f"{counts['generated']} generated, in {report['seconds']:.1f}s")
+
+    def share(predicate):
+        weight = sum(c["weight"] for c in changes if predicate(c))
+        return f"{weight} ({weight / total * 100:.1f}%)"
+
+    print("\nDiagnosis changes (recorded sets weighted by how often they occurred)")
+    print(f"   any change:           {share(lambda c: True)}")
+    print(f"   top fault changed:    {share(lambda c: c['top'][0] != c['top'][1])}")
+    print(f"   CF changed:           {share(lambda c: bool(c['cf_deltas']))}")
+    print(f"   primary engine flip:  {share(lambda c: c['primary_flip'])}")
+    print(f"   recommendation flip:  {share(lambda c: c['recommendation_flip'])}")
+
+    flips = Counter()
+    for c in changes:
+        if c["primary_flip"]:
+            flips[c["primary"]] += c["weight"]
+    for (a, b), weight in flips.most_common():
+        print(f"      {a} -> {b}: {weight}")
+
+    fault_deltas = {}
+    for c in changes:
+        for fault, delta in c["cf_deltas"].items():
+            fault_deltas.setdefault(fault, []).append((delta, c["weight"]))
+    if fault_deltas:
+        print("\nCF deltas per fault (B - A)")
+        print(f"{'fault':<40} {'sets':>6} {'mean':>8} {'min':>8} {'max':>8}")
+        ranked = sorted(fault_deltas.items(), key=lambda item: -sum(w for _, w in item[1]))
+        for fault, entries in ranked[:20]:
+            deltas = np.array([d for d, _ in entries])
+            w = np.array([w for _, w in entries], dtype=np.float64)
+            print(f"{fault[:40]:<40} {int(w.sum()):>6} {float(deltas @ w / w.sum()):>+8.3f} "
+                  f"{deltas.min():>+8.3f} {deltas.max():>+8.3f}")
+
+    print("\nCost per version")
+    print(f"{'':<3} {'time s':>8} {'mean ms':>8} {'p95 ms':>8} {'firings':>9} {'per set':>8}")
+    for label, path in (("A", baseline_path), ("B", candidate_path)):
+        cost = report["cost"][path]
+        print(f"{label:<3} {cost['seconds']:>8.2f} {cost['mean_ms']:>8.3f} {cost['p95_ms']:>8.3f} "
+              f"{cost['firings']:>9} {cost['mean_firings']:>8.2f}")
+
+    if changes and examples:
+        print(f"\nMost frequent changes (top {examples})")
+        for c in sorted(changes, key=lambda c: -c["weight"])[:examples]:
+            facts = ", ".join(f"{name}={value}@{cf:g}" for name, value, cf in c["symptoms"])
+            print(f"   [{c['weight']}x] {facts}")
+            print(f"      top: {c['top'][0]} ({c['top_cf'][0]:.2f}) -> {c['top'][1]} ({c['top_cf'][1]:.2f}); "
+                  f"verdict: {c['primary'][0]} -> {c['primary'][1]}")
+            if c["cf_deltas"]:
+                print("      cf: " + ", ".join(f"{fault} {delta:+.3f}" for fault, delta in sorted(c["cf_deltas"].items())))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay symptom sets through two rule-base versions.")
+    parser.add_argument("candidate", help="changed rule file (B)")
+    parser.add_argument("--baseline", default=RULES_PATH, help="deployed rule file (A)")
+    parser.add_argument("--source", choices=SOURCES, default="all")
+    parser.add_argument("--log", default=LOG_PATH, help="diagnosis event log to replay")
+    parser.add_argument("--library", default=LIBRARY_PATH)
+    parser.add_argument("--samples", type=int, default=500, help="random symptom mixes added to the generated sets")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--examples", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    try:
+        report = run_replay(args.baseline, args.candidate, args.source, args.log, args.library,
+                            args.samples, args.workers)
+    except RuleLoadError as e:
+        print(f"❌ {e}")
+        return 1
+    if not report["weights"]:
+        print("⚠️ No symptom sets to replay (empty log? try --source generated)")
+        return 1
+    print_report(report, args.baseline, args.candidate, args.examples)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,177 @@
+"""
+[SHARED WORD VECTORS]
+Exports the en_core_web_md vector table once to memory-mapped .npy files so
+every Streamlit / worker process can attach to the same read-only pages
+instead of loading its own copy of the spaCy model.
+
+Layout of the export directory:
+    vectors.npy   float32 [rows x dim]   the vector table
+    keys.npy      uint64  [n]            sorted 64-bit hashes of the vocabulary strings
+    rows.npy      int32   [n]            vector row for each key
+
+Similarity mirrors spaCy's Doc.similarity for a vectors-only model: the
+document vector is the mean of its token vectors (OOV tokens count as zero)
+and the score is their cosine. Tokenization is a regex approximation of
+spaCy's English tokenizer.
+
+Usage:
+    python shared_vectors.py export                    # needs spaCy + en_core_web_md once
+    python shared_vectors.py check "text one" "text two"
+"""
+import argparse
+import hashlib
+import os
+import re
+
+import numpy as np
+
+SHARED_VECTORS_DIR = os.environ.get("EXPERT_SHARED_VECTORS", "word_vectors")
+DEFAULT_MODEL = "en_core_web_md"
+
+_TOKEN = re.compile(r"\w+(?:'\w+)?|[^\w\s]")
+
+
+def key_hash(text):
+    """Stable 64-bit hash of a vocabulary string (independent of spaCy's StringStore)."""
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def tokenize(text):
+    return _TOKEN.findall(text)
+
+
+# ======================================
+# 1. EXPORT (ONCE, NEEDS SPACY)
+# ======================================
+
+def export_vectors(model=DEFAULT_MODEL, out_dir=SHARED_VECTORS_DIR):
+    """
+    Writes the model's vector table and key index to out_dir.
+
+    Returns:
+        dict: {"rows", "dim", "keys", "bytes"}
+    """
+    import spacy
+
+    nlp = spacy.load(model, exclude=["tagger", "parser", "ner", "lemmatizer", "attribute_ruler", "senter"])
+    vectors = nlp.vocab.vectors
+    entries = ((nlp.vocab.strings[key], row) for key, row in vectors.key2row.items())
+    return write_vectors(entries, vectors.data, out_dir)
+
+
+def write_vectors(entries, data, out_dir=SHARED_VECTORS_DIR):
+    """
+    Writes a vector table and its key index in the export layout.
+
+    Args:
+        entries: (vocabulary string, vector row) pairs
+        data: rows x dim vector table
+
+    Returns:
+        dict: {"rows", "dim", "keys", "bytes"}
+    """
+    hashes, rows = [], []
+    for text, row in entries:
+        hashes.append(key_hash(text))
+        rows.append(row)
+
+    keys = np.array(hashes, dtype=np.uint64)
+    order = np.argsort(keys, kind="stable")
+    keys, rows = keys[order], np.array(rows, dtype=np.int32)[order]
+    # Different strings hashing to one key would make lookups ambiguous: keep the first in entry order
+    keep = np.concatenate(([True], keys[1:] != keys[:-1]))
+    keys, rows = keys[keep], rows[keep]
+
+    data = np.ascontiguousarray(data, dtype=np.float32)
+
+    os.makedirs(out_dir, exist_ok=True)
+    for name, array in (("vectors.npy", data), ("keys.npy", keys), ("rows.npy", rows)):
+        tmp_path = os.path.join(out_dir, f".{name}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, os.path.join(out_dir, name))
+
+    return {"rows": data.shape[0], "dim": data.shape[1], "keys": len(keys),
+            "bytes": data.nbytes + keys.nbytes + rows.nbytes}
+
+
+# ======================================
+# 2. ATTACH (EVERY PROCESS, READ-ONLY)
+# ======================================
+
+class SharedVectors:
+    """Read-only view of an exported vector table; pages are shared via the OS page cache."""
+
+    def __init__(self, directory=SHARED_VECTORS_DIR):
+        self.vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+        self.keys = np.load(os.path.join(directory, "keys.npy"), mmap_mode="r")
+        self.rows = np.load(os.path.join(directory, "rows.npy"), mmap_mode="r")
+
+    def token_rows(self, tokens):
+        """Vector row per token, -1 for out-of-vocabulary tokens."""
+        if not tokens:
+            return np.empty(0, dtype=np.int64)
+        hashes = np.array([key_hash(t) for t in tokens], dtype=np.uint64)
+        pos = np.minimum(np.searchsorted(self.keys, hashes), len(self.keys) - 1)
+        found = self.keys[pos] == hashes
+        return np.where(found, self.rows[pos], -1)
+
+    def doc_vector(self, text):
+        """Mean of the token vectors, OOV tokens counted as zero vectors (like spaCy)."""
+        tokens = tokenize(text)
+        vector = np.zeros(self.vectors.shape[1], dtype=np.float32)
+        if not tokens:
+            return vector
+        rows = self.token_rows(tokens)
+        known = rows[rows >= 0]
+        if len(known):
+            vector += np.asarray(self.vectors[np.sort(known)]).sum(axis=0)
+        return vector / len(tokens)
+
+    def similarity(self, text1, text2):
+        """Cosine similarity of the two document vectors (0.0 if either has no vector)."""
+        v1, v2 = self.doc_vector(text1), self.doc_vector(text2)
+        norm = float(np.linalg.norm(v1) * np.linalg.norm(v2))
+        if norm == 0:
+            return 0.0
+        return float(np.dot(v1, v2) / norm)
+
+
+def attach(directory=SHARED_VECTORS_DIR):
+    """Returns a SharedVectors view, or None if no export exists."""
+    if not os.path.exists(os.path.join(directory, "vectors.npy")):
+        return None
+    return SharedVectors(directory)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export / inspect memory-mapped word vectors")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_export = sub.add_parser("export")
+    p_export.add_argument("--model", default=DEFAULT_MODEL)
+    p_export.add_argument("--out", default=SHARED_VECTORS_DIR)
+
+    p_check = sub.add_parser("check")
+    p_check.add_argument("text1")
+    p_check.add_argument("text2")
+    p_check.add_argument("--dir", default=SHARED_VECTORS_DIR)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        info = export_vectors(args.model, args.out)
+        print(f"📦 Exported {info['rows']} vectors x {info['dim']} dims, {info['keys']} keys "
+              f"({info['bytes'] / 1e6:.0f} MB) -> {args.out}")
+        return 0
+
+    vectors = attach(args.dir)
+    if vectors is None:
+        print(f"No exported vectors in {args.dir}; run: python shared_vectors.py export")
+        return 1
+    print(f"Similarity: {vectors.similarity(args.text1.lower(), args.text2.lower()):.4f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,402 @@
+"""
+[SEMANTIC SIMILARITY BACKENDS]
+Pluggable text similarity behind semantic_similarity() and the NLP
+endorsement score (expert_engine.py). A backend has
+
+    name          registry key
+    description   shown in the UI ("NLP Semantic Analysis: Active (...)")
+    similarity(text1, text2) -> float   cosine similarity of the (lowercased) texts
+
+Backends:
+    shared    memory-mapped en_core_web_md vectors (shared_vectors.py export)
+    spacy     in-process spaCy en_core_web_md
+    hashing   built-in, NumPy only: TF-IDF weighted feature-hashing vectors of
+              word unigrams + bigrams, IDF fitted on the case library and the
+              rule solutions when the backend is first used, and refitted
+              when the knowledge base reloads the library
+
+Selection: EXPERT_SIMILARITY_BACKEND = auto (default: shared, then spacy) |
+shared | spacy | hashing | none. Without a backend the endorsement score
+falls back to string matching. The endorsement thresholds were set for spaCy
+vectors; run the benchmark before switching a deployment to `hashing`.
+
+Usage:
+    python similarity_backends.py benchmark            # speed + agreement vs spaCy on solution pairs
+    python similarity_backends.py check "text one" "text two" --backend hashing
+"""
+import argparse
+import functools
+import math
+import os
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from rule_compiler import SOURCE_RULES_PATH, extract_table
+from shared_vectors import attach as attach_shared_vectors
+
+LIBRARY_PATH = "case_library.txt"
+
+HASH_BITS = 18          # 262,144 buckets; collisions are rare for a repair-text vocabulary
+VECTOR_CACHE = 4096     # Vectorized texts kept per process (RBR solutions repeat)
+
+# (similarity threshold, endorsement points), highest first. Set for spaCy document vectors
+SPACY_TIERS = ((0.85, 50), (0.65, 30), (0.45, 15))
+# Lexical TF-IDF cosines run much lower for paraphrases (short rule vs long case solutions);
+# override with EXPERT_SIMILARITY_TIERS="t50,t30,t15", e.g. from `benchmark` against spaCy
+HASHING_TIERS = ((0.5, 50), (0.3, 30), (0.15, 15))
+
+_WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+STOP_WORDS = frozenset("""
+a an and are as at be by for from if in into is it its of on or the then to via with
+""".split())
+
+
+# ======================================
+# 1. BACKENDS
+# ======================================
+
+class SharedVectorsBackend:
+    name = "shared"
+    description = "shared en_core_web_md vectors"
+    tiers = SPACY_TIERS
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def similarity(self, text1, text2):
+        return self.vectors.similarity(text1, text2)
+
+
+class SpacyBackend:
+    name = "spacy"
+    description = "Spacy en_core_web_md loaded"
+    tiers = SPACY_TIERS
+
+    def __init__(self, nlp):
+        self.nlp = nlp
+
+    def similarity(self, text1, text2):
+        return self.nlp(text1).similarity(self.nlp(text2))
+
+
+class HashingBackend:
+    """
+    Sparse TF-IDF vectors over hashed word uni/bigrams; cosine via sorted index intersection.
+    A vector is (bucket indices ascending, L2-normalized weights).
+
+    The IDF is fitted on the distinct texts of `library_corpus` (case solutions)
+    and `fixed_corpus` (rule solutions), each a list or a callable returning one.
+    It is fitted on first use, so loading the backend while expert_engine is
+    still being imported does not read the library (that needs expert_engine's
+    parser), and follows the live library through update_corpus().
+    """
+    name = "hashing"
+    tiers = HASHING_TIERS
+    description = "hashing TF-IDF over the case and rule solutions"
+
+    def __init__(self, library_corpus, fixed_corpus=(), hash_bits=HASH_BITS):
+        self.n_buckets = 1 << hash_bits
+        self.documents = None
+        self._library_corpus = library_corpus
+        self._fixed_corpus = fixed_corpus
+        self._fit_lock = threading.Lock()
+        self._df = None
+        self._seen = None
+        self._model = None  # (idf, cached vector function), replaced as a whole
+
+    def fit(self):
+        """Fits the IDF now (otherwise done by the first similarity call). Returns the backend."""
+        self._fitted()
+        return self
+
+    def _fitted(self):
+        model = self._model
+        if model is None:
+            with self._fit_lock:
+                if self._model is None:
+                    if callable(self._fixed_corpus):
+                        self._fixed_corpus = self._fixed_corpus()
+                    library = self._library_corpus() if callable(self._library_corpus) else self._library_corpus
+                    self._refit(library)
+                model = self._model
+        return model
+
+    def update_corpus(self, solutions, appended=False):
+        """
+        Brings the IDF up to date with the case library: `solutions` are the
+        appended cases' solutions, or (appended=False) all of them after a rewrite.
+        Before the first fit there is nothing to update; that fit reads the library.
+        """
+        with self._fit_lock:
+            if self._model is None:
+                return
+            if appended:
+                self._add(solutions)
+                self._publish()
+            else:
+                self._refit(solutions)
+
+    def _refit(self, library):
+        # Caller holds _fit_lock
+        self._df = np.zeros(self.n_buckets, dtype=np.float32)
+        self._seen = set()
+        self._add(list(self._fixed_corpus) + list(library))
+        self._publish()
+
+    def _add(self, texts):
+        for text in texts:
+            if text not in self._seen:
+                self._seen.add(text)
+                np.add.at(self._df, np.unique(self._buckets(text.lower())), 1)
+
+    def _publish(self):
+        # Smoothed IDF (sklearn's formula); buckets never seen get the maximum weight
+        idf = (np.log((1 + len(self._seen)) / (1 + self._df)) + 1).astype(np.float32)
+        # Vectors cached under the old IDF go with it
+        self._model = (idf, functools.lru_cache(maxsize=VECTOR_CACHE)(functools.partial(self._vector, idf)))
+        self.documents = len(self._seen)
+
+    def vector(self, text):
+        return self._fitted()[1](text)
+
+    def _buckets(self, text):
+        words = [w for w in _WORD.findall(text) if w not in STOP_WORDS]
+        terms = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        mask = self.n_buckets - 1
+        return np.fromiter((zlib.crc32(t.encode("utf-8")) & mask for t in terms), dtype=np.int64, count=len(terms))
+
+    def _vector(self, idf, text):
+        buckets, counts = np.unique(self._buckets(text), return_counts=True)
+        weights = (1 + np.log(counts)) * idf[buckets]
+        norm = float(np.linalg.norm(weights))
+        return buckets, (weights / norm if norm else weights)
+
+    def similarity(self, text1, text2):
+        (b1, w1), (b2, w2) = self.vector(text1), self.vector(text2)
+        _, i1, i2 = np.intersect1d(b1, b2, assume_unique=True, return_indices=True)
+        return float(np.dot(w1[i1], w2[i2]))
+
+
+def library_solutions(path=LIBRARY_PATH):
+    """Distinct solutions of the cases the CBR engine matches (those the knowledge base indexes)."""
+    # Imported here: expert_engine imports this module
+    from expert_engine import iter_case_records
+
+    return list(dict.fromkeys(case["solution"] for case in iter_case_records(path)))
+
+
+def rule_solutions(path=SOURCE_RULES_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        rows, _ = extract_table(f.read())
+    return list(dict.fromkeys(row["solution"] for row in rows))
+
+
+def _load_shared():
+    vectors = attach_shared_vectors()
+    return SharedVectorsBackend(vectors) if vectors is not None else None
+
+
+def _load_spacy():
+    try:
+        import spacy
+        # Load medium English model with word vectors
+        return SpacyBackend(spacy.load("en_core_web_md"))
+    except ImportError:
+        print("⚠️ Spacy not installed. Install with: pip install spacy")
+        print("   Then download model: python -m spacy download en_core_web_md")
+    except OSError:
+        print("⚠️ Spacy model not found. Download with: python -m spacy download en_core_web_md")
+    return None
+
+
+def _load_hashing(library_path=LIBRARY_PATH, rules_path=SOURCE_RULES_PATH):
+    return HashingBackend(functools.partial(library_solutions, library_path),
+                          functools.partial(rule_solutions, rules_path))
+
+
+BACKENDS = {
+    "shared": _load_shared,
+    "spacy": _load_spacy,
+    "hashing": _load_hashing,
+}
+
+# Prefer the memory-mapped vector export: every process attaches to the same
+# read-only pages instead of loading its own copy of the spaCy model
+AUTO_ORDER = ("shared", "spacy")
+
+
+def load_backend(name=None):
+    """
+    The configured backend (EXPERT_SIMILARITY_BACKEND unless `name` is given), or None.
+    EXPERT_SIMILARITY_TIERS replaces the backend's endorsement thresholds.
+    """
+    name = (name or os.environ.get("EXPERT_SIMILARITY_BACKEND") or "auto").lower()
+    if name == "auto":
+        backend = next(filter(None, (BACKENDS[candidate]() for candidate in AUTO_ORDER)), None)
+    elif name in BACKENDS:
+        backend = BACKENDS[name]()
+    else:
+        if name != "none":
+            print(f"⚠️ Unknown similarity backend '{name}' (choose from auto, none, {', '.join(BACKENDS)})")
+        return None
+
+    tiers = parse_tiers(os.environ.get("EXPERT_SIMILARITY_TIERS"))
+    if backend is not None and tiers is not None:
+        backend.tiers = tiers
+    return backend
+
+
+def parse_tiers(value):
+    """
+    "t50,t30,t15" -> ((t50, 50), (t30, 30), (t15, 15)), or None if unset. A malformed
+    value (not three descending numbers) is reported and ignored, keeping the defaults.
+    """
+    if not value:
+        return None
+    try:
+        thresholds = [float(t) for t in value.split(",")]
+    except ValueError:
+        thresholds = []
+    if len(thresholds) != 3 or thresholds != sorted(thresholds, reverse=True):
+        print(f"⚠️ Ignoring EXPERT_SIMILARITY_TIERS={value!r} (expected three descending thresholds, e.g. 0.5,0.3,0.15)")
+        return None
+    return tuple(zip(thresholds, (50, 30, 15)))
+
+
+def endorsement_points(similarity, tiers=SPACY_TIERS):
+    """Similarity -> NLP endorsement points: 50 / 30 / 15 above the backend's tiers, else 0."""
+    for threshold, points in tiers:
+        if similarity > threshold:
+            return points
+    return 0
+
+
+# ======================================
+# 2. BENCHMARK
+# ======================================
+
+def solution_pairs(library_path=LIBRARY_PATH, rules_path=SOURCE_RULES_PATH):
+    """Every (case solution, rule solution) pair - what the promotion check compares."""
+    rules = rule_solutions(rules_path)
+    return [(case.lower(), rule.lower()) for case in library_solutions(library_path) for rule in rules]
+
+
+def _ranks(values):
+    order = np.argsort(values, kind="stable")
+    ranks = np.empty(len(values))
+    ranks[order] = np.arange(len(values))
+    return ranks
+
+
+def benchmark(backends, pairs, reference=None, library_path=LIBRARY_PATH, rules_path=SOURCE_RULES_PATH):
+    """
+    Returns:
+        list of dict: per backend {"name", "build_s", "first_us", "repeat_us", "scores"}
+                      + agreement with `reference` ("points_agree", "spearman")
+    """
+    results = []
+    for name in backends:
+        start = time.perf_counter()
+        backend = _load_hashing(library_path, rules_path).fit() if name == "hashing" else BACKENDS[name]()
+        build = time.perf_counter() - start
+        if backend is None:
+            results.append({"name": name, "skipped": True})
+            continue
+
+        start = time.perf_counter()
+        scores = np.array([backend.similarity(a, b) for a, b in pairs])
+        first = time.perf_counter() - start
+        start = time.perf_counter()
+        for a, b in pairs:
+            backend.similarity(a, b)
+        repeat = time.perf_counter() - start
+        results.append({"name": name, "skipped": False, "build_s": build, "scores": scores, "tiers": backend.tiers,
+                        "first_us": first / len(pairs) * 1e6, "repeat_us": repeat / len(pairs) * 1e6})
+
+    ref = next((r for r in results if r["name"] == reference and not r["skipped"]), None)
+    for result in results:
+        if result["skipped"]:
+            continue
+        result["points"] = np.array([endorsement_points(s, result["tiers"]) for s in result["scores"]])
+    for result in results:
+        if result["skipped"] or ref is None:
+            continue
+        result["points_agree"] = float(np.mean(result["points"] == ref["points"]))
+        result["spearman"] = float(np.corrcoef(_ranks(result["scores"]), _ranks(ref["scores"]))[0, 1])
+        result["calibrated"] = calibrate_tiers(result["scores"], ref["scores"], ref["tiers"])
+    return results
+
+
+def calibrate_tiers(scores, ref_scores, ref_tiers):
+    """Thresholds that endorse the same share of pairs at each tier as the reference does."""
+    tiers = []
+    for threshold, points in ref_tiers:
+        share = float(np.mean(ref_scores > threshold))
+        tiers.append((round(float(np.quantile(scores, 1 - share)), 4) if share > 0 else 1.0, points))
+    return tuple(tiers)
+
+
+def print_benchmark(results, pairs, reference):
+    print(f"🔬 {len(pairs)} (case solution, rule solution) pairs, agreement vs {reference}")
+    print(f"{'backend':<8} {'build s':>8} {'1st us':>9} {'repeat us':>9} {'mean sim':>9} "
+          f"{'pts>0':>6} {'same pts':>9} {'spearman':>9}")
+    for r in results:
+        if r["skipped"]:
+            print(f"{r['name']:<8} unavailable")
+            continue
+        agree = f"{r['points_agree']:.1%}" if "points_agree" in r else "-"
+        rho = f"{r['spearman']:.3f}" if "spearman" in r and not math.isnan(r["spearman"]) else "-"
+        endorsed = np.mean(r["points"] > 0)
+        print(f"{r['name']:<8} {r['build_s']:>8.2f} {r['first_us']:>9.1f} {r['repeat_us']:>9.1f} "
+              f"{r['scores'].mean():>9.3f} {endorsed:>6.1%} {agree:>9} {rho:>9}")
+    for r in results:
+        if not r["skipped"] and r["name"] != reference and "calibrated" in r:
+            thresholds = ",".join(str(t) for t, _ in r["calibrated"])
+            print(f"   {r['name']}: tiers matching {reference}'s endorsement rates: "
+                  f"EXPERT_SIMILARITY_TIERS={thresholds}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Semantic similarity backends: benchmark / spot check")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    bench = sub.add_parser("benchmark", help="Speed and agreement on case/rule solution pairs")
+    bench.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=["spacy", "shared", "hashing"])
+    bench.add_argument("--reference", choices=list(BACKENDS), default="spacy")
+    bench.add_argument("--library", default=LIBRARY_PATH)
+    bench.add_argument("--rules", default=SOURCE_RULES_PATH)
+
+    check = sub.add_parser("check", help="Similarity of two texts")
+    check.add_argument("text1")
+    check.add_argument("text2")
+    check.add_argument("--backend", default=None, help="Default: EXPERT_SIMILARITY_BACKEND / auto")
+    args = parser.parse_args(argv)
+
+    if args.command == "check":
+        backend = load_backend(args.backend)
+        if backend is None:
+            print("No similarity backend available")
+            return 1
+        similarity = backend.similarity(args.text1.lower(), args.text2.lower())
+        print(f"{backend.name}: similarity {similarity:.4f} -> "
+              f"{endorsement_points(similarity, backend.tiers)} endorsement points")
+        return 0
+
+    pairs = solution_pairs(args.library, args.rules)
+    if not pairs:
+        parser.error("no solution pairs (library or rules missing)")
+    results = benchmark(args.backends, pairs, args.reference, args.library, args.rules)
+    print_benchmark(results, pairs, args.reference)
+    if not any(r["name"] == args.reference and not r["skipped"] for r in results):
+        print(f"⚠️ Reference backend '{args.reference}' unavailable: speed only, no agreement")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,76 +1,42 @@
-import streamlit as st
-import clips
+import datetime
+import math
 import os
+import time
 
-# NLP for Semantic Similarity
-try:
-    import spacy
-    # Load medium English model with word vectors
-    nlp = spacy.load("en_core_web_md")
-    NLP_AVAILABLE = True
-except ImportError:
-    nlp = None
-    NLP_AVAILABLE = False
-    print("⚠️ Spacy not installed. Install with: pip install spacy")
-    print("   Then download model: python -m spacy download en_core_web_md")
-except OSError:
-    nlp = None
-    NLP_AVAILABLE = False
-    print("⚠️ Spacy model not found. Download with: python -m spacy download en_core_web_md")
-
-# ======================================
-# 0. KNOWLEDGE CONFIGURATION
-# ======================================
+import pandas as pd
+import streamlit as st
 
-# Feature Weights for Weighted CBR Algorithm
-# Higher weight = More diagnostic significance
-FEATURE_WEIGHTS = {
-    # Hardware Direct Evidence - Highest Priority
-    "error-message": 3.0,
-    "beep-code": 3.0,
-    "beep-duration": 3.0,
-    "screen-visuals": 2.5,
-    
-    # System Behavior - High Priority
-    "system-state": 2.0,
-    "cpu-temp": 2.0,
-    "temp-pattern": 2.0,
-    "power-lights": 2.0,
-    "fan-status": 2.0,
-    "boot-warning": 2.0,
-    "hdd-status": 2.0,
-    
-    # Software/Indirect Evidence - Medium Priority
-    "sound-quality": 1.5,
-    "sound-output": 1.5,
-    "volume-bar": 1.5,
-    "volume-behavior": 1.5,
-    "sound-card-status": 1.5,
-    "system-behavior": 1.5,
-    
-    # Environmental Factors - Lower Priority
-    "device-age": 0.8,
-    "system-age": 0.8,
-}
+from case_moderation import ACTIONS, moderate, oldest_first, pending_cases, read_library, select_cases
+from diagnosis_log import diagnosis_event, get_event_log
+from expert_engine import (
+    FEATURE_WEIGHTS,
+    NLP_AVAILABLE,
+    NLP_BACKEND,
+    get_user_features,
+    resolve_conflict,
+    run_cbr_analysis,
+    run_cbr_analysis_anytime,
+    run_rbr_analysis,
+    run_rbr_analysis_anytime,
+)
+from knowledge_base import RULES_PATH, get_knowledge_base
+from metrics import STAGE_SECONDS, record_cache, record_diagnosis, record_partial, start_exporters_from_env
+from question_planner import get_planner
+from questions import (
+    QUESTIONS,
+    WIZARD_STEP_COUNT,
+    answered_questions,
+    question_step,
+    record_answer,
+    step_info,
+)
+from rbr_table import triggered_symptoms as answer_triggered_symptoms
+from write_behind import get_buffer
 
 # ======================================
-# 1. CBR ENGINE (PYTHON / MEMORY)
+# 1. UI HELPERS
 # ======================================
 
-def get_user_features(user_answers):
-    """
-    Converts user UI selections into a Set of feature strings.
-    Format: {"volume-bar:moving", "sound-output:none", ...}
-    """
-    features = set()
-    for key, (user_selection, mapping) in user_answers.items():
-        if user_selection and user_selection in mapping:
-            backend_id, confidence = mapping[user_selection]
-            # Ignore 'unknown' or low confidence values to keep the vector clean
-            if backend_id and backend_id != "unknown" and confidence > 0.2:
-                features.add(f"{key}:{backend_id}")
-    return features
-
 def render_multiline(text, box_type=None):
     """Render text with auto line breaks at periods (except last one).
     
@@ -99,529 +65,250 @@ def render_multiline(text, box_type=None):
     else:
         st.markdown(formatted, unsafe_allow_html=True)
 
-def run_cbr_analysis(user_features):
-    """
-    [CBR ENGINE - Enhanced with Weighted Jaccard + Verification Status]
-    Reads the text file -> Calculates Weighted Jaccard Similarity -> Returns Best Match.
-    Math: Weighted Intersection / Weighted Union
-    
-    Key Improvements:
-    1. Features with higher diagnostic significance contribute more
-    2. VERIFIED cases get full score, PENDING cases get 50% penalty
-    3. Quality control prevents knowledge pollution
-    """
-    best_match = None
-    max_score = 0.0
-    
-    # If no library exists, return empty
-    if not os.path.exists("case_library.txt"):
-        return None, 0.0
+# ======================================
+# 2. RBR ENGINE (CLIPS / LOGIC)
+# ======================================
 
-    with open("case_library.txt", "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line: continue
-            
-            # Expected Format: CASE-ID | STATUS | features... | Solution [| feedback_score]
-            try:
-                parts = line.split("|")
-                if len(parts) < 4: 
-                    # Legacy format support (old cases without status)
-                    if len(parts) == 3:
-                        case_id = parts[0].strip()
-                        status = "VERIFIED"  # Assume legacy cases are verified
-                        case_features_str = parts[1].strip()
-                        solution = parts[2].strip()
-                        feedback_score = 0
-                    else:
-                        continue
-                else:
-                    case_id = parts[0].strip()
-                    status = parts[1].strip()
-                    case_features_str = parts[2].strip()
-                    solution = parts[3].strip()
-                    feedback_score = int(parts[4].strip()) if len(parts) > 4 else 0
-                
-                # 🛡️ QUALITY CONTROL: Skip cases with negative feedback
-                if feedback_score < -2:
-                    continue
-                
-                # Convert stored case string to Set
-                case_features = set(case_features_str.split())
-                
-                # === ALGORITHM: WEIGHTED JACCARD SIMILARITY ===
-                intersection_weight = 0.0
-                union_weight = 0.0
-                
-                all_features = user_features.union(case_features)
-                matched_features = user_features.intersection(case_features)
-                
-                for feature in all_features:
-                    # Extract feature type (e.g., "cpu-temp:above-85" -> "cpu-temp")
-                    feature_type = feature.split(":")[0] if ":" in feature else feature
-                    weight = FEATURE_WEIGHTS.get(feature_type, 1.0)
-                    
-                    union_weight += weight
-                    
-                    if feature in matched_features:
-                        intersection_weight += weight
-                
-                if union_weight == 0:
-                    score = 0
-                else:
-                    score = (intersection_weight / union_weight) * 100
-                
-                # 🆕 VERIFICATION PENALTY: Unverified cases get 50% score reduction
-                if status == "PENDING":
-                    score *= 0.5
-                    
-                # Bonus for positive feedback
-                if feedback_score > 0:
-                    score *= (1 + feedback_score * 0.05)  # +5% per positive vote
-                
-                # Keep the highest score
-                if score > max_score:
-                    max_score = score
-                    best_match = {
-                        "id": case_id,
-                        "solution": solution,
-                        "matched_features": list(matched_features),
-                        "match_quality": "High" if score > 70 else "Medium" if score > 40 else "Low",
-                        "status": status,
-                        "feedback": feedback_score
-                    }
-            except Exception as e:
-                print(f"Error parsing case line: {line} - {e}")
-                continue
-                
-    return best_match, max_score
+# Prometheus exposition (EXPERT_METRICS_PORT / EXPERT_METRICS_FILE), once per process
+start_exporters_from_env()
 
-def resolve_conflict(rbr_result, rbr_cf, cbr_result, cbr_score):
+# Votes and submissions are acknowledged immediately and persisted in batches
+write_buffer = get_buffer()
+
+# Every completed diagnosis as a JSONL event (EXPERT_DIAGNOSIS_LOG), written off the UI thread
+event_log = get_event_log()
+
+def read_diagnosis_budget(value):
+    """EXPERT_DIAGNOSIS_BUDGET_MS in seconds; a malformed or negative value is reported and means no budget."""
+    try:
+        budget_ms = float(value or 0)
+    except ValueError:
+        budget_ms = None
+    if budget_ms is None or not math.isfinite(budget_ms) or budget_ms < 0:
+        print(f"⚠️ Ignoring EXPERT_DIAGNOSIS_BUDGET_MS={value!r} (expected milliseconds >= 0); running without a budget")
+        return 0.0
+    return budget_ms / 1000
+
+# Anytime mode: EXPERT_DIAGNOSIS_BUDGET_MS bounds step 6 (unset/0 = engines always run to completion).
+# RBR must finish within RBR_BUDGET_SHARE of the budget; CBR gets whatever is left.
+DIAGNOSIS_BUDGET = read_diagnosis_budget(os.environ.get("EXPERT_DIAGNOSIS_BUDGET_MS"))
+RBR_BUDGET_SHARE = 0.5
+
+# CLIPS environment + case index, built once per process and hot-reloaded on file changes
+knowledge = get_knowledge_base().current()
+if knowledge.rules_error:
+    st.error(f"⚠️ Error loading rules.clp: {knowledge.rules_error}")
+
+def answers_key(answers):
+    """Hashable identity of the wizard answers (symptom -> answer code)."""
+    return tuple(sorted(answers.items()))
+
+def get_diagnosis_bundle(answers, submission=None):
     """
-    [META-REASONING ENGINE]
-    Intelligently integrates RBR and CBR results when they conflict.
-    
-    Decision Strategy:
-    1. High RBR confidence (>80%) -> Prefer rule-based diagnosis
-    2. High CBR similarity (>70%) + Low RBR confidence -> Prefer case-based diagnosis
-    3. Similar confidence levels -> Provide hybrid recommendation
-    4. Default -> Prefer RBR (rules are more reliable when confident)
-    
-    Returns:
-        dict: {
-            "primary": "rbr" | "cbr" | "hybrid",
-            "recommendation": str,
-            "reason": str,
-            "confidence": float
-        }
+    [SESSION MEMOIZATION]
+    Step-6 widgets (expanders, votes, expert mode, the learning form) rerun the whole
+    script. The diagnosis is cached in session state so those reruns skip CLIPS and
+    the CBR scan:
+    - RBR results are recomputed when the answers or the loaded rules change
+    - CBR results are recomputed when the answers change or the case library is rewritten
+    
+    With a DIAGNOSIS_BUDGET both engines return their best result so far when
+    their deadline passes, and the verdict is flagged as partial. A partial
+    result is shown but not cached, so the next rerun runs the engine again
+    with a fresh budget instead of serving the truncated result as final.
+    
+    The verdict is counted (metrics) and queued on the diagnosis event log once
+    per `submission` (one "Run Diagnosis" click), with the timings of the stages
+    that ran for it. Reruns that recompute a stage after a rules or library
+    reload refresh the view without logging the diagnosis again.
     """
-    rbr_confidence = rbr_cf * 100 if rbr_result else 0
-    cbr_confidence = cbr_score if cbr_result else 0
-    
-    # Strategy 1: High-confidence rule
-    if rbr_confidence > 80:
-        result = {
-            "primary": "rbr",
-            "recommendation": rbr_result['solution'],
-            "reason": f"Rule-based engine highly confident ({int(rbr_confidence)}%)",
-            "confidence": rbr_confidence
-        }
-        if cbr_result and cbr_confidence > 40:
-            result["alternative_solution"] = cbr_result['solution']
-            result["alternative_reason"] = f"Historical case match ({int(cbr_confidence)}% similarity)"
-            result["alternative_confidence"] = cbr_confidence
-        return result
-    
-    # Strategy 2: Strong case match with weak rule
-    elif cbr_confidence > 70 and rbr_confidence < 50:
-        return {
-            "primary": "cbr",
-            "recommendation": cbr_result['solution'],
-            "reason": f"Strong match with historical case ({int(cbr_confidence)}% similarity)",
-            "confidence": cbr_confidence
-        }
-    
-    # Strategy 3: Both engines have similar confidence
-    elif abs(rbr_confidence - cbr_confidence) < 20 and rbr_result and cbr_result:
-        # Check if solutions actually differ
-        solutions_differ = rbr_result['solution'] != cbr_result['solution']
-        
-        if solutions_differ:
-            reason = (f"🔍 **Comparative Analysis**: Logic engine diagnoses '{rbr_result['fault']}' "
-                     f"based on expert rules, while memory bank found a {int(cbr_score)}% similar "
-                     f"historical case with different resolution. Both approaches are valid - "
-                     f"consider checking hardware connections first.")
+    cache = st.session_state.setdefault("diagnosis_cache", {})
+    key = answers_key(answers)
+    start = time.monotonic()
+    timings = {}
+    
+    rbr_key = (key, knowledge.rules_version)
+    record_cache("rbr", cache.get("rbr_key") == rbr_key)
+    if cache.get("rbr_key") != rbr_key:
+        # Precomputed outcome for these answers (rbr_table.py), else run CLIPS
+        table_hit = None
+        if knowledge.rbr_table is not None:
+            with STAGE_SECONDS.time("rbr_table") as timer:
+                table_hit = knowledge.rbr_table.lookup(answers)
+            timings["rbr_table"] = timer.elapsed
+            record_cache("rbr_table", table_hit is not None)
+        rbr_complete = True
+        if table_hit is not None:
+            rbr_diagnoses, triggered_symptoms = table_hit
+        elif not DIAGNOSIS_BUDGET:
+            # The shared CLIPS env serves all sessions, one inference at a time
+            with knowledge.lock, STAGE_SECONDS.time("rbr") as timer:
+                rbr_diagnoses, triggered_symptoms = run_rbr_analysis(knowledge.env, answers)
+            timings["rbr"] = timer.elapsed
         else:
-            reason = "Both reasoning engines converge on the same solution with similar confidence"
-        
-        return {
-            "primary": "hybrid",
-            "recommendation": f"**Solution A (Logic-Based)**: {rbr_result['solution']}\n\n**Solution B (Case-Based)**: {cbr_result['solution']}",
-            "reason": reason,
-            "confidence": (rbr_confidence + cbr_confidence) / 2,
-            "requires_comparison": solutions_differ
-        }
-    
-    # Strategy 4: Default to RBR
-    elif rbr_result:
-        return {
-            "primary": "rbr",
-            "recommendation": rbr_result['solution'],
-            "reason": "Rule-based diagnosis (based on domain expert knowledge)",
-            "confidence": rbr_confidence
+            rbr_deadline = start + DIAGNOSIS_BUDGET * RBR_BUDGET_SHARE
+            with STAGE_SECONDS.time("rbr") as timer:
+                # Waiting for the shared env counts against the deadline too
+                if knowledge.lock.acquire(timeout=max(0.0, rbr_deadline - time.monotonic())):
+                    try:
+                        rbr_diagnoses, triggered_symptoms, rbr_complete = run_rbr_analysis_anytime(
+                            knowledge.env, answers, rbr_deadline)
+                    finally:
+                        knowledge.lock.release()
+                else:
+                    rbr_diagnoses, triggered_symptoms, rbr_complete = [], answer_triggered_symptoms(answers), False
+            timings["rbr"] = timer.elapsed
+            if not rbr_complete:
+                record_partial("rbr")
+        cache["rbr_key"] = rbr_key if rbr_complete else None
+        cache["rbr"] = {
+            "user_features": get_user_features(answers),
+            "rbr_result": rbr_diagnoses[0] if rbr_diagnoses else None,
+            "rbr_alternatives": rbr_diagnoses[1:7],
+            "triggered_symptoms": triggered_symptoms,
+            "rbr_partial": not rbr_complete,
         }
-    
-    # Fallback: Only CBR available
-    elif cbr_result:
-        return {
-            "primary": "cbr",
-            "recommendation": cbr_result['solution'],
-            "reason": "Case-based diagnosis only (no matching rules found)",
-            "confidence": cbr_confidence
+    rbr = cache["rbr"]
+    
+    cbr_key = (rbr_key, knowledge.cases_version)
+    record_cache("cbr", cache.get("cbr_key") == cbr_key)
+    if cache.get("cbr_key") != cbr_key:
+        cbr_complete = True
+        with STAGE_SECONDS.time("cbr") as timer:
+            if not DIAGNOSIS_BUDGET:
+                cbr_result, cbr_score = run_cbr_analysis(rbr["user_features"], knowledge.cases)
+            else:
+                # Best case so far, VERIFIED and well-rated cases scanned first
+                cbr_result, cbr_score, cbr_complete, _ = run_cbr_analysis_anytime(
+                    rbr["user_features"], knowledge.cases, knowledge.case_priority, start + DIAGNOSIS_BUDGET)
+        timings["cbr"] = timer.elapsed
+        if not cbr_complete:
+            record_partial("cbr")
+        rbr_result = rbr["rbr_result"]
+        rbr_cf = rbr_result['cf'] if rbr_result else 0
+        with STAGE_SECONDS.time("resolve") as timer:
+            resolution = resolve_conflict(rbr_result, rbr_cf, cbr_result, cbr_score,
+                                          rbr_partial=rbr["rbr_partial"], cbr_partial=not cbr_complete)
+        timings["resolve"] = timer.elapsed
+        # The resolution also depends on RBR: cached only when both are final
+        cache["cbr_key"] = cbr_key if cbr_complete and not rbr["rbr_partial"] else None
+        cache["cbr"] = {
+            "cbr_result": cbr_result,
+            "cbr_score": cbr_score,
+            "resolution": resolution,
         }
+    bundle = {**rbr, **cache["cbr"]}
     
-    # No results from either engine
-    else:
-        return {
-            "primary": "none",
-            "recommendation": "Unable to diagnose - Please consult a technical professional",
-            "reason": "Symptom combination does not match any known patterns",
-            "confidence": 0
-        }
-
-def get_triggered_symptoms(env):
-    """
-    [EXPLANATION FACILITY]
-    Extracts all symptoms that triggered the CLIPS inference.
-    Used for explaining WHY a diagnosis was made.
+    if submission is not None and cache.get("recorded_submission") != submission:
+        cache["recorded_submission"] = submission
+        record_diagnosis(bundle["resolution"]["primary"])
+        if event_log is not None:
+            timings["total"] = time.monotonic() - start
+            event_log.emit(diagnosis_event(answers, bundle, timings,
+                                           knowledge.rules_version, knowledge.cases_version))
     
-    Returns:
-        list: [(symptom_name, value, confidence), ...]
-    """
-    triggered = []
-    for fact in env.facts():
-        if fact.template.name == "symptom" and fact['cf'] > 0.5:
-            triggered.append({
-                "name": fact['name'],
-                "value": fact['value'],
-                "cf": fact['cf']
-            })
-    return triggered
+    return bundle
 
-def get_semantic_endorsement_score(user_solution, rbr_solution):
-    """
-    [NLP SEMANTIC SIMILARITY]
-    Calculates semantic similarity between user-submitted solution and RBR diagnosis.
-    Uses Spacy word embeddings to measure semantic distance.
-    
-    Args:
-        user_solution: User-contributed solution text
-        rbr_solution: RBR engine's recommended solution
-    
-    Returns:
-        int: Endorsement points (0-50) based on semantic similarity
-    
-    Scoring:
-    - Similarity > 0.85: +50 pts (Highly aligned with expert knowledge)
-    - Similarity > 0.65: +30 pts (Semantically related)
-    - Similarity > 0.45: +15 pts (Weak correlation)
-    - Otherwise: 0 pts
-    """
-    if not NLP_AVAILABLE or not nlp or not rbr_solution:
-        # Fallback to simple string matching if NLP unavailable
-        rbr_normalized = rbr_solution.strip().lower()
-        user_normalized = user_solution.strip().lower()
-        
-        if rbr_normalized == user_normalized:
-            return 50
-        elif any(key_phrase in user_normalized for key_phrase in rbr_normalized.split()[:3]):
-            return 25
-        return 0
-    
-    try:
-        # Process texts with Spacy
-        doc1 = nlp(user_solution.lower())
-        doc2 = nlp(rbr_solution.lower())
+def show_promotion(details):
+    """Breakdown of an auto-promotion decided by the background promotion worker."""
+    st.success("🎉 Case Auto-Promoted to VERIFIED!")
+    with st.expander("📊 Promotion Details", expanded=True):
+        st.write(f"**Total Score**: {details.get('total_points', 0)}/100 points")
+        breakdown = details.get('breakdown', {})
         
-        # Calculate cosine similarity between document vectors
-        similarity = doc1.similarity(doc2)
+        st.metric("Community Votes", f"{breakdown.get('community', 0)} pts")
         
-        # Convert similarity to endorsement points
-        if similarity > 0.85:
-            return 50  # Extremely high semantic match
-        elif similarity > 0.65:
-            return 30  # Strong semantic alignment
-        elif similarity > 0.45:
-            return 15  # Moderate correlation
+        nlp_score = breakdown.get('nlp_endorsement', 0)
+        semantic_pct = breakdown.get('semantic_score', 0)
+        if NLP_AVAILABLE:
+            st.metric(
+                "NLP Semantic Match", 
+                f"{nlp_score} pts",
+                delta=f"{semantic_pct}% similarity"
+            )
         else:
-            return 0   # Low semantic similarity
-    
-    except Exception as e:
-        print(f"Error in semantic analysis: {e}")
-        return 0
-
-def save_new_case(user_features, correct_solution, is_verified=False):
-    """
-    [LEARNING ENGINE - Enhanced with Quality Control]
-    Saves a new case to the text file with verification status.
-    Format: ID | STATUS | feature1 feature2 | Solution | feedback_score
-    
-    Args:
-        user_features: Set of symptom features
-        correct_solution: User-provided solution
-        is_verified: Whether this is an expert-verified case
-    
-    Returns:
-        (success: bool, message: str)
-    """
-    try:
-        # 🛡️ INPUT VALIDATION
-        if not correct_solution or len(correct_solution.strip()) < 10:
-            return False, "Solution too brief (minimum 10 characters required)"
-        
-        # Check for spam patterns
-        spam_patterns = ["test", "asdf", "1234", "xxx"]
-        if any(pattern in correct_solution.lower() for pattern in spam_patterns):
-            return False, "Invalid input detected"
-        
-        # 1. Generate unique ID
-        import time
-        case_id = f"CASE-{int(time.time() * 1000) % 100000:05d}"
+            st.metric("Text Match", f"{nlp_score} pts")
         
-        # 2. Set verification status
-        status = "VERIFIED" if is_verified else "PENDING"
+        st.metric("Pattern Convergence", f"{breakdown.get('convergence', 0)} pts")
         
-        # 3. Format features as space-separated string
-        feature_str = " ".join(list(user_features))
-        
-        # 4. Append to file with initial feedback score of 0
-        entry = f"{case_id} | {status} | {feature_str} | {correct_solution} | 0\n"
-        
-        with open("case_library.txt", "a", encoding="utf-8") as f:
-            f.write(entry)
-        
-        if status == "PENDING":
-            return True, "✅ Suggestion submitted! It will be reviewed by domain experts."
-        else:
-            return True, "✅ Verified case added to knowledge base!"
-            
-    except Exception as e:
-        return False, f"Error saving case: {str(e)}"
+        # Trust chain indicator
+        if nlp_score >= 50:
+            st.success("🎓 **Expert Validated**: Highly aligned with expert system")
+        elif breakdown.get('community', 0) >= 100:
+            st.info("🤝 **Community Choice**: Strong community endorsement")
+        if breakdown.get('convergence', 0) >= 40:
+            st.info("📈 **Pattern Recognized**: Recurring solution in knowledge base")
 
-def check_numerical_convergence(user_features, solution):
+def get_pending_queue():
     """
-    [NUMERICAL CONVERGENCE CHECK]
-    Checks if multiple cases with identical symptom combinations exist.
-    This indicates pattern stability in the knowledge base.
-    
-    Returns:
-        int: Convergence bonus points (0-40)
+    PENDING cases of the library with their review attributes, parsed once per
+    library version (and day, for the ages) instead of on every rerun.
     """
-    if not os.path.exists("case_library.txt"):
-        return 0
-    
-    matching_cases = 0
-    try:
-        with open("case_library.txt", "r", encoding="utf-8") as f:
-            for line in f:
-                parts = line.strip().split("|")
-                if len(parts) >= 4:
-                    case_features_str = parts[2].strip()
-                    case_features = set(case_features_str.split())
-                    
-                    # Check if feature sets are identical
-                    if user_features == case_features:
-                        matching_cases += 1
-        
-        # Award points based on convergence strength
-        if matching_cases >= 3:
-            return 40  # Strong pattern detected
-        elif matching_cases == 2:
-            return 20  # Moderate pattern
-        else:
-            return 0
-    except Exception as e:
-        print(f"Error checking convergence: {e}")
-        return 0
-
-def check_and_promote_hybrid(case_id, current_score, user_features, solution, rbr_result):
-    """
-    [MULTI-DIMENSIONAL AUTO-PROMOTION SYSTEM - Enhanced with NLP]
-    Promotes cases to VERIFIED based on weighted scoring across multiple criteria.
-    
-    Scoring System:
-    - Community Approval: +20 points per upvote (current_score * 20)
-    - NLP Semantic Endorsement: 0-50 points based on similarity with RBR diagnosis
-    - Numerical Convergence: +40 points if pattern repeats in knowledge base
-    
-    Promotion Threshold: 100 points
-    
-    Args:
-        case_id: The case identifier
-        current_score: Current community feedback score (net upvotes)
-        user_features: Set of symptom features for this case
-        solution: The proposed solution
-        rbr_result: Current RBR engine diagnosis result
-    
-    Returns:
-        tuple: (should_promote: bool, total_points: int, breakdown: dict)
-    """
-    breakdown = {
-        "community": 0,
-        "nlp_endorsement": 0,
-        "convergence": 0,
-        "semantic_score": 0.0  # For display purposes
-    }
-    
-    # Criterion 1: Community Approval (20 points per upvote)
-    community_points = current_score * 20
-    breakdown["community"] = community_points
-    
-    # Criterion 2: NLP Semantic Endorsement (0-50 points)
-    # Uses Spacy to measure semantic similarity with expert system diagnosis
-    if rbr_result and rbr_result.get('solution'):
-        nlp_points = get_semantic_endorsement_score(
-            solution, 
-            rbr_result['solution']
+    key = (knowledge.cases_version, datetime.date.today())
+    cached = st.session_state.get("moderation_queue")
+    if cached is None or cached[0] != key:
+        cached = (key, pending_cases(read_library()))
+        st.session_state.moderation_queue = cached
+    return cached[1]
+
+def show_moderation_panel():
+    """[EXPERT MODE] Bulk review of PENDING submissions (case_moderation.py)."""
+    with st.expander("🛡️ Bulk Moderation (PENDING cases)"):
+        result = st.session_state.pop("moderation_result", None)
+        if result:
+            st.success(f"✅ {result['action'].capitalize()}: {len(result['changed'])} case(s) "
+                       f"in one rewrite ({result['seconds']:.2f}s)")
+            if result["skipped"]:
+                st.warning(f"Skipped {len(result['skipped'])} case(s) that are no longer PENDING.")
+        
+        col_age, col_score, col_conv = st.columns(3)
+        with col_age:
+            min_age = st.number_input("Min. age (days)", min_value=0, value=0, step=1)
+        with col_score:
+            max_score = st.number_input("Max. score", value=99, step=1)
+        with col_conv:
+            min_conv = st.selectbox("Min. convergence", [0, 20, 40])
+        
+        queue = oldest_first(select_cases(
+            get_pending_queue(),
+            min_age_days=min_age or None,
+            max_score=max_score,
+            min_convergence=min_conv or None,
+        ))
+        if not queue:
+            st.info("No PENDING cases match these filters.")
+            return
+        
+        table = pd.DataFrame([{
+            "select": True,
+            "case": case["id"],
+            "created": case["created"] or "-",
+            "age (days)": case["age_days"],
+            "score": case["feedback"],
+            "convergence": case["convergence"],
+            "solution": case["solution"],
+        } for case in queue])
+        edited = st.data_editor(
+            table,
+            hide_index=True,
+            disabled=[column for column in table.columns if column != "select"],
+            key="moderation_table",
         )
-        breakdown["nlp_endorsement"] = nlp_points
-        
-        # Calculate semantic similarity percentage for display
-        if NLP_AVAILABLE and nlp:
-            try:
-                doc1 = nlp(solution.lower())
-                doc2 = nlp(rbr_result['solution'].lower())
-                breakdown["semantic_score"] = round(doc1.similarity(doc2) * 100, 1)
-            except:
-                breakdown["semantic_score"] = 0.0
-    
-    # Criterion 3: Numerical Convergence (0-40 points)
-    # Check if similar symptom patterns exist in knowledge base
-    convergence_points = check_numerical_convergence(user_features, solution)
-    breakdown["convergence"] = convergence_points
-    
-    # Calculate total score
-    total_points = sum([v for k, v in breakdown.items() if k != "semantic_score"])
-    
-    # Promotion threshold: 100 points
-    should_promote = total_points >= 100
-    
-    return should_promote, total_points, breakdown
-
-def update_case_feedback(case_id, vote, user_features=None, rbr_result=None):
-    """
-    [FEEDBACK SYSTEM - Enhanced with Multi-Dimensional Scoring]
-    Updates the feedback score and evaluates auto-promotion using hybrid criteria.
-    
-    Args:
-        case_id: The case identifier
-        vote: +1 for helpful, -1 for not helpful
-        user_features: Set of symptom features (for convergence check)
-        rbr_result: Current RBR diagnosis result (for endorsement check)
-    
-    Returns:
-        tuple: (success: bool, promoted: bool, details: dict)
-    """
-    try:
-        if not os.path.exists("case_library.txt"):
-            return False, False, {}
-        
-        # Read all cases
-        with open("case_library.txt", "r", encoding="utf-8") as f:
-            lines = f.readlines()
-        
-        # Update the matching case
-        updated = False
-        promoted = False
-        promotion_details = {}
-        
-        for i, line in enumerate(lines):
-            if line.startswith(case_id):
-                parts = line.strip().split("|")
-                if len(parts) >= 4:
-                    status = parts[1].strip()
-                    case_features_str = parts[2].strip()
-                    current_solution = parts[3].strip()
-                    current_score = int(parts[4].strip()) if len(parts) > 4 else 0
-                    
-                    # Update vote score
-                    new_score = current_score + vote
-                    
-                    # 🆕 MULTI-DIMENSIONAL AUTO-PROMOTION
-                    if status == "PENDING":
-                        # Parse features for convergence check
-                        if user_features is None and case_features_str:
-                            user_features = set(case_features_str.split())
-                        
-                        # Run hybrid promotion check
-                        should_promote, total_points, breakdown = check_and_promote_hybrid(
-                            case_id, 
-                            new_score, 
-                            user_features, 
-                            current_solution, 
-                            rbr_result
-                        )
-                        
-                        if should_promote:
-                            status = "VERIFIED"
-                            promoted = True
-                            promotion_details = {
-                                "total_points": total_points,
-                                "breakdown": breakdown,
-                                "case_id": case_id
-                            }
-                            
-                            # Detailed logging
-                            print(f"✅ AUTO-PROMOTION: Case {case_id} elevated to VERIFIED")
-                            print(f"   Total Points: {total_points}/100")
-                            print(f"   - Community: {breakdown['community']} pts ({new_score} votes × 20)")
-                            print(f"   - NLP Semantic Match: {breakdown['nlp_endorsement']} pts (Similarity: {breakdown.get('semantic_score', 0)}%)")
-                            print(f"   - Convergence: {breakdown['convergence']} pts")
-                    
-                    # Reconstruct the line with updated score and status
-                    lines[i] = f"{parts[0].strip()} | {status} | {parts[2].strip()} | {current_solution} | {new_score}\n"
-                    updated = True
-                    break
-        
-        if updated:
-            # Write back to file
-            with open("case_library.txt", "w", encoding="utf-8") as f:
-                f.writelines(lines)
-            return True, promoted, promotion_details
-        return False, False, {}
-        
-    except Exception as e:
-        print(f"Error updating feedback: {e}")
-        return False, False, {}
-
-# ======================================
-# 2. RBR HELPER (CLIPS / LOGIC)
-# ======================================
-
-def assert_fact_with_mapping(env, symptom_name, user_input, mapping_dict):
-    """
-    Translates User Choice -> CLIPS Fact
-    """
-    if not user_input or user_input not in mapping_dict:
-        return
-
-    # Unpack: (CLIPS Value, Confidence Score)
-    clips_value, cf_score = mapping_dict[user_input]
-
-    # Ignore Unknowns to prevent bad logic
-    if cf_score <= 0.2:
-        return
-
-    # Assert to CLIPS environment
-    fact_str = f"(symptom (name {symptom_name}) (value {clips_value}) (cf {cf_score}))"
-    env.assert_string(fact_str)
-
-# Initialize CLIPS
-env = clips.Environment()
-try:
-    env.load("rules.clp")
-except Exception as e:
-    st.error(f"⚠️ Error loading rules.clp: {e}")
+        selected = edited.loc[edited["select"], "case"].tolist()
+        
+        col_action, col_apply = st.columns([2, 1])
+        with col_action:
+            action = st.radio("Action", ACTIONS, horizontal=True, format_func=str.capitalize)
+        with col_apply:
+            apply = st.button(f"Apply to {len(selected)} case(s)", disabled=not selected, use_container_width=True)
+        
+        if apply:
+            # Pending votes land first; the buffer waits while the library is rewritten
+            with write_buffer.exclusive():
+                result = moderate(action, selected)
+            get_knowledge_base().reload()
+            st.session_state.moderation_result = result
+            st.rerun()
 
 # ======================================
 # 3. UI CONFIGURATION
@@ -632,211 +319,101 @@ st.markdown("### Powered by CLIPS (Logic) & Python (Memory)")
 
 if 'step' not in st.session_state: st.session_state.step = 1
 if 'answers' not in st.session_state: st.session_state.answers = {}
+if 'adaptive_mode' not in st.session_state: st.session_state.adaptive_mode = False
+if 'adaptive_asked' not in st.session_state: st.session_state.adaptive_asked = []
 
 # ======================================
 # 3. DIAGNOSTIC WIZARD
 # ======================================
 st.markdown("---")
-st.write(f"**Step {st.session_state.step} of 6**")
-progress = st.progress(st.session_state.step / 6)
 
-# ------------------------------------------------------------------
-# STEP 1: VISUAL & DISPLAY
-# ------------------------------------------------------------------
-if st.session_state.step == 1:
-    st.subheader("🖥️ Display & Visuals")
-    
-    st.caption("Reference: Kiray & Sianturi (2020), Qurashi et al. (2017)")
-    # 
-
-    # Mapping logic for Display Rules
-    display_mapping = {
-        "Lines, black blocks, or artifacts":     ("artifacts", 1.0),
-        "Distorted / Corrupted image":           ("distorted", 1.0),
-        "Completely black screen":               ("black", 1.0),
-        "Normal clear display":                  ("clear", 1.0),
-        "Not sure":                              ("unknown", 0.0)
-    }
-    ans_disp = st.radio("What do you see on the screen?", list(display_mapping.keys()))
-    
-    if st.button("Next ➡️"):
-        st.session_state.answers['screen-visuals'] = (ans_disp, display_mapping)
-        st.session_state.step += 1
-        st.rerun()
+# Mode can only be chosen before the first answer
+if st.session_state.step == 1 and not st.session_state.answers:
+    st.session_state.adaptive_mode = st.toggle(
+        "⚡ Adaptive mode: ask the most informative questions first and stop once the diagnosis is decisive",
+        value=st.session_state.adaptive_mode,
+    )
+
+adaptive = st.session_state.adaptive_mode and st.session_state.step < WIZARD_STEP_COUNT
+if adaptive:
+    asked = st.session_state.adaptive_asked
+    st.write(f"**Question {len(asked) + 1}** (adaptive)")
+    progress = st.progress(len(asked) / len(QUESTIONS))
+else:
+    st.write(f"**Step {st.session_state.step} of {WIZARD_STEP_COUNT}**")
+    progress = st.progress(st.session_state.step / WIZARD_STEP_COUNT)
 
 # ------------------------------------------------------------------
-# STEP 2: AUDIO SYSTEM
+# ADAPTIVE MODE: ONE QUESTION AT A TIME, ORDERED BY INFORMATION GAIN
 # ------------------------------------------------------------------
-elif st.session_state.step == 2:
-    st.subheader("🔊 Audio System")
-    st.caption("Reference: Jern et al. (2021), Bassil (2012)")
-    # 
-
-    # Q1: Volume Bar (Source A)
-    vol_mapping = {
-        "Green bar is moving":           ("bar-moving", 1.0), # Changed from 'moving'
-        "Bar moves irregularly/randomly": ("bar-irregular", 1.0),
-        "Bar is frozen/gray":            ("bar-frozen", 1.0),
-        "Not sure":                      ("unknown", 0.0)
-    }
-    ans_vol = st.radio("Check Volume Mixer. Is the bar moving?", list(vol_mapping.keys()))
-    
-    # Q2: Sound Output (Source A)
-    sound_mapping = {
-        "No sound at all":               ("sound-none", 1.0), # Changed from 'none'
-        "Scratchy, distorted, rattling": ("sound-distorted", 1.0),
-        "Sound is normal":               ("sound-normal", 1.0)
-    }
-    ans_sound = st.radio("What do you hear?", list(sound_mapping.keys()))
-
-    # Q3: Hardware Detection (Source B)
-    card_mapping = {
-        "Sound card NOT detected / Red X": ("not-detected", 1.0),
-        "Sound card is detected":          ("detected", 1.0),
-        "I can't check this":              ("unknown", 0.0)
-    }
-    ans_card = st.radio("Is the Sound Card detected in Device Manager?", list(card_mapping.keys()))
-
-    col1, col2 = st.columns(2)
-    if col1.button("⬅️ Back"): st.session_state.step -= 1; st.rerun()
-    if col2.button("Next ➡️"):
-        st.session_state.answers['volume-bar'] = (ans_vol, vol_mapping)
-        st.session_state.answers['volume-behavior'] = (ans_vol, vol_mapping) # For interference rule
-        st.session_state.answers['sound-output'] = (ans_sound, sound_mapping)
-        st.session_state.answers['sound-quality'] = (ans_sound, sound_mapping)
-        st.session_state.answers['sound-card-status'] = (ans_card, card_mapping)
-        st.session_state.step += 1
+if adaptive:
+    planner = get_planner(RULES_PATH, knowledge.rules_version, knowledge.cases, knowledge.cases_version)
+    decision = planner.decide(answered_questions(st.session_state.answers))
+    if decision["question"] is None:
+        # Reloaded knowledge made the answers so far decisive
+        st.session_state.adaptive_stop = decision
+        st.session_state.step = WIZARD_STEP_COUNT
         st.rerun()
-
-# ------------------------------------------------------------------
-# STEP 3: THERMAL & CPU
-# ------------------------------------------------------------------
-elif st.session_state.step == 3:
-    st.subheader("🌡️ Thermal & CPU")
-    st.caption("Reference: Chinnathampy et al. (2025), Miracle (2024)")
+    question = QUESTIONS[decision["question"]]
+    step_meta = question_step(question["key"])
     
-    # Q1: Temperature (Source A)
-    temp_mapping = {
-        "Above 85°C (Measured)":         ("temp-above-85", 1.0),
-        "Rising rapidly/Unusual":        ("temp-rising-rapidly", 0.8),
-        "Hot to the touch":              ("temp-above-85", 0.6), 
-        "Normal":                        ("temp-normal", 1.0),
-        "Not sure":                      ("unknown", 0.0)
-    }
-    ans_temp = st.radio("CPU Temperature Status:", list(temp_mapping.keys()))
-
-    # Q2: Boot Warning (Source B)
-    boot_warn_mapping = {
-        "Yes, 'CPU Overheat' warning":   ("warn-cpu-overheat", 1.0), # Changed from 'cpu-overheat'
-        "No warning":                    ("none", 1.0)
-    }
-    ans_warn = st.radio("Did you see a CPU Overheat warning at boot?", list(boot_warn_mapping.keys()))
-
-    col1, col2 = st.columns(2)
-    if col1.button("⬅️ Back"): st.session_state.step -= 1; st.rerun()
-    if col2.button("Next ➡️"):
-        st.session_state.answers['cpu-temp'] = (ans_temp, temp_mapping)
-        st.session_state.answers['temp-pattern'] = (ans_temp, temp_mapping)
-        st.session_state.answers['boot-warning'] = (ans_warn, boot_warn_mapping)
-        st.session_state.step += 1
-        st.rerun()
-
-# ------------------------------------------------------------------
-# STEP 4: POWER & STARTUP (Source B Heavy)
-# ------------------------------------------------------------------
-elif st.session_state.step == 4:
-    st.subheader("⚡ Power & Startup")
-    st.caption("Reference: Miracle (2024), Laksana (2024)")
-    # 
-
-    # Q1: Lights
-    light_mapping = {
-        "Lights are ON":       ("light-on", 1.0), # Added 'light-' prefix
-        "No lights (OFF)":     ("light-off", 1.0),
-        "Not sure":            ("unknown", 0.0)
-    }
-    ans_light = st.radio("Power LED Status:", list(light_mapping.keys()))
+    st.subheader(step_meta["title"])
+    st.caption(step_meta["caption"])
+    answer = st.radio(question["prompt"], list(question["mapping"].keys()))
     
-    # Q2: Fans
-    fan_mapping = {
-        "Silent (No noise)":   ("fan-silent", 1.0), # Added 'fan-' prefix
-        "Spinning / Noisy":    ("fan-spinning", 1.0),
-        "Not sure":            ("unknown", 0.0)
-    }
-    ans_fan = st.radio("Fan Status:", list(fan_mapping.keys()))
-
-    # Q3: System State (For Laksana rules)
-    state_mapping = {
-        "Computer is On but Black Screen (No Boot)": ("on-no-boot", 1.0),
-        "Computer shuts down randomly":              ("random-shutdowns", 1.0), # For PSU aging
-        "Completely dead":                           ("shutdown", 1.0),
-        "Boots normally":                            ("booted", 1.0)
-    }
-    ans_state = st.radio("System Behavior:", list(state_mapping.keys()))
-
     col1, col2 = st.columns(2)
-    if col1.button("⬅️ Back"): st.session_state.step -= 1; st.rerun()
+    if col1.button("⬅️ Back", disabled=not asked):
+        previous = QUESTIONS[asked.pop()]
+        for symptom in previous["symptoms"]:
+            st.session_state.answers.pop(symptom, None)
+        st.rerun()
     if col2.button("Next ➡️"):
-        st.session_state.answers['power-lights'] = (ans_light, light_mapping)
-        st.session_state.answers['fan-status'] = (ans_fan, fan_mapping)
-        st.session_state.answers['system-state'] = (ans_state, state_mapping)
-        st.session_state.answers['system-behavior'] = (ans_state, state_mapping)
-        st.session_state.step += 1
+        record_answer(st.session_state.answers, question, answer)
+        asked.append(question["key"])
+        decision = planner.decide(answered_questions(st.session_state.answers))
+        if decision["question"] is None:
+            # Decisive: skip the remaining questions
+            st.session_state.adaptive_stop = decision
+            st.session_state.step = WIZARD_STEP_COUNT
         st.rerun()
 
 # ------------------------------------------------------------------
-# STEP 5: STORAGE & BEEPS & MESSAGES
+# STEPS 1-5: FIXED WIZARD (questions from questions.py)
 # ------------------------------------------------------------------
-elif st.session_state.step == 5:
-    st.subheader("💾 Storage, Beeps & Errors")
-    st.caption("Reference: Bassil (2012), Jern et al. (2021)")
-
-    # Q1: Error Messages (Source A & B)
-    err_mapping = {
-        "DISK BOOT FAILURE":             ("disk-boot-failure", 1.0),
-        "SMART Warning / Backup":        ("smart-warning", 1.0),
-        "IDE Drive Not Ready":           ("ide-not-ready", 1.0),
-        "No specific error":             ("none", 1.0)
-    }
-    ans_err = st.radio("Do you see any text errors?", list(err_mapping.keys()))
-
-    # Q2: Beep Codes (Source B)
-    # 
-    beep_mapping = {
-        "One very short beep":           ("very-short", 1.0),
-        "One short beep":                ("short", 1.0),
-        "Long beeps":                    ("long", 1.0),
-        "Repeated long beeps":           ("repeated-long", 1.0),
-        "Continuous tone":               ("continuous", 1.0),
-        "No beeps":                      ("none", 1.0)
-    }
-    ans_beep = st.radio("Beep Code Pattern:", list(beep_mapping.keys()))
-
-    # Q3: Age (Source A)
-    age_mapping = {
-        "Old (> 3 years)":               ("old", 1.0),
-        "New (< 3 years)":               ("new", 1.0)
-    }
-    ans_age = st.radio("Device Age:", list(age_mapping.keys()))
-
-    col1, col2 = st.columns(2)
-    if col1.button("⬅️ Back"): st.session_state.step -= 1; st.rerun()
-    if col2.button("Next ➡️"):
-        st.session_state.answers['error-message'] = (ans_err, err_mapping)
-        st.session_state.answers['hdd-status'] = (ans_err, err_mapping) # reuse mapping
-        st.session_state.answers['beep-duration'] = (ans_beep, beep_mapping)
-        st.session_state.answers['beep-code'] = (ans_beep, beep_mapping)
-        st.session_state.answers['system-age'] = (ans_age, age_mapping)
-        st.session_state.answers['device-age'] = (ans_age, age_mapping)
-        st.session_state.answers['boot-behavior'] = (ans_age, age_mapping) # placeholder, mapped in step 4 actually
+elif st.session_state.step < WIZARD_STEP_COUNT:
+    step_meta = step_info(st.session_state.step)
+    st.subheader(step_meta["title"])
+    st.caption(step_meta["caption"])
+    
+    selections = [(question, st.radio(question["prompt"], list(question["mapping"].keys())))
+                  for question in step_meta["questions"]]
+    
+    def save_step():
+        for question, answer in selections:
+            record_answer(st.session_state.answers, question, answer)
         st.session_state.step += 1
-        st.rerun()
+    
+    if st.session_state.step == 1:
+        if st.button("Next ➡️"):
+            save_step()
+            st.rerun()
+    else:
+        col1, col2 = st.columns(2)
+        if col1.button("⬅️ Back"): st.session_state.step -= 1; st.rerun()
+        if col2.button("Next ➡️"):
+            save_step()
+            st.rerun()
 
 # ======================================
 # STEP 6: DUAL-ENGINE DIAGNOSIS
 # ======================================
-elif st.session_state.step == 6:
+elif st.session_state.step == WIZARD_STEP_COUNT:
     st.subheader("📋 Final Diagnostic Report")
+    
+    adaptive_stop = st.session_state.get("adaptive_stop")
+    if adaptive_stop:
+        st.info(f"⚡ Adaptive mode stopped after {adaptive_stop['asked']} of {len(QUESTIONS)} questions: "
+                f"{adaptive_stop['reason']}.")
 
     # State Management
     if "diagnosis_complete" not in st.session_state:
@@ -847,44 +424,20 @@ elif st.session_state.step == 6:
         st.info("System Ready. Click to run Hybrid Analysis.")
         if st.button("🚀 Run Diagnosis", use_container_width=True):
             st.session_state.diagnosis_complete = True
+            # Identifies this submission: the diagnosis is counted and logged once for it
+            st.session_state.diagnosis_submission = st.session_state.get("diagnosis_submission", 0) + 1
             st.rerun()
 
     # 2. Results Display
     if st.session_state.diagnosis_complete:
         
-        # --- A. PREPARE DATA ---
-        # Convert UI answers to Feature Set for Python CBR
-        user_features = get_user_features(st.session_state.answers)
-        
-        # --- B. ENGINE 1: CLIPS (Logic/RBR) ---
-        env.reset()
-        # Convert UI answers to CLIPS Facts
-        for symptom_name, (user_selection, mapping) in st.session_state.answers.items():
-            assert_fact_with_mapping(env, symptom_name, user_selection, mapping)
-        
-        env.run()
-        
-        # Harvest CLIPS Results
-        rbr_result = None
-        rbr_cf = 0
-        rbr_diagnoses = []
-        for fact in env.facts():
-            if fact.template.name == "diagnosis":
-                rbr_diagnoses.append(fact)
-
-        if rbr_diagnoses:
-            rbr_diagnoses.sort(key=lambda d: d['cf'], reverse=True)
-            rbr_result = rbr_diagnoses[0]
-            rbr_cf = rbr_result['cf']
-            rbr_alternatives = rbr_diagnoses[1:7]
-        else:
-            rbr_alternatives = []
-        
-        # --- C. ENGINE 2: PYTHON (Memory/CBR) ---
-        cbr_result, cbr_score = run_cbr_analysis(user_features)
-
-        # --- D. META-REASONING & INTEGRATED RESULTS ---
-        resolution = resolve_conflict(rbr_result, rbr_cf, cbr_result, cbr_score)
+        # --- A-D. ENGINES + META-REASONING (memoized per session) ---
+        bundle = get_diagnosis_bundle(st.session_state.answers, st.session_state.get("diagnosis_submission"))
+        user_features = bundle["user_features"]
+        rbr_result = bundle["rbr_result"]
+        rbr_alternatives = bundle["rbr_alternatives"]
+        cbr_result, cbr_score = bundle["cbr_result"], bundle["cbr_score"]
+        resolution = bundle["resolution"]
         
         # 🆕 TOP-LEVEL: FINAL RECOMMENDATION (Most Intuitive)
         if resolution['primary'] == "hybrid" and resolution.get('requires_comparison', False):
@@ -921,7 +474,7 @@ elif st.session_state.step == 6:
         
         # Show NLP status
         if NLP_AVAILABLE:
-            st.info("🧠 NLP Semantic Analysis: **Active** (Spacy en_core_web_md loaded)")
+            st.info(f"🧠 NLP Semantic Analysis: **Active** ({NLP_BACKEND})")
         else:
             st.warning("⚠️ NLP Disabled: Install Spacy for semantic similarity matching")
             with st.expander("📥 How to enable NLP"):
@@ -965,7 +518,7 @@ elif st.session_state.step == 6:
             # === RBR Inference Chain ===
             st.markdown("#### 🔧 Rule-Based Reasoning (RBR)")
             if rbr_result:
-                triggered_symptoms = get_triggered_symptoms(env)
+                triggered_symptoms = bundle["triggered_symptoms"]
                 if triggered_symptoms:
                     st.write("**Symptoms that triggered this diagnosis**:")
                     
@@ -1078,8 +631,9 @@ elif st.session_state.step == 6:
                 
                 with col_fb1:
                     if st.button("👍 Helpful", key="thumbs_up", disabled=already_voted):
-                        # Pass user features and RBR result for multi-dimensional scoring
-                        success, promoted, details = update_case_feedback(
+                        # Only the vote is recorded here; promotion (NLP endorsement + convergence)
+                        # is scored in the background and picked up on a later rerun
+                        success, _, _ = write_buffer.update_case_feedback(
                             cbr_result['id'], 
                             +1, 
                             user_features,  # For convergence check
@@ -1088,44 +642,12 @@ elif st.session_state.step == 6:
                         if success:
                             # Mark as voted
                             st.session_state.voted_cases.add(cbr_result['id'])
-                            
-                            if promoted:
-                                st.balloons()
-                                st.success("🎉 Case Auto-Promoted to VERIFIED!")
-                                # Show detailed promotion breakdown
-                                with st.expander("📊 Promotion Details", expanded=True):
-                                    st.write(f"**Total Score**: {details.get('total_points', 0)}/100 points")
-                                    breakdown = details.get('breakdown', {})
-                                    
-                                    st.metric("Community Votes", f"{breakdown.get('community', 0)} pts")
-                                    
-                                    nlp_score = breakdown.get('nlp_endorsement', 0)
-                                    semantic_pct = breakdown.get('semantic_score', 0)
-                                    if NLP_AVAILABLE:
-                                        st.metric(
-                                            "NLP Semantic Match", 
-                                            f"{nlp_score} pts",
-                                            delta=f"{semantic_pct}% similarity"
-                                        )
-                                    else:
-                                        st.metric("Text Match", f"{nlp_score} pts")
-                                    
-                                    st.metric("Pattern Convergence", f"{breakdown.get('convergence', 0)} pts")
-                                    
-                                    # Trust chain indicator
-                                    if nlp_score >= 50:
-                                        st.success("🎓 **Expert Validated**: Highly aligned with expert system")
-                                    elif breakdown.get('community', 0) >= 100:
-                                        st.info("🤝 **Community Choice**: Strong community endorsement")
-                                    if breakdown.get('convergence', 0) >= 40:
-                                        st.info("📈 **Pattern Recognized**: Recurring solution in knowledge base")
-                            else:
-                                st.success("✅ Feedback recorded!")
+                            st.success("✅ Feedback recorded!")
                             st.rerun()
                 
                 with col_fb2:
                     if st.button("👎 Not Helpful", key="thumbs_down", disabled=already_voted):
-                        success, promoted, details = update_case_feedback(
+                        success, promoted, details = write_buffer.update_case_feedback(
                             cbr_result['id'], 
                             -1, 
                             user_features,
@@ -1139,6 +661,17 @@ elif st.session_state.step == 6:
                 if already_voted:
                     with col_fb3:
                         st.caption("✓ You have already voted on this case")
+                    
+                    # Promotion is scored in the background after the vote is written
+                    details = write_buffer.pop_promotion(cbr_result['id'])
+                    if details:
+                        st.session_state.setdefault("promotions", {})[cbr_result['id']] = details
+                        st.balloons()
+                    details = st.session_state.get("promotions", {}).get(cbr_result['id'])
+                    if details:
+                        show_promotion(details)
+                    elif cbr_result['status'] == "PENDING":
+                        st.caption("⏳ Auto-promotion is evaluated in the background and shows up here on your next interaction.")
                 
                 # Show current feedback score if available
                 if cbr_result.get('feedback', 0) != 0:
@@ -1169,6 +702,10 @@ elif st.session_state.step == 6:
                 st.session_state.expert_mode = True
                 st.success("✅ Expert mode activated - your submissions will be marked as VERIFIED")
         
+        # Expanders cannot nest, so the panel sits next to Advanced Options
+        if st.session_state.expert_mode:
+            show_moderation_panel()
+        
         with st.form("learning_form"):
             new_solution = st.text_area(
                 "Correct Solution:", 
@@ -1185,7 +722,7 @@ elif st.session_state.step == 6:
             
             if submitted:
                 if new_solution:
-                    success, message = save_new_case(user_features, new_solution, st.session_state.expert_mode)
+                    success, message = write_buffer.save_new_case(user_features, new_solution, st.session_state.expert_mode)
                     if success:
                         st.success(message)
                         if not st.session_state.expert_mode:
@@ -1213,6 +750,10 @@ elif st.session_state.step == 6:
     if st.button("🔄 Start Over"):
         st.session_state.step = 1
         st.session_state.answers = {}
+        st.session_state.adaptive_asked = []
+        st.session_state.pop("adaptive_stop", None)
         if "diagnosis_complete" in st.session_state:
             del st.session_state.diagnosis_complete
+        if "diagnosis_cache" in st.session_state:
+            del st.session_state.diagnosis_cache
         st.rerun()
\ No newline at end of file
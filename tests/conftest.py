@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """A scratch working directory; the modules default to relative library paths."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def write_library(path, lines):
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(line + "\n" for line in lines)
+
+
+def read_library(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read().splitlines()
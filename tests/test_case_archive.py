@@ -0,0 +1,86 @@
+import datetime
+
+from case_archive import read_archive, restore_cases, run_retention
+from conftest import read_library, write_library
+from expert_engine import iter_case_records
+
+TODAY = datetime.date(2026, 6, 1)
+
+LINES = [
+    "CASE-00001 | VERIFIED | cpu-temp:high fan-status:fan-silent | Replace the CPU fan | 3 | 2025-01-01",
+    "CASE-00002 | PENDING | beep-code:continuous | Reseat the RAM | -3 | 2026-05-30",
+    "CASE-00003 | PENDING | sound-output:none | Reinstall the audio driver | 0 | 2025-12-01",
+    "CASE-00004 | PENDING | hdd-status:clicking | Back up and replace the disk | 1 | 2026-05-01",
+]
+
+
+def test_retention_archives_dead_and_stale_cases(workdir):
+    write_library("case_library.txt", LINES)
+
+    report = run_retention("case_library.txt", "archive.jsonl.gz", max_pending_age_days=90, today=TODAY)
+
+    assert {(r["id"], r["reason"]) for r in report["archived"]} == {
+        ("CASE-00002", "dead"), ("CASE-00003", "stale-pending")}
+    assert read_library("case_library.txt") == [LINES[0], LINES[3]]
+    assert [r["line"] for r in read_archive("archive.jsonl.gz")] == [LINES[1], LINES[2]]
+
+
+def test_dry_run_changes_nothing(workdir):
+    write_library("case_library.txt", LINES)
+
+    report = run_retention("case_library.txt", "archive.jsonl.gz", today=TODAY, dry_run=True)
+
+    assert len(report["archived"]) == 2
+    assert read_library("case_library.txt") == LINES
+    assert read_archive("archive.jsonl.gz") == []
+
+
+def test_restore_round_trip(workdir):
+    write_library("case_library.txt", LINES)
+    run_retention("case_library.txt", "archive.jsonl.gz", max_pending_age_days=90, today=TODAY)
+
+    assert restore_cases(["CASE-00003"], "case_library.txt", "archive.jsonl.gz") == ["CASE-00003"]
+    assert read_library("case_library.txt") == [LINES[0], LINES[3], LINES[2]]
+    assert [r["id"] for r in read_archive("archive.jsonl.gz")] == ["CASE-00002"]
+
+    assert restore_cases(None, "case_library.txt", "archive.jsonl.gz") == ["CASE-00002"]
+    assert sorted(read_library("case_library.txt")) == sorted(LINES)
+    assert read_archive("archive.jsonl.gz") == []
+
+
+def test_undated_pending_cases_are_stamped_then_age_out(workdir):
+    write_library("case_library.txt", [
+        "CASE-00010 | PENDING | sound-output:none | Check the speaker cable | 0",
+        "CASE-00011 | PENDING | sound-output:none | Check the mute switch",
+        "CASE-00012 | VERIFIED | sound-output:none | Update the driver | 2",
+    ])
+
+    report = run_retention("case_library.txt", "archive.jsonl.gz", max_pending_age_days=90, today=TODAY)
+
+    assert report["archived"] == []
+    assert report["dated"] == ["CASE-00010", "CASE-00011"]
+    assert read_library("case_library.txt") == [
+        "CASE-00010 | PENDING | sound-output:none | Check the speaker cable | 0 | 2026-06-01",
+        "CASE-00011 | PENDING | sound-output:none | Check the mute switch | 0 | 2026-06-01",
+        "CASE-00012 | VERIFIED | sound-output:none | Update the driver | 2",
+    ]
+
+    later = TODAY + datetime.timedelta(days=91)
+    report = run_retention("case_library.txt", "archive.jsonl.gz", max_pending_age_days=90, today=later)
+    assert [r["id"] for r in report["archived"]] == ["CASE-00010", "CASE-00011"]
+    assert report["dated"] == []
+
+
+def test_lines_the_engine_cannot_read_are_archived_as_malformed(workdir):
+    # Empty and non-numeric feedback scores: the CBR engine skips both lines
+    unreadable = [
+        "CASE-00005 | VERIFIED | wifi:none | Re-enable the wireless adapter |  | 2026-05-01",
+        "CASE-00006 | VERIFIED | wifi:none | Restart the router | high | 2026-05-01",
+    ]
+    write_library("case_library.txt", [LINES[0]] + unreadable)
+    assert [case["id"] for case in iter_case_records("case_library.txt")] == ["CASE-00001"]
+
+    report = run_retention("case_library.txt", "archive.jsonl.gz", today=TODAY)
+
+    assert [(r["line"], r["reason"]) for r in report["archived"]] == [(line, "malformed") for line in unreadable]
+    assert read_library("case_library.txt") == [LINES[0]]
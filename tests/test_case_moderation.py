@@ -0,0 +1,91 @@
+import datetime
+import threading
+
+from case_archive import read_archive, restore_cases
+from case_moderation import moderate, review_queue
+from conftest import read_library, write_library
+from file_lock import file_lock
+from write_behind import WriteBehindBuffer
+
+TODAY = datetime.date(2026, 10, 1)
+LINES = [
+    "CASE-00001 | VERIFIED | cpu-temp:high | Replace the CPU fan | 3 | 2026-01-01",
+    "CASE-00002 | PENDING | sound-output:none | Reinstall the audio driver | 0 | 2026-09-25",
+    "CASE-00003 | PENDING | beep-code:none | Reseat the memory modules | -2 | 2026-06-01",
+    "CASE-00004 | PENDING | wifi:none | Re-enable the wireless adapter | 1 | 2026-08-01",
+]
+
+
+def test_queue_is_filtered_and_oldest_first(workdir):
+    write_library("case_library.txt", LINES)
+
+    queue = review_queue(today=TODAY, min_age_days=30)
+    assert [case["id"] for case in queue] == ["CASE-00003", "CASE-00004"]
+    assert queue[0]["age_days"] == 122
+
+
+def test_approve_and_reject_in_one_rewrite_each(workdir):
+    write_library("case_library.txt", LINES)
+
+    result = moderate("approve", ["CASE-00002", "CASE-00001"], today=TODAY)
+    assert result["changed"] == ["CASE-00002"]
+    assert result["skipped"] == ["CASE-00001"]  # Not PENDING
+
+    result = moderate("reject", today=TODAY, max_score=-1)
+    assert result["changed"] == ["CASE-00003"]
+    assert read_library("case_library.txt") == [
+        LINES[0], LINES[1].replace("PENDING", "VERIFIED"), LINES[3]]
+    assert [(r["id"], r["reason"]) for r in read_archive()] == [("CASE-00003", "rejected")]
+
+    restore_cases(["CASE-00003"])
+    assert LINES[2] in read_library("case_library.txt")
+
+
+def test_dry_run_changes_nothing(workdir):
+    write_library("case_library.txt", LINES)
+
+    result = moderate("archive", today=TODAY, dry_run=True, min_age_days=0)
+    assert result["changed"] == ["CASE-00002", "CASE-00003", "CASE-00004"]
+    assert read_library("case_library.txt") == LINES
+    assert read_archive() == []
+
+
+def test_moderation_waits_for_the_library_lock(workdir):
+    write_library("case_library.txt", LINES)
+    results = []
+    thread = threading.Thread(target=lambda: results.append(moderate("approve", ["CASE-00004"])))
+
+    with file_lock("case_library.txt"):
+        thread.start()
+        thread.join(0.3)
+        assert thread.is_alive()
+        # A writer holding the lock appends a case meanwhile
+        with open("case_library.txt", "a", encoding="utf-8") as f:
+            f.write("CASE-00005 | PENDING | wifi:none | Restart the router | 0 | 2026-10-01\n")
+    thread.join(5)
+
+    assert results[0]["changed"] == ["CASE-00004"]
+    assert read_library("case_library.txt")[-1].startswith("CASE-00005")
+
+
+def test_buffer_exclusive_holds_the_library_lock(workdir):
+    write_library("case_library.txt", LINES)
+    buffer = WriteBehindBuffer("case_library.txt", max_batch=10000, max_delay=3600)
+    acquired = threading.Event()
+
+    def other_writer():
+        with file_lock("case_library.txt"):
+            acquired.set()
+
+    try:
+        buffer.update_case_feedback("CASE-00001", 1)
+        with buffer.exclusive():
+            assert read_library("case_library.txt")[0].split(" | ")[4] == "4"  # Flushed first
+            thread = threading.Thread(target=other_writer)
+            thread.start()
+            assert not acquired.wait(0.2)
+            moderate("approve", ["CASE-00002"])  # Re-entrant for the holder
+        thread.join(5)
+        assert acquired.is_set()
+    finally:
+        buffer.close()
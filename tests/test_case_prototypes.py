@@ -0,0 +1,76 @@
+import random
+
+import pytest
+
+from case_prototypes import PrototypeIndex, _exhaustive
+
+FEATURE_VALUES = {
+    "error-message": ["bsod", "disk-read", "none"],
+    "beep-code": ["long-repeating", "continuous", "none"],
+    "cpu-temp": ["high", "normal"],
+    "fan-status": ["fan-silent", "fan-loud", "normal"],
+    "sound-output": ["none", "distorted"],
+    "volume-bar": ["moving", "static"],
+    "hdd-status": ["clicking", "normal"],
+    "device-age": ["old", "new"],
+    "custom-note": ["a", "b"],  # Not in FEATURE_WEIGHTS: weight 1.0
+}
+
+
+def synthetic_library(n, seed=0):
+    """Cases scattered around a few base patterns, so clusters have many members."""
+    rng = random.Random(seed)
+    keys = sorted(FEATURE_VALUES)
+    bases = [{f"{key}:{rng.choice(FEATURE_VALUES[key])}" for key in rng.sample(keys, 5)} for _ in range(6)]
+    cases = []
+    for i in range(n):
+        features = set(rng.choice(bases))
+        for _ in range(rng.randint(0, 3)):
+            key = rng.choice(keys)
+            features = {f for f in features if not f.startswith(key + ":")}
+            if rng.random() < 0.7:
+                features.add(f"{key}:{rng.choice(FEATURE_VALUES[key])}")
+        cases.append({
+            "id": f"CASE-{i:05d}",
+            "status": rng.choice(["VERIFIED", "PENDING"]),
+            "features": features,
+            "solution": f"Solution {i}",
+            "feedback": rng.randint(-2, 6),
+        })
+    return cases, bases
+
+
+def queries(cases, bases, n, seed=1):
+    rng = random.Random(seed)
+    keys = sorted(FEATURE_VALUES)
+    result = [set(case["features"]) for case in rng.sample(cases, n // 2)] + [set(b) for b in bases]
+    while len(result) < n:
+        result.append({f"{key}:{rng.choice(FEATURE_VALUES[key])}" for key in rng.sample(keys, rng.randint(1, 6))})
+    result.append({"unknown-feature:x"})
+    return result
+
+
+@pytest.mark.parametrize("radius", [0.2, 0.35, 0.6])
+def test_exact_query_matches_the_exhaustive_scan(radius):
+    cases, bases = synthetic_library(1500)
+    index = PrototypeIndex(cases, radius)
+    # The pruning path only runs with multi-member clusters
+    assert max(len(members) for members in index.members) > 1
+    assert len(index.prototypes) < len(index.feature_sets)
+
+    pruned = 0
+    for features in queries(cases, bases, 300):
+        match, score, work = index.query(features, probes=None)
+        expected_id, expected_score = _exhaustive(features, cases)
+        assert (match["id"] if match else None, score) == (expected_id, pytest.approx(expected_score, abs=1e-9))
+        pruned += work < len(index.prototypes) + len(index.feature_sets)
+    assert pruned  # Some queries skipped whole clusters
+
+
+def test_probed_query_never_beats_the_exact_one():
+    cases, bases = synthetic_library(500)
+    index = PrototypeIndex(cases, 0.35)
+    for features in queries(cases, bases, 100):
+        _, exact, _ = index.query(features, probes=None)
+        _, probed, _ = index.query(features, probes=1)
+        assert probed <= exact + 1e-9
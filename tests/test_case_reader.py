@@ -0,0 +1,148 @@
+import os
+
+import pytest
+
+from case_reader import append_lines, iter_cases, iter_cases_containing, open_library, splice_atomic, splice_many
+from expert_engine import IncrementalCaseIndex
+
+LIBRARY = (
+    b"CASE-00001 | VERIFIED | cpu-temp:high fan-status:fan-silent | Replace the CPU fan | 3\r\n"
+    b"\n"
+    b"   \t\n"
+    b"  CASE-00002 | PENDING | sound-output:none | Reinstall the audio driver | 0\n"
+    b"CASE-00003 | legacy-feature:x | Legacy solution"
+)
+
+
+@pytest.fixture
+def library(workdir):
+    with open("case_library.txt", "wb") as f:
+        f.write(LIBRARY)
+    return "case_library.txt"
+
+
+def read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_iter_cases_skips_blank_lines_and_strips_terminators(library):
+    with open_library(library) as mm:
+        cases = list(iter_cases(mm))
+        assert [case.field(0) for case in cases] == ["CASE-00001", "CASE-00002", "CASE-00003"]
+        assert not cases[0].text().endswith("\r")
+        assert cases[2].next_offset == len(mm)  # Final line without a terminator
+        # A scan can resume from any line start
+        assert [case.field(0) for case in iter_cases(mm, cases[1].next_offset)] == ["CASE-00003"]
+
+
+def test_features_are_located_in_both_line_formats(library):
+    with open_library(library) as mm:
+        current, _, legacy = iter_cases(mm)
+        assert current.features_contain([b"fan-status:fan-silent"])
+        assert not current.features_contain([b"Replace"])  # Solution text is not a feature
+        assert current.features_contain([b"cpu-temp:high", b"fan-status:fan-silent"], require_all=True)
+        assert not current.features_contain([b"cpu-temp:high", b"sound-output:none"], require_all=True)
+        assert legacy.features_contain([b"legacy-feature:x"])
+
+
+def test_iter_cases_containing_yields_each_line_once_in_file_order(library):
+    with open_library(library) as mm:
+        needles = [b"sound-output:none", b"cpu-temp:high", b"fan-status", b"CASE-0000"]
+        assert [case.field(0) for case in iter_cases_containing(mm, needles)] == [
+            "CASE-00001", "CASE-00002", "CASE-00003"]
+        assert list(iter_cases_containing(mm, [b"no-such-feature"])) == []
+
+
+def test_missing_or_empty_library_reads_as_no_cases(workdir):
+    with open_library("missing.txt") as mm:
+        assert mm is None and list(iter_cases(mm)) == []
+    open("empty.txt", "wb").close()
+    with open_library("empty.txt") as mm:
+        assert list(iter_cases_containing(mm, [b"x"])) == []
+
+
+def test_splice_many_replaces_spans_and_appends_the_tail(library):
+    with open_library(library) as mm:
+        first, second, _ = iter_cases(mm)
+        score = first.field_span(4)
+        status = second.field_span(1)
+        edits = [(status[0], status[1], b" VERIFIED ", mm[status[0]:status[1]]),
+                 (score[0], score[1], b" 4", mm[score[0]:score[1]])]
+
+    splice_many(library, edits, tail=b"CASE-00004 | PENDING | wifi:none | Restart the router | 0\n")
+
+    assert read_bytes(library) == (
+        LIBRARY.replace(b"| 3\r\n", b"| 4\r\n").replace(b"| PENDING |", b"| VERIFIED |")
+        + b"\nCASE-00004 | PENDING | wifi:none | Restart the router | 0\n"
+    )
+
+
+def test_splice_refuses_a_library_that_changed_since_it_was_read(library):
+    with open_library(library) as mm:
+        first = next(iter_cases(mm))
+        span = first.field_span(4)
+    with open(library, "r+b") as f:
+        f.seek(span[0])
+        f.write(b" 7")
+
+    with pytest.raises(ValueError):
+        splice_atomic(library, span[0], span[1], b" 4", expected=b" 3")
+    assert read_bytes(library) == LIBRARY.replace(b"| 3\r\n", b"| 7\r\n")
+
+
+def test_append_lines_never_merges_into_an_unterminated_last_line(library):
+    append_lines(library, ["CASE-00004 | PENDING | wifi:none | Restart the router | 0\n"])
+
+    with open_library(library) as mm:
+        assert [case.field(0) for case in iter_cases(mm)][-2:] == ["CASE-00003", "CASE-00004"]
+
+
+NEW_CASE = "CASE-00004 | PENDING | wifi:none | Restart the router | 0\n"
+
+
+def test_index_parses_only_the_appended_tail(library):
+    index = IncrementalCaseIndex(library)
+    before = index.cases
+    append_lines(library, [NEW_CASE])
+
+    assert index.refresh() == "appended"
+    assert index.unchanged == 2  # CASE-00003 had no terminator and was re-read
+    assert [case["id"] for case in index.cases] == ["CASE-00001", "CASE-00002", "CASE-00003", "CASE-00004"]
+    assert index.cases[:2] == before[:2] and len(before) == 3  # The old list is not mutated
+    assert index.offset == os.path.getsize(library)
+
+
+def test_partial_last_line_is_re_read_once_complete(workdir):
+    with open("case_library.txt", "w", encoding="utf-8") as f:
+        f.write("CASE-00001 | VERIFIED | cpu-temp:high | Replace the CPU fan | 3\n")
+        f.write("CASE-00002 | PENDING | sound-output:none | Reinstall")
+    index = IncrementalCaseIndex("case_library.txt")
+    assert index.cases[1]["solution"] == "Reinstall"
+
+    with open("case_library.txt", "a", encoding="utf-8") as f:
+        f.write(" the audio driver | 0\n")
+    assert index.refresh() == "appended"
+    assert [case["solution"] for case in index.cases] == ["Replace the CPU fan", "Reinstall the audio driver"]
+
+
+def test_rewritten_or_truncated_library_is_rebuilt(library):
+    index = IncrementalCaseIndex(library)
+    splice_atomic(library, 0, len(b"CASE-00001"), b"CASE-00009")  # New inode
+    assert index.refresh() == "rebuilt"
+    assert index.unchanged == 0 and index.cases[0]["id"] == "CASE-00009"
+
+    with open(library, "r+b") as f:  # Same inode, shorter
+        f.truncate(len(LIBRARY.splitlines(keepends=True)[0]))
+    assert index.refresh() == "rebuilt"
+    assert [case["id"] for case in index.cases] == ["CASE-00009"]
+
+
+def test_in_place_rewrite_of_the_indexed_head_is_rebuilt(library):
+    index = IncrementalCaseIndex(library)
+    with open(library, "r+b") as f:  # Same inode and size, different first case
+        f.write(b"CASE-00008")
+    append_lines(library, [NEW_CASE])
+
+    assert index.refresh() == "rebuilt"
+    assert index.cases[0]["id"] == "CASE-00008"
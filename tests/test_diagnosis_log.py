@@ -0,0 +1,75 @@
+import subprocess
+import sys
+
+from conftest import REPO_ROOT
+from diagnosis_log import DiagnosisEventLog, compress_leftover_segments, iter_events, segment_paths
+
+WRITER = """
+import sys
+from diagnosis_log import DiagnosisEventLog
+log = DiagnosisEventLog("diagnoses.jsonl", max_bytes=2000, keep_segments=1000, max_batch=7, max_delay=3600)
+for i in range(int(sys.argv[2])):
+    log.emit({"writer": sys.argv[1], "seq": i, "pad": "x" * 40})
+log.close()
+"""
+
+
+def make_log(tmp_path, **kwargs):
+    kwargs.setdefault("max_delay", 3600)
+    return DiagnosisEventLog(str(tmp_path / "diagnoses.jsonl"), **kwargs)
+
+
+def test_rotation_keeps_order_and_prunes_old_segments(workdir):
+    log = make_log(workdir, max_bytes=500, keep_segments=3)
+    try:
+        for i in range(100):
+            log.emit({"seq": i, "pad": "x" * 40})
+        assert log.flush() == 100
+    finally:
+        log.close()
+
+    assert log.stats["rotations"] > 3
+    assert len(segment_paths(log.path)) == 3
+    seqs = [event["seq"] for event in iter_events(log.path)]
+    assert seqs == sorted(seqs)
+    assert seqs[-1] == 99
+
+
+def test_leftover_plain_segment_is_compressed(workdir):
+    leftover = workdir / "diagnoses.20260101T000000000000Z.jsonl"
+    leftover.write_text('{"seq":0}\n', encoding="utf-8")
+    compress_leftover_segments(str(workdir / "diagnoses.jsonl"))
+
+    assert not leftover.exists()
+    assert [event["seq"] for event in iter_events(str(workdir / "diagnoses.jsonl"))] == [0]
+
+
+def test_writer_follows_a_rotation_by_another_process(workdir):
+    first, second = make_log(workdir, max_bytes=300), make_log(workdir, max_bytes=300)
+    try:
+        first.emit({"seq": 0})
+        first.flush()
+        for i in range(1, 10):
+            second.emit({"seq": i, "pad": "x" * 40})
+        second.flush()  # Rotates the file `first` still has open
+        first.emit({"seq": 10})
+        first.flush()
+    finally:
+        first.close()
+        second.close()
+
+    assert sorted(event["seq"] for event in iter_events(first.path)) == list(range(11))
+
+
+def test_concurrent_processes_lose_no_events(workdir):
+    writers, per_writer = 4, 400
+    env = {"PYTHONPATH": REPO_ROOT}
+    procs = [subprocess.Popen([sys.executable, "-c", WRITER, str(n), str(per_writer)], env=env)
+             for n in range(writers)]
+    for proc in procs:
+        assert proc.wait(timeout=120) == 0
+
+    events = list(iter_events(str(workdir / "diagnoses.jsonl")))
+    assert len(segment_paths(str(workdir / "diagnoses.jsonl"))) > 1
+    assert sorted((e["writer"], e["seq"]) for e in events) == \
+        sorted((str(n), i) for n in range(writers) for i in range(per_writer))
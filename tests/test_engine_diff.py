@@ -0,0 +1,55 @@
+import argparse
+import os
+import shutil
+
+import pytest
+
+from conftest import REPO_ROOT
+from engine_diff import CBR_ENGINES, MODES, RBR_ENGINES, answer_sheets, compare, diagnose, main
+from expert_engine import load_case_index, run_cbr_analysis
+
+
+@pytest.fixture
+def repo_files(workdir):
+    for name in ("rules.clp", "case_library.txt"):
+        shutil.copy(os.path.join(REPO_ROOT, name), workdir)
+
+
+def second_best_engine(config):
+    """A deliberately wrong CBR: the runner-up case instead of the best one."""
+    cases = load_case_index(config.library)
+
+    def cbr(features):
+        best, _ = run_cbr_analysis(features, cases)
+        if best is None:
+            return None, 0.0
+        return run_cbr_analysis(features, [case for case in cases if case["id"] != best["id"]])
+    return cbr
+
+
+@pytest.fixture
+def broken_mode(monkeypatch):
+    monkeypatch.setitem(CBR_ENGINES, "second-best", second_best_engine)
+    monkeypatch.setitem(MODES, "broken", ("clips", "second-best"))
+
+
+def test_compare_reports_a_wrong_best_case_and_verdict(repo_files, broken_mode):
+    config = argparse.Namespace(rules="rules.clp", library="case_library.txt")
+    reference = (RBR_ENGINES["clips"](config), CBR_ENGINES["index"](config))
+    broken = (RBR_ENGINES["clips"](config), second_best_engine(config))
+
+    differences = set()
+    for answers in answer_sheets(100):
+        expected, _, _ = diagnose(*reference, answers)
+        assert compare(expected, diagnose(*reference, answers)[0]) == []
+        differences.update(compare(expected, diagnose(*broken, answers)[0]))
+    assert {"best_case", "score", "verdict"} <= differences
+    assert not differences & {"diagnoses", "triggered"}  # The RBR side is untouched
+
+
+def test_main_fails_on_a_wrong_engine_and_passes_an_equivalent_one(repo_files, broken_mode, capsys):
+    assert main(["--modes", "broken", "--samples", "50"]) == 1
+    assert "❌ Mismatches" in capsys.readouterr().out
+
+    assert main(["--modes", "incremental-index", "prototypes", "--samples", "50"]) == 0
+    assert "✅ Equivalent" in capsys.readouterr().out
@@ -0,0 +1,23 @@
+from conftest import read_library, write_library
+from expert_engine import update_case_feedback
+
+LINES = [
+    "CASE-10001 | VERIFIED | cpu-temp:high | Replace the CPU fan | 3 | 2026-01-01",
+    "CASE-1000 | VERIFIED | sound-output:none | Reinstall the audio driver | 5 | 2026-01-02",
+]
+
+
+def test_feedback_updates_only_the_exact_case_id(workdir):
+    write_library("case_library.txt", LINES)
+
+    success, promoted, _ = update_case_feedback("CASE-1000", 1)
+
+    assert success and not promoted
+    assert read_library("case_library.txt") == [LINES[0], LINES[1].replace("| 5 |", "| 6 |")]
+
+
+def test_feedback_for_an_unknown_id_changes_nothing(workdir):
+    write_library("case_library.txt", LINES)
+
+    assert update_case_feedback("CASE-100", 1) == (False, False, {})
+    assert read_library("case_library.txt") == LINES
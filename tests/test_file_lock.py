@@ -0,0 +1,43 @@
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from conftest import REPO_ROOT
+from file_lock import file_lock
+
+CHILD = "import sys; sys.path.insert(0, sys.argv[1]); from file_lock import file_lock\nwith file_lock(sys.argv[2]): print('locked')"
+
+
+def test_lock_is_reentrant_within_a_thread(workdir):
+    with file_lock("case_library.txt"):
+        with file_lock("case_library.txt"):
+            pass
+    with file_lock("case_library.txt"):
+        pass
+
+
+def test_other_threads_wait(workdir):
+    acquired = threading.Event()
+
+    def other():
+        with file_lock("case_library.txt"):
+            acquired.set()
+
+    with file_lock("case_library.txt"):
+        thread = threading.Thread(target=other)
+        thread.start()
+        assert not acquired.wait(0.2)
+    thread.join(5)
+    assert acquired.is_set()
+
+
+def test_other_processes_wait(workdir):
+    with file_lock("case_library.txt"):
+        child = subprocess.Popen([sys.executable, "-c", CHILD, REPO_ROOT, "case_library.txt"],
+                                 stdout=subprocess.PIPE, text=True)
+        with pytest.raises(subprocess.TimeoutExpired):
+            child.wait(0.5)
+    out, _ = child.communicate(timeout=10)
+    assert out.strip() == "locked"
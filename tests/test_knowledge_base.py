@@ -0,0 +1,119 @@
+import os
+import shutil
+
+import pytest
+
+from conftest import REPO_ROOT
+from expert_engine import extend_priority, prioritize_cases
+from knowledge_base import KnowledgeBase
+
+CASES = [
+    "CASE-00001 | PENDING | cpu-temp:high | Replace the CPU fan | 0",
+    "CASE-00002 | VERIFIED | sound-output:none | Reinstall the audio driver | 2",
+    "CASE-00003 | VERIFIED | beep-code:long-repeating | Reseat the memory modules | 0",
+]
+
+
+@pytest.fixture
+def kb(workdir):
+    shutil.copy(os.path.join(REPO_ROOT, "rules.clp"), workdir)
+    with open("case_library.txt", "w", encoding="utf-8") as f:
+        f.writelines(line + "\n" for line in CASES)
+    # The test drives reload() itself
+    kb = KnowledgeBase(poll_interval=3600, rbr_table_path=None)
+    yield kb
+    kb.close()
+
+
+def touch_forward(path):
+    """Moves the mtime on, so a same-size rewrite within one clock tick is still a new version."""
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def test_appended_cases_are_inserted_into_the_priority_order(kb):
+    before = kb.current()
+    with open("case_library.txt", "a", encoding="utf-8") as f:
+        f.write("CASE-00004 | VERIFIED | wifi:none | Re-enable the wireless adapter | 5\n")
+        f.write("CASE-00005 | PENDING | wifi:none | Restart the router | 0\n")
+    assert kb.reload()
+
+    after = kb.current()
+    assert kb.reloads["appends"] == 1
+    assert after.cases[:3] == before.cases
+    assert list(after.case_priority) == list(prioritize_cases(after.cases)) == [3, 1, 2, 0, 4]
+    assert after.env is before.env
+
+
+def test_extend_priority_drops_a_replaced_partial_line():
+    cases = [{"status": "VERIFIED", "feedback": f} for f in (0, 3, 1)]
+    # The old index ordered cases 0-1 plus a partial line (index 2) now re-read as cases[2]
+    old = prioritize_cases(cases[:2] + [{"status": "PENDING", "feedback": 0}])
+    assert list(extend_priority(old, cases, 2)) == list(prioritize_cases(cases))
+
+
+def test_rewritten_library_is_reindexed(kb):
+    with open("case_library.txt", "w", encoding="utf-8") as f:
+        f.write(CASES[2] + "\n")
+    touch_forward("case_library.txt")
+    assert kb.reload()
+
+    snapshot = kb.current()
+    assert [case["id"] for case in snapshot.cases] == ["CASE-00003"]
+    assert list(snapshot.case_priority) == [0]
+    assert kb.reloads["cases"] == 1
+
+
+def test_bad_rules_are_rejected_and_the_last_good_rules_keep_serving(kb):
+    good = kb.current()
+    with open("rules.clp", "a", encoding="utf-8") as f:
+        f.write("\n(defrule broken\n")
+    touch_forward("rules.clp")
+    assert kb.reload()
+
+    snapshot = kb.current()
+    assert snapshot.env is good.env and snapshot.rules_version == good.rules_version
+    assert "rejected" in snapshot.rules_error
+    assert not kb.reload()  # The rejected version is not retried
+    assert kb.reloads["rejected"] == 1
+
+
+def rule_names(env):
+    return {rule.name for rule in env.rules()}
+
+
+def test_unchanged_files_publish_no_new_snapshot(kb):
+    before = kb.current()
+    assert not kb.reload()
+    assert kb.current() is before
+
+
+def test_changed_rules_are_swapped_in_without_touching_held_snapshots(kb):
+    held = kb.current()
+    with open("rules.clp", "a", encoding="utf-8") as f:
+        f.write("\n(defrule hot-reload-probe =>)\n")
+    touch_forward("rules.clp")
+    assert kb.reload()
+
+    snapshot = kb.current()
+    assert kb.reloads["rules"] == 1
+    assert "hot-reload-probe" in rule_names(snapshot.env)
+    assert snapshot.lock is not held.lock and snapshot.cases is held.cases
+    # A diagnosis still running on the held snapshot keeps the rules it started with
+    assert "hot-reload-probe" not in rule_names(held.env)
+
+
+def test_fixed_rules_clear_the_rejection(kb):
+    with open("rules.clp", encoding="utf-8") as f:
+        good_rules = f.read()
+    with open("rules.clp", "a", encoding="utf-8") as f:
+        f.write("\n(defrule broken\n")
+    touch_forward("rules.clp")
+    kb.reload()
+
+    with open("rules.clp", "w", encoding="utf-8") as f:
+        f.write(good_rules)
+    touch_forward("rules.clp")
+    assert kb.reload()
+    assert kb.current().rules_error is None
+    assert kb.reloads["rules"] == 1 and kb.reloads["rejected"] == 1
@@ -0,0 +1,56 @@
+import json
+
+import numpy as np
+import pytest
+
+from log_analytics import TIMING_MIN_MS, TimingHistogram, aggregate, timing_table
+
+
+def write_events(path, events):
+    with open(path, "w", encoding="utf-8") as f:
+        for event in events:
+            f.write(json.dumps(event) + "\n")
+
+
+def event(ts, cbr_ms):
+    return {"ts": ts, "features": ["cpu-temp:high"], "rbr": [], "cbr": None,
+            "resolution": {"primary": "none"}, "timings_ms": {"cbr": cbr_ms}}
+
+
+def test_until_skips_late_events_without_ending_the_scan(workdir):
+    # A process that flushed late wrote an older event after a newer one
+    write_events("diagnoses.jsonl", [
+        event("2026-07-01T10:00:00", 1.0),
+        event("2026-07-03T10:00:00", 1.0),
+        event("2026-07-02T10:00:00", 1.0),
+    ])
+
+    totals = aggregate("diagnoses.jsonl", until="2026-07-03")
+    assert totals.events == 2
+    assert totals.days == {"2026-07-01", "2026-07-02"}
+
+
+def test_timing_percentiles_are_estimated_within_half_a_percent(workdir):
+    durations = [float(ms) for ms in range(1, 101)]
+    write_events("diagnoses.jsonl", [event("2026-07-01T10:00:00", ms) for ms in durations])
+
+    # Small chunks: the durations of every chunk count
+    row = timing_table(aggregate("diagnoses.jsonl", chunk_size=7)).iloc[0]
+    assert row["events"] == 100
+    assert row["mean_ms"] == pytest.approx(50.5)
+    assert row["p50_ms"] == pytest.approx(50.5, rel=0.005)
+    assert row["p95_ms"] == pytest.approx(95.05, rel=0.005)
+
+
+def test_timing_histogram_matches_numpy_on_a_skewed_sample():
+    values = np.random.default_rng(0).lognormal(mean=3, sigma=1.5, size=20000)
+    values[:50] = 0.0  # Cached stages log zero durations
+    histogram = TimingHistogram()
+    for chunk in np.array_split(values, 13):
+        histogram.add(chunk)
+
+    assert histogram.count == len(values)
+    assert histogram.counts.nbytes < 20000  # Fixed size, not per event
+    for estimate, exact in zip(histogram.percentiles([1, 50, 95, 99.9, 100]),
+                               np.percentile(values, [1, 50, 95, 99.9, 100])):
+        assert estimate == pytest.approx(exact, rel=0.005, abs=TIMING_MIN_MS)
@@ -0,0 +1,85 @@
+import urllib.error
+import urllib.request
+
+import pytest
+
+from metrics import REGISTRY, Registry, start_http_server
+
+
+def test_registering_a_name_again_returns_the_existing_metric():
+    registry = Registry()
+    votes = registry.counter("votes_total", "Votes", ["direction"])
+    votes.inc("up")
+
+    # A Streamlit rerun re-executes the module that registers the metric
+    again = registry.counter("votes_total", "Votes", ["direction"])
+    again.inc("up", amount=2)
+    assert again is votes and votes.value("up") == 3
+
+    queue = registry.gauge("queue", "Queue length", callback=lambda: {(): 1})
+    assert registry.gauge("queue", "Queue length", callback=lambda: {(): 7}) is queue
+    assert registry.render().count("# TYPE queue gauge") == 1
+    assert "queue 7\n" in registry.render()  # The newest callback is the one scraped
+
+
+def test_render_is_prometheus_text_exposition():
+    registry = Registry()
+    registry.counter("requests_total", "Requests", ["cache", "result"]).inc("bundle", "hit")
+    registry.gauge("temperature", "Temperature").set(21.5)
+    registry.counter("labels_total", "Escaping", ["value"]).inc('a "quoted" \\ value\nline')
+    latency = registry.histogram("latency_seconds", "Latency", ["stage"], buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(seconds, "cbr")
+
+    assert registry.render().splitlines() == [
+        "# HELP requests_total Requests",
+        "# TYPE requests_total counter",
+        'requests_total{cache="bundle",result="hit"} 1.0',
+        "# HELP temperature Temperature",
+        "# TYPE temperature gauge",
+        "temperature 21.5",
+        "# HELP labels_total Escaping",
+        "# TYPE labels_total counter",
+        'labels_total{value="a \\"quoted\\" \\\\ value\\nline"} 1.0',
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{stage="cbr",le="0.1"} 2',
+        'latency_seconds_bucket{stage="cbr",le="1.0"} 3',
+        'latency_seconds_bucket{stage="cbr",le="+Inf"} 4',
+        'latency_seconds_sum{stage="cbr"} 3.65',
+        'latency_seconds_count{stage="cbr"} 4',
+    ]
+
+
+def test_wrong_label_count_is_rejected():
+    counter = Registry().counter("votes_total", "Votes", ["direction"])
+    with pytest.raises(ValueError):
+        counter.inc()
+    with pytest.raises(ValueError):
+        counter.inc("up", "extra")
+
+
+def test_failing_gauge_callback_drops_only_its_samples():
+    registry = Registry()
+    registry.gauge("broken", "Broken", callback=lambda: 1 / 0)
+    registry.counter("fine_total", "Fine").inc()
+
+    text = registry.render()
+    assert "# TYPE broken gauge" in text and "\nbroken " not in text
+    assert "fine_total 1.0" in text
+
+
+def test_http_exporter_serves_the_process_registry():
+    REGISTRY.counter("expert_test_scrapes_total", "Test scrapes").inc()
+    server = start_http_server(0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(url + "/metrics", timeout=10) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            body = response.read().decode("utf-8")
+        assert "expert_test_scrapes_total 1.0" in body
+        assert "# HELP expert_diagnoses_total" in body
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(url + "/other", timeout=10)
+    finally:
+        server.shutdown()
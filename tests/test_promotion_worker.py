@@ -0,0 +1,129 @@
+import threading
+import time
+
+import pytest
+
+import promotion_worker
+from conftest import read_library, write_library
+from promotion_worker import PromotionWorker
+from write_behind import WriteBehindBuffer
+
+RBR_RESULT = {"fault": "Audio driver failure"}
+
+
+@pytest.fixture
+def scorer(monkeypatch):
+    """Replaces the NLP scorer: records every call, promotes when the score reaches 5."""
+    calls = []
+    gate = threading.Event()
+    gate.set()
+
+    def check_and_promote_hybrid(case_id, score, user_features, solution, rbr_result):
+        gate.wait(10)
+        calls.append((case_id, score))
+        if score == "boom":
+            raise RuntimeError("scorer failed")
+        return score >= 5, score * 20, {"community": score * 20}
+
+    monkeypatch.setattr(promotion_worker, "check_and_promote_hybrid", check_and_promote_hybrid)
+    monkeypatch.setattr(promotion_worker, "log_promotion", lambda *args: None)
+    return calls, gate
+
+
+def test_queued_jobs_are_coalesced_per_case(scorer):
+    calls, gate = scorer
+    worker = PromotionWorker(on_promote=lambda *args: None)
+    gate.clear()
+    worker.submit("CASE-00001", 1, set(), "Fix", RBR_RESULT)
+    # Wait until the first job is being scored, then queue three more for the same case
+    while worker.pending_count() != 1 or worker._jobs:
+        time.sleep(0.01)
+    for score in (2, 3, 4):
+        worker.submit("CASE-00001", score, set(), "Fix", RBR_RESULT)
+    gate.set()
+
+    assert worker.wait_idle(10)
+    worker.close()
+    assert calls == [("CASE-00001", 1), ("CASE-00001", 4)]
+    assert worker.stats["evaluated"] == 2
+
+
+def test_positive_decision_is_handed_to_on_promote(scorer):
+    promoted = []
+    worker = PromotionWorker(on_promote=lambda case_id, details: promoted.append((case_id, details)))
+    worker.submit("CASE-00001", 2, set(), "Fix", RBR_RESULT)
+    worker.submit("CASE-00002", 5, set(), "Fix", RBR_RESULT)
+
+    assert worker.wait_idle(10)
+    worker.close()
+    assert promoted == [("CASE-00002", {"total_points": 100, "breakdown": {"community": 100}, "case_id": "CASE-00002"})]
+    assert worker.stats == {"evaluated": 2, "promoted": 1, "errors": 0}
+
+
+def test_scoring_error_does_not_stop_the_worker(scorer):
+    calls, _ = scorer
+    worker = PromotionWorker(on_promote=lambda *args: None)
+    worker.submit("CASE-00001", "boom", set(), "Fix", RBR_RESULT)
+    worker.submit("CASE-00002", 1, set(), "Fix", RBR_RESULT)
+
+    assert worker.wait_idle(10)
+    worker.close()
+    assert worker.stats["errors"] == 1
+    assert ("CASE-00002", 1) in calls
+
+
+def test_close_drains_the_queue(scorer):
+    calls, gate = scorer
+    worker = PromotionWorker(on_promote=lambda *args: None)
+    gate.clear()
+    for i in range(5):
+        worker.submit(f"CASE-0000{i}", 1, set(), "Fix", RBR_RESULT)
+    gate.set()
+
+    worker.close()
+    assert not worker._worker.is_alive()
+    assert len(calls) == 5
+    assert worker.pending_count() == 0
+
+
+def test_promotion_is_written_by_the_next_flush(scorer, workdir):
+    write_library("case_library.txt", [
+        "CASE-00001 | PENDING | sound-output:none | Reinstall the audio driver | 4 | 2026-01-02",
+    ])
+    buffer = WriteBehindBuffer("case_library.txt", max_batch=10000, max_delay=3600)
+    try:
+        buffer.update_case_feedback("CASE-00001", 1, {"sound-output:none"}, RBR_RESULT)
+        buffer.flush()
+        # Scored after the flush, so the vote is already on disk and the case still PENDING
+        assert read_library("case_library.txt")[0].split(" | ")[1] == "PENDING"
+        assert buffer.promotion_worker.wait_idle(10)
+
+        buffer.flush()
+        assert read_library("case_library.txt")[0] == (
+            "CASE-00001 | VERIFIED | sound-output:none | Reinstall the audio driver | 5 | 2026-01-02")
+        assert buffer.pop_promotion("CASE-00001")["total_points"] == 100
+    finally:
+        buffer.close()
+
+
+def test_promotion_meeting_a_newer_vote_is_scored_again(scorer, workdir):
+    calls, _ = scorer
+    write_library("case_library.txt", [
+        "CASE-00001 | PENDING | sound-output:none | Reinstall the audio driver | 4 | 2026-01-02",
+    ])
+    buffer = WriteBehindBuffer("case_library.txt", max_batch=10000, max_delay=3600)
+    try:
+        buffer.update_case_feedback("CASE-00001", 1, {"sound-output:none"}, RBR_RESULT)
+        # The worker promoted on the +1 score (5) while a 👎 was already on its way
+        buffer._queue_promotion("CASE-00001", {"total_points": 100, "breakdown": {}, "case_id": "CASE-00001"})
+        buffer.update_case_feedback("CASE-00001", -1, {"sound-output:none"}, RBR_RESULT)
+        buffer.flush()
+        assert buffer.promotion_worker.wait_idle(10)
+        buffer.flush()
+
+        assert read_library("case_library.txt")[0] == (
+            "CASE-00001 | PENDING | sound-output:none | Reinstall the audio driver | 4 | 2026-01-02")
+        assert calls == [("CASE-00001", 4)]
+        assert buffer.pop_promotion("CASE-00001") is None
+    finally:
+        buffer.close()
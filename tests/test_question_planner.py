@@ -0,0 +1,144 @@
+import os
+import random
+
+import numpy as np
+import pytest
+
+import question_planner
+from conftest import REPO_ROOT
+from diagnosis_log import DiagnosisEventLog
+from expert_engine import get_user_features, load_case_index, score_case
+from question_planner import (
+    QuestionPlanner,
+    get_planner,
+    held_out_sheets,
+    load_rules,
+    logged_facts,
+    replay,
+)
+from questions import QUESTIONS, record_answer
+
+
+@pytest.fixture(scope="module")
+def rules():
+    return load_rules(os.path.join(REPO_ROOT, "rules.clp"))
+
+
+@pytest.fixture(scope="module")
+def cases():
+    return load_case_index(os.path.join(REPO_ROOT, "case_library.txt"))
+
+
+def new_case(case_id, features, solution, status="VERIFIED", feedback=0):
+    return {"id": case_id, "status": status, "features": set(features), "solution": solution, "feedback": feedback}
+
+
+def random_selections(rng, n):
+    keys = rng.sample(list(QUESTIONS), n)
+    return {key: rng.choice(list(QUESTIONS[key]["mapping"])) for key in keys}
+
+
+def test_best_case_matches_a_full_library_scan(rules, cases):
+    planner = QuestionPlanner(rules, cases)
+    rng = random.Random(0)
+    for _ in range(200):
+        selections = random_selections(rng, rng.randint(1, 6))
+        answers = {}
+        for key, label in selections.items():
+            record_answer(answers, QUESTIONS[key], label)
+        features = get_user_features(answers)
+        expected = (0.0, None)
+        for case in cases:
+            score, _ = score_case(features, case)
+            if score > expected[0]:
+                expected = (score, case["id"])
+        assert planner.best_case(selections) == expected
+
+
+def test_identical_cases_share_a_column_and_diagnoses_group_columns(rules):
+    fan = ["fan-status:fan-silent", "power-lights:light-on"]
+    planner = QuestionPlanner(rules, [
+        new_case("CASE-1", fan, "Replace the CPU fan"),
+        new_case("CASE-2", fan, "Replace the CPU fan"),
+        new_case("CASE-3", ["fan-status:fan-silent"], "Replace the CPU fan"),
+    ])
+    case_columns = [key for key in planner.column_index if key[0] == "case"]
+    assert len(case_columns) == 2
+    assert planner.groups.count("Replace the CPU fan") == 1
+    assert sum(planner.by_group(planner.prior)[0]) == pytest.approx(1.0)
+
+
+def test_update_appends_columns_and_leaves_the_old_planner_alone(rules, cases):
+    planner = QuestionPlanner(rules, cases)
+    planner.decide({})
+    columns = len(planner.columns)
+
+    grown = cases + [new_case("CASE-NEW", ["beep-code:continuous"], "Reseat the graphics card")]
+    updated = planner.updated(grown)
+    assert updated is not planner
+    assert len(updated.columns) == columns + 1 and len(planner.columns) == columns
+    assert all(table.shape[1] == columns + 1 for table in updated.likelihood.values())
+    assert all(table.shape[1] == columns for table in planner.likelihood.values())
+    assert updated.prior.sum() == pytest.approx(1.0)
+    assert planner._decide_cached.cache_info().currsize == 1
+
+    # A duplicate only moves prior weight
+    again = updated.updated(grown + [new_case("CASE-NEW2", ["beep-code:continuous"], "Reseat the graphics card")])
+    assert len(again.columns) == columns + 1
+    assert again.prior[-1] > updated.prior[-1]
+
+
+def test_unchanged_library_keeps_the_planner_and_its_decisions(rules, cases):
+    planner = QuestionPlanner(rules, cases)
+    planner.decide({})
+    assert planner.updated([dict(case) for case in cases]) is planner
+
+
+def test_large_growth_rebuilds(rules, cases):
+    planner = QuestionPlanner(rules, cases)
+    grown = cases + [new_case(f"CASE-G{i}", ["fan-status:fan-silent"], f"Fix {i}") for i in range(len(cases))]
+    assert planner.updated(grown).built_cases == len(grown)
+
+
+def test_get_planner_updates_instead_of_rebuilding(rules, cases, monkeypatch):
+    monkeypatch.setattr(question_planner, "_planner", None)
+    rules_path = os.path.join(REPO_ROOT, "rules.clp")
+    first = get_planner(rules_path, ("v", 1), cases, ("c", 1))
+
+    builds = []
+    real_init = QuestionPlanner.__init__
+    monkeypatch.setattr(QuestionPlanner, "__init__", lambda self, *args: builds.append(1) or real_init(self, *args))
+    grown = cases + [new_case("CASE-NEW", ["beep-code:continuous"], "Reseat the graphics card")]
+    second = get_planner(rules_path, ("v", 1), grown, ("c", 2))
+    assert builds == [] and second is not first
+    assert get_planner(rules_path, ("v", 1), grown, ("c", 2)) is second
+
+    get_planner(rules_path, ("v", 2), grown, ("c", 2))
+    assert builds == [1]
+
+
+def test_replay_of_held_out_cases(rules, cases):
+    training, held_out = held_out_sheets(cases, 0.25, seed=1)
+    assert len(training) + len(held_out) == len(cases) and len(held_out) == 5
+
+    result = replay(QuestionPlanner(rules, training), held_out)
+    assert len(result["asked"]) == 5
+    assert (result["asked"] <= len(QUESTIONS)).all()
+    assert 0.0 <= result["agreement"] <= 1.0
+
+
+def test_replay_of_logged_diagnoses(workdir, rules, cases):
+    log = DiagnosisEventLog(str(workdir / "diagnoses.jsonl"), max_delay=3600)
+    log.emit({"facts": [["fan-status", "fan-silent", 1.0], ["power-lights", "light-on", 1.0]]})
+    log.emit({"facts": [["cpu-temp", "temp-above-85", 0.6], ["temp-pattern", "temp-above-85", 0.6]]})
+    log.emit({"facts": []})
+    log.close()
+
+    facts = list(logged_facts(log.path))
+    assert len(facts) == 2
+    planner = QuestionPlanner(rules, cases)
+    sheet = question_planner.answer_sheet(planner, facts[1], np.random.default_rng(0))
+    assert sheet["temperature"] == "Hot to the touch"
+
+    result = replay(planner, facts)
+    assert len(result["asked"]) == 2
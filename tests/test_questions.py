@@ -0,0 +1,71 @@
+import pickle
+
+import pytest
+
+from questions import (
+    ANSWER_REGISTRY,
+    QUESTIONS,
+    answer_label,
+    answered_questions,
+    record_answer,
+    resolve_answer,
+)
+
+# Questions whose one answer is recorded under several symptoms
+SHARED = [
+    ("volume", ["volume-bar", "volume-behavior"]),
+    ("temperature", ["cpu-temp", "temp-pattern"]),
+    ("device-age", ["system-age", "device-age"]),
+]
+
+ALL_ANSWERS = [(key, label) for key, question in QUESTIONS.items() for label in question["mapping"]]
+
+
+@pytest.mark.parametrize("key, label", ALL_ANSWERS)
+def test_every_answer_round_trips_to_its_mapping(key, label):
+    question = QUESTIONS[key]
+    answers = {}
+    record_answer(answers, question, label)
+
+    assert set(answers) == set(question["symptoms"])
+    for symptom, code in answers.items():
+        assert type(code) is int
+        # The old session format stored (label, mapping) and read mapping[label]
+        assert resolve_answer(symptom, code) == question["mapping"][label]
+        assert answer_label(symptom, code) == label
+    assert answered_questions(answers) == {key: label}
+
+
+@pytest.mark.parametrize("key, symptoms", SHARED)
+def test_shared_symptoms_resolve_to_the_same_outcome(key, symptoms):
+    question = QUESTIONS[key]
+    assert all(ANSWER_REGISTRY[symptom] is ANSWER_REGISTRY[symptoms[0]] for symptom in symptoms)
+    for label, outcome in question["mapping"].items():
+        answers = {}
+        record_answer(answers, question, label)
+        assert [resolve_answer(symptom, answers[symptom]) for symptom in symptoms] == [outcome] * len(symptoms)
+
+
+def test_labels_with_the_same_value_keep_their_own_confidence():
+    answers = {}
+    record_answer(answers, QUESTIONS["temperature"], "Hot to the touch")
+    assert resolve_answer("temp-pattern", answers["temp-pattern"]) == ("temp-above-85", 0.6)
+    record_answer(answers, QUESTIONS["temperature"], "Above 85°C (Measured)")
+    assert resolve_answer("temp-pattern", answers["temp-pattern"]) == ("temp-above-85", 1.0)
+
+
+def test_full_sheet_is_plain_integers():
+    answers = {}
+    for key, question in QUESTIONS.items():
+        record_answer(answers, question, next(iter(question["mapping"])))
+    restored = pickle.loads(pickle.dumps(answers))
+    assert restored == answers and all(type(code) is int for code in restored.values())
+    assert answered_questions(restored) == {key: next(iter(q["mapping"])) for key, q in QUESTIONS.items()}
+
+
+def test_unknown_symptom_or_code_resolves_to_none():
+    assert resolve_answer("no-such-symptom", 0) is None
+    assert resolve_answer("cpu-temp", len(QUESTIONS["temperature"]["mapping"])) is None
+    assert resolve_answer("cpu-temp", -1) is None
+    with pytest.raises(KeyError):
+        record_answer({}, QUESTIONS["temperature"], "Lukewarm")
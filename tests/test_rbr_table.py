@@ -0,0 +1,83 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import knowledge_base
+import rbr_table
+from rbr_table import CHUNK_SIZE, RbrLookup, bounded_map, file_sha256, iter_chunks
+
+RULES = """
+(deftemplate symptom
+   (slot name) (slot value) (slot cf (type FLOAT) (default 1.0)))
+
+(deftemplate diagnosis
+   (slot fault) (slot solution) (slot category) (slot citation) (slot cf (type FLOAT) (default 0.0)))
+
+(defrule audio-hardware-speaker
+   (symptom (name sound-quality) (value sound-distorted) (cf ?c1))
+   =>
+   (bind ?final_cf (* ?c1 0.9))
+   (assert (diagnosis
+      (fault "Faulty Speaker (Hardware)")
+      (solution "Replace the laptop speaker unit.")
+      (category "Audio/Hardware")
+      (citation "Jern et al. (2021)")
+      (cf ?final_cf))))
+"""
+
+
+def write_rules(directory):
+    directory.mkdir()
+    path = directory / "rules.clp"
+    path.write_text(RULES, encoding="utf-8")
+    return str(path)
+
+
+def test_combinations_are_chunked_lazily():
+    classes = [{"representatives": [None, "a", "b"]}] * 3 + [{"representatives": [None] * 5}]
+    chunks = iter_chunks(classes)
+    first = next(chunks)
+    assert len(first) == CHUNK_SIZE and first[:2] == [(0, 0, 0, 0), (0, 0, 0, 1)]
+    assert sum(len(chunk) for chunk in chunks) == 3 ** 3 * 5 - CHUNK_SIZE
+
+
+def test_bounded_map_keeps_order_and_limits_submissions():
+    consumed = []
+
+    def items():
+        for i in range(20):
+            consumed.append(i)
+            yield i
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = bounded_map(pool, lambda x: x * x, items(), in_flight=3)
+        assert next(results) == 0
+        assert len(consumed) == 3
+        assert list(results) == [i * i for i in range(1, 20)]
+
+
+def test_build_writes_next_to_the_rules_file(workdir):
+    rules_path = write_rules(workdir / "kb")
+    assert rbr_table.main(["build", "--rules", rules_path, "--output",
+                           rbr_table.table_path_for(rules_path), "--workers", "1"]) == 0
+
+    assert sorted(os.listdir(workdir / "kb")) == ["rbr_table.json", "rules.clp"]
+    assert os.listdir(workdir) == ["kb"]
+    lookup = RbrLookup.load(str(workdir / "kb" / "rbr_table.json"), file_sha256(rules_path))
+    assert lookup is not None
+
+
+def test_knowledge_base_does_not_build_unless_enabled(workdir, monkeypatch):
+    rules_path = write_rules(workdir / "kb")
+    started = []
+    monkeypatch.setattr(knowledge_base, "start_build_process", lambda *args: started.append(args))
+    monkeypatch.delenv("EXPERT_RBR_TABLE_BUILD", raising=False)
+
+    kb = knowledge_base.KnowledgeBase(rules_path, str(workdir / "case_library.txt"), poll_interval=3600)
+    kb.close()
+    assert kb.rbr_table_path == str(workdir / "kb" / "rbr_table.json")
+    assert started == []
+
+    monkeypatch.setenv("EXPERT_RBR_TABLE_BUILD", "1")
+    kb = knowledge_base.KnowledgeBase(rules_path, str(workdir / "case_library.txt"), poll_interval=3600)
+    kb.close()
+    assert started == [(rules_path, str(workdir / "kb" / "rbr_table.json"))]
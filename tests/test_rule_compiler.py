@@ -0,0 +1,27 @@
+import os
+
+from conftest import REPO_ROOT
+from rule_compiler import check_equivalence, compile_rules, extract_table, load_table
+
+
+def repo_file(name):
+    return os.path.join(REPO_ROOT, name)
+
+
+def test_committed_files_match_a_fresh_compile():
+    with open(repo_file("rules.clp"), "r", encoding="utf-8") as f:
+        rows, meta = extract_table(f.read())
+    with open(repo_file("rules_meta.clp"), "rb") as f:
+        assert f.read() == meta.encode("utf-8")
+
+    with open(repo_file("rules_meta.clp"), "r", encoding="utf-8") as f:
+        compiled = compile_rules(load_table(repo_file("rules_table.csv")), f.read())
+    with open(repo_file("rules_compiled.clp"), "rb") as f:
+        assert f.read() == compiled.encode("utf-8")
+
+
+def test_compiled_rules_diagnose_like_the_reference():
+    checked, mismatches = check_equivalence(
+        repo_file("rules.clp"), repo_file("rules_compiled.clp"), repo_file("rules_table.csv"), samples=100)
+    assert checked > 100
+    assert mismatches == []
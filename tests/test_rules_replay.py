@@ -0,0 +1,64 @@
+import json
+import os
+import pickle
+import shutil
+
+import clips
+import pytest
+
+import rules_replay
+from conftest import REPO_ROOT
+from diagnosis_log import asserted_facts
+from engine_diff import answer_sheets
+from expert_engine import get_user_features, run_rbr_analysis, symptom_features
+from rules_replay import RuleLoadError, main, run_replay
+
+BROKEN = "(defrule broken\n   (symptom (name x)\n=>\n"
+
+
+@pytest.fixture
+def rule_files(workdir):
+    shutil.copy(os.path.join(REPO_ROOT, "rules.clp"), workdir)
+    shutil.copy(os.path.join(REPO_ROOT, "case_library.txt"), workdir)
+    (workdir / "broken.clp").write_text(BROKEN, encoding="utf-8")
+    return workdir
+
+
+def test_broken_candidate_is_reported_before_any_worker_starts(rule_files, monkeypatch, capsys):
+    def no_pool(*args, **kwargs):
+        raise AssertionError("worker pool started")
+
+    monkeypatch.setattr(rules_replay, "ProcessPoolExecutor", no_pool)
+    assert main(["broken.clp", "--source", "generated", "--samples", "10"]) == 1
+    out = capsys.readouterr().out
+    assert "broken.clp does not load" in out and "Syntax Error" in out
+
+    assert main(["missing.clp", "--source", "generated"]) == 1
+    assert "missing.clp: no such rule file" in capsys.readouterr().out
+
+
+def test_worker_load_error_pickles(rule_files):
+    with pytest.raises(RuleLoadError) as error:
+        rules_replay._worker_env(str(rule_files / "broken.clp"))
+    assert isinstance(pickle.loads(pickle.dumps(error.value)), RuleLoadError)
+
+
+def test_identical_versions_replay_without_changes(rule_files):
+    report = run_replay("rules.clp", "rules.clp", source="generated", samples=20, workers=1)
+    assert report["counts"]["generated"] > 0
+    assert report["changes"] == []
+    assert report["cost"]["rules.clp"]["sets"] == report["counts"]["generated"]
+
+
+def test_replayed_log_facts_reproduce_the_live_diagnosis(rule_files):
+    env = clips.Environment()
+    env.load("rules.clp")
+    sheets = answer_sheets(100)
+    # What the log records, as it comes back from the JSON line
+    symptom_sets = [json.loads(json.dumps(asserted_facts(answers))) for answers in sheets]
+    replayed = rules_replay._replay_chunk("rules.clp", symptom_sets)
+
+    for answers, symptoms, (diagnoses, _, _) in zip(sheets, symptom_sets, replayed):
+        live, _ = run_rbr_analysis(env, answers)
+        assert diagnoses == [{k: (float(v) if k == "cf" else str(v)) for k, v in d.items()} for d in live]
+        assert symptom_features(symptoms) == get_user_features(answers)
@@ -0,0 +1,78 @@
+import json
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+import shared_vectors
+from conftest import REPO_ROOT
+from shared_vectors import SharedVectors, attach, tokenize, write_vectors
+
+WORDS = ["replace", "the", "cpu", "fan", "reinstall", "audio", "driver", "power", "supply"]
+
+# Attaches in a fresh interpreter, as a Streamlit or worker process would
+ATTACH = """
+import json, sys
+import numpy as np
+from shared_vectors import attach
+vectors = attach(sys.argv[1])
+rows = vectors.token_rows(sys.argv[2:])
+print(json.dumps({
+    "mapped": isinstance(vectors.vectors, np.memmap),
+    "rows": rows.tolist(),
+    "vectors": np.asarray(vectors.vectors[rows[rows >= 0]]).tolist(),
+    "similarity": vectors.similarity("replace the cpu fan", "replace the power supply"),
+}))
+"""
+
+
+@pytest.fixture
+def table(tmp_path):
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(len(WORDS) + 2, 8)).astype(np.float32)
+    # Rows out of order, and two rows no word points at
+    entries = [(word, row + 2) for row, word in enumerate(reversed(WORDS))]
+    info = write_vectors(entries, data, tmp_path / "vectors")
+    return tmp_path / "vectors", data, dict(entries), info
+
+
+def test_export_is_attached_by_another_process(table):
+    directory, data, rows, info = table
+    assert info == {"rows": len(WORDS) + 2, "dim": 8, "keys": len(WORDS), "bytes": info["bytes"]}
+
+    tokens = WORDS + ["unknown-word"]
+    result = subprocess.run([sys.executable, "-c", ATTACH, str(directory), *tokens], cwd=REPO_ROOT,
+                            capture_output=True, text=True, timeout=120, check=True)
+    attached = json.loads(result.stdout.splitlines()[-1])
+
+    assert attached["mapped"]
+    assert attached["rows"] == [rows[word] for word in WORDS] + [-1]
+    np.testing.assert_array_equal(np.array(attached["vectors"], dtype=np.float32), data[[rows[w] for w in WORDS]])
+    local = SharedVectors(directory).similarity("replace the cpu fan", "replace the power supply")
+    assert attached["similarity"] == pytest.approx(local)
+
+
+def test_doc_vector_is_the_mean_with_oov_as_zero(table):
+    directory, data, rows, _ = table
+    vectors = SharedVectors(directory)
+    expected = (data[rows["cpu"]] + data[rows["fan"]]) / 3
+    np.testing.assert_allclose(vectors.doc_vector("cpu fan!"), expected, rtol=1e-6)
+    assert tokenize("cpu fan!") == ["cpu", "fan", "!"]
+    assert vectors.similarity("", "cpu fan") == 0.0
+    assert vectors.similarity("xyz", "abc") == 0.0
+
+
+def test_colliding_strings_keep_the_first_entry(tmp_path, monkeypatch):
+    # Hash by length: "fan" / "cpu" and "audio" / "power" collide
+    monkeypatch.setattr(shared_vectors, "key_hash", lambda text: len(text))
+    data = np.eye(4, dtype=np.float32)
+    info = write_vectors([("fan", 0), ("audio", 1), ("cpu", 2), ("power", 3)], data, tmp_path)
+    assert info["keys"] == 2
+
+    vectors = SharedVectors(tmp_path)
+    assert vectors.token_rows(["fan", "cpu", "audio", "power", "ab"]).tolist() == [0, 0, 1, 1, -1]
+
+
+def test_attach_without_an_export(tmp_path):
+    assert attach(str(tmp_path)) is None
@@ -0,0 +1,121 @@
+import os
+import shutil
+
+import pytest
+
+import expert_engine
+import similarity_backends
+from conftest import REPO_ROOT
+from knowledge_base import KnowledgeBase
+from similarity_backends import SPACY_TIERS, HashingBackend, load_backend, parse_tiers
+
+
+class FakeBackend:
+    tiers = SPACY_TIERS
+
+    def __init__(self, name):
+        self.name = name
+
+
+@pytest.fixture
+def loaders(monkeypatch):
+    """Replaces the backend loaders; `available` says which ones find their vectors."""
+    calls, available = [], {"shared", "spacy", "hashing"}
+
+    def loader(name):
+        def load():
+            calls.append(name)
+            return FakeBackend(name) if name in available else None
+        return load
+
+    for name in ("shared", "spacy", "hashing"):
+        monkeypatch.setitem(similarity_backends.BACKENDS, name, loader(name))
+    monkeypatch.delenv("EXPERT_SIMILARITY_BACKEND", raising=False)
+    monkeypatch.delenv("EXPERT_SIMILARITY_TIERS", raising=False)
+    return calls, available
+
+
+def test_auto_prefers_the_shared_vectors(loaders):
+    calls, _ = loaders
+    assert load_backend().name == "shared"
+    assert calls == ["shared"]  # spaCy is never loaded when the export is there
+
+
+def test_auto_falls_back_to_spacy_then_to_none(loaders):
+    calls, available = loaders
+    available.discard("shared")
+    assert load_backend("auto").name == "spacy"
+    assert calls == ["shared", "spacy"]
+
+    available.discard("spacy")
+    assert load_backend() is None  # auto never picks the hashing backend
+
+
+def test_backend_is_chosen_by_environment(loaders, monkeypatch):
+    monkeypatch.setenv("EXPERT_SIMILARITY_BACKEND", "Hashing")
+    assert load_backend().name == "hashing"
+    assert load_backend("none") is None
+    assert load_backend("word2vec") is None
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, None),
+    ("", None),
+    ("0.4,0.2,0.1", ((0.4, 50), (0.2, 30), (0.1, 15))),
+    (" 0.5 , 0.3,0.15", ((0.5, 50), (0.3, 30), (0.15, 15))),
+    ("0.4,0.2", None),
+    ("0.4,0.2,0.1,0.05", None),
+    ("0.1,0.2,0.4", None),
+    ("high,medium,low", None),
+])
+def test_tier_parsing(value, expected):
+    assert parse_tiers(value) == expected
+
+
+def test_tiers_from_the_environment_replace_the_backend_defaults(loaders, monkeypatch):
+    monkeypatch.setenv("EXPERT_SIMILARITY_TIERS", "0.6,0.4,0.2")
+    assert load_backend("spacy").tiers == ((0.6, 50), (0.4, 30), (0.2, 15))
+    monkeypatch.setenv("EXPERT_SIMILARITY_TIERS", "0.6;0.4;0.2")
+    assert load_backend("spacy").tiers == SPACY_TIERS
+
+
+CORPUS = ["Replace the CPU fan", "Reinstall the audio driver", "Reseat the memory modules"]
+
+
+def test_hashing_backend_follows_the_library(workdir):
+    backend = HashingBackend(lambda: list(CORPUS), ["Replace the power supply"])
+    assert backend.documents is None  # Fitted on first use
+    before = backend.similarity("replace the cpu fan", "replace the power supply")
+    assert backend.documents == 4
+
+    # "replace" becomes common: it weighs less, so the two texts look less alike
+    appended = [f"Replace part {i}" for i in range(20)]
+    backend.update_corpus(appended, appended=True)
+    assert backend.documents == 24
+    assert backend.similarity("replace the cpu fan", "replace the power supply") < before
+
+    backend.update_corpus(CORPUS)  # Rewrite: refit from scratch
+    assert backend.documents == 4
+    assert backend.similarity("replace the cpu fan", "replace the power supply") == pytest.approx(before)
+
+
+def test_knowledge_base_reload_updates_the_hashing_idf(workdir, monkeypatch):
+    shutil.copy(os.path.join(REPO_ROOT, "rules.clp"), workdir)
+    with open("case_library.txt", "w", encoding="utf-8") as f:
+        f.writelines(f"CASE-0000{i} | VERIFIED | cpu-temp:high | {text} | 0\n" for i, text in enumerate(CORPUS))
+    backend = HashingBackend(similarity_backends.library_solutions).fit()
+    monkeypatch.setattr(expert_engine, "similarity_backend", backend)
+    kb = KnowledgeBase(poll_interval=3600, rbr_table_path=None)
+    try:
+        with open("case_library.txt", "a", encoding="utf-8") as f:
+            f.write("CASE-00009 | PENDING | fan-status:fan-silent | Clean the CPU fan | 0\n")
+        assert kb.reload()
+        assert backend.documents == 4
+
+        with open("case_library.txt", "w", encoding="utf-8") as f:
+            f.write("CASE-00001 | VERIFIED | cpu-temp:high | Replace the CPU fan | 0\n")
+        os.utime("case_library.txt", ns=(0, os.stat("case_library.txt").st_mtime_ns + 10**9))
+        assert kb.reload()
+        assert backend.documents == 1
+    finally:
+        kb.close()
@@ -0,0 +1,118 @@
+import os
+import shutil
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import diagnosis_log
+import expert_engine
+import knowledge_base
+from conftest import REPO_ROOT
+from metrics import CACHE_REQUESTS, DIAGNOSES, PARTIAL_RESULTS
+
+APP = os.path.join(REPO_ROOT, "streamlit_app.py")
+
+
+@pytest.fixture
+def app_env(workdir, monkeypatch):
+    for name in ("rules.clp", "case_library.txt"):
+        shutil.copy(os.path.join(REPO_ROOT, name), workdir)
+    # Fresh process-wide singletons bound to the scratch directory
+    kb = knowledge_base.KnowledgeBase(rbr_table_path=None)
+    log = diagnosis_log.DiagnosisEventLog(str(workdir / "diagnoses.jsonl"), max_delay=3600)
+    monkeypatch.setattr(knowledge_base, "_knowledge_base", kb)
+    monkeypatch.setattr(diagnosis_log, "_log", log)
+    yield kb, log
+    kb.close()
+    log.close()
+
+
+def run_wizard(at):
+    for _ in range(5):
+        at.button[-1].click().run()  # Next
+    at.button[0].click().run()       # Run Diagnosis
+    return at
+
+
+def logged_events(log):
+    log.flush()
+    return list(diagnosis_log.iter_events(log.path))
+
+
+def test_diagnosis_is_logged_once_per_submission(app_env):
+    kb, log = app_env
+    diagnoses_before = DIAGNOSES.value()
+
+    at = run_wizard(AppTest.from_file(APP, default_timeout=60).run())
+    assert not at.exception
+    assert len(logged_events(log)) == 1
+
+    # A library write (another session's case) reloads the knowledge and recomputes CBR on the next rerun
+    with open("case_library.txt", "a", encoding="utf-8") as f:
+        f.write("CASE-99999 | PENDING | sound-output:none | Check the speaker cable | 0 | 2026-01-01\n")
+    assert kb.reload()
+    at.run()
+    at.run()
+    assert not at.exception
+    assert len(logged_events(log)) == 1
+    assert DIAGNOSES.value() - diagnoses_before == 1
+
+    # Start Over + a new submission is a new diagnosis
+    at.button[-1].click().run()
+    run_wizard(at)
+    assert len(logged_events(log)) == 2
+    assert DIAGNOSES.value() - diagnoses_before == 2
+
+
+def test_partial_results_are_recomputed_on_the_next_rerun(app_env, monkeypatch):
+    # Every CBR scan runs out of budget before it finds a match
+    monkeypatch.setenv("EXPERT_DIAGNOSIS_BUDGET_MS", "1000")
+    monkeypatch.setattr(expert_engine, "run_cbr_analysis_anytime", lambda *args: (None, 0.0, False, 0))
+    at = run_wizard(AppTest.from_file(APP, default_timeout=60).run())
+    assert not at.exception
+    partial_before, hits_before = PARTIAL_RESULTS.value("cbr"), CACHE_REQUESTS.value("cbr", "hit")
+
+    at.run()
+    at.run()
+    assert PARTIAL_RESULTS.value("cbr") - partial_before == 2
+    assert CACHE_REQUESTS.value("cbr", "hit") == hits_before
+
+
+@pytest.mark.parametrize("budget", ["250ms", "-50", "nan"])
+def test_unusable_budget_runs_without_a_budget(app_env, monkeypatch, budget):
+    monkeypatch.setenv("EXPERT_DIAGNOSIS_BUDGET_MS", budget)
+    monkeypatch.setattr(expert_engine, "run_cbr_analysis_anytime", lambda *args: (None, 0.0, False, 0))
+    partial_before = PARTIAL_RESULTS.value("cbr")
+
+    at = run_wizard(AppTest.from_file(APP, default_timeout=60).run())
+    assert not at.exception
+    assert PARTIAL_RESULTS.value("cbr") == partial_before  # The anytime engines never ran
+
+
+def test_complete_results_are_served_from_the_session_cache(app_env):
+    at = run_wizard(AppTest.from_file(APP, default_timeout=60).run())
+    hits_before = CACHE_REQUESTS.value("cbr", "hit")
+
+    at.run()
+    at.run()
+    assert CACHE_REQUESTS.value("cbr", "hit") - hits_before == 2
+
+
+def test_moderation_queue_is_read_once_per_library_version(app_env, monkeypatch):
+    import case_moderation
+    kb, _ = app_env
+    reads = []
+    real_read_library = case_moderation.read_library
+    monkeypatch.setattr(case_moderation, "read_library", lambda *args: reads.append(1) or real_read_library(*args))
+
+    at = run_wizard(AppTest.from_file(APP, default_timeout=60).run())
+    at.text_input(key="expert_pw").set_value("expert123").run()
+    at.run()
+    assert len(reads) == 1
+
+    with open("case_library.txt", "a", encoding="utf-8") as f:
+        f.write("CASE-99999 | PENDING | sound-output:none | Check the speaker cable | 0 | 2026-01-01\n")
+    assert kb.reload()
+    at.run()
+    assert len(reads) == 2
+    assert any(b.label.startswith("Apply to") for b in at.button)
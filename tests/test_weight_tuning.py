@@ -0,0 +1,74 @@
+import random
+
+import numpy as np
+import pytest
+
+import weight_tuning
+from expert_engine import FEATURE_WEIGHTS
+from weight_tuning import build_matrices, evaluate, load_cases, naive_loo_top1
+
+FEATURE_VALUES = {
+    "error-message": ["bsod", "disk-read", "none"],
+    "beep-code": ["long-repeating", "continuous"],
+    "cpu-temp": ["high", "normal"],
+    "fan-status": ["fan-silent", "fan-loud"],
+    "hdd-status": ["clicking", "normal"],
+    "device-age": ["old", "new"],
+    "custom-note": ["a", "b"],  # Not in FEATURE_WEIGHTS: weight 1.0
+}
+LABELS = ["memory", "storage", "thermal", "power"]
+
+
+def synthetic_cases(n, seed=0):
+    """Small random cases; few features, so ties and zero-score queries happen."""
+    rng = random.Random(seed)
+    keys = sorted(FEATURE_VALUES)
+    return [{
+        "id": f"CASE-{i:05d}",
+        "features": {f"{key}:{rng.choice(FEATURE_VALUES[key])}" for key in rng.sample(keys, rng.randint(1, 4))},
+        "feedback": rng.randint(-1, 6),
+        "label": rng.choice(LABELS),
+    } for i in range(n)]
+
+
+def vectorized_top1(cases, type_weights):
+    X, feature_types, types, bonus = build_matrices(cases, FEATURE_WEIGHTS)
+    labels = np.array([c["label"] for c in cases])
+    weights = np.array([[table.get(t, 1.0) for t in types] for table in type_weights])
+    top1, _ = evaluate(X, feature_types, bonus, labels, weights, k=3)
+    return top1
+
+
+def random_tables(n, seed=1):
+    rng = random.Random(seed)
+    return [{t: rng.uniform(0.1, 5.0) for t in FEATURE_VALUES} for _ in range(n)]
+
+
+def test_vectorized_loo_matches_the_naive_loop():
+    cases = synthetic_cases(120)
+    tables = [FEATURE_WEIGHTS] + random_tables(5)
+    expected = [naive_loo_top1(cases, table) for table in tables]
+    assert vectorized_top1(cases, tables) == pytest.approx(expected)
+
+
+# 90 cases, 4 weight tables: 2 tables x 1 query row per block; 4 tables x 7 rows (ragged last block)
+@pytest.mark.parametrize("budget", [2 * 90, 28 * 90])
+def test_row_blocks_give_the_same_accuracy(monkeypatch, budget):
+    cases = synthetic_cases(90, seed=2)
+    tables = [FEATURE_WEIGHTS] + random_tables(3, seed=3)
+    whole = vectorized_top1(cases, tables)
+
+    monkeypatch.setattr(weight_tuning, "SCORE_BUDGET", budget)
+    assert vectorized_top1(cases, tables) == pytest.approx(whole)
+    assert vectorized_top1(cases, tables) == pytest.approx([naive_loo_top1(cases, table) for table in tables])
+
+
+def test_loads_only_verified_live_cases(workdir):
+    with open("case_library.txt", "w", encoding="utf-8") as f:
+        f.write("CASE-00001 | VERIFIED | cpu-temp:high | Replace the CPU fan. Then test | 2\n")
+        f.write("CASE-00002 | PENDING | cpu-temp:high | Replace the CPU fan | 0\n")
+        f.write("CASE-00003 | VERIFIED | hdd-status:clicking | Replace the HDD | -9\n")
+        f.write("not a case line\n")
+        f.write("CASE-00004 | VERIFIED | hdd-status:clicking | Replace the HDD | 0\n")
+    cases = load_cases(labels={"CASE-00004": "custom"})
+    assert [(c["id"], c["label"]) for c in cases] == [("CASE-00001", "thermal"), ("CASE-00004", "custom")]
@@ -0,0 +1,105 @@
+import pytest
+
+from conftest import read_library, write_library
+from write_behind import WriteBehindBuffer
+
+LINES = [
+    "CASE-00001 | VERIFIED | cpu-temp:high | Replace the CPU fan | 3 | 2026-01-01",
+    "CASE-00002 | PENDING | sound-output:none | Reinstall the audio driver | 0 | 2026-01-02",
+]
+
+
+@pytest.fixture
+def buffer(workdir):
+    write_library("case_library.txt", LINES)
+    # Thresholds out of reach: only explicit flush() calls write
+    buf = WriteBehindBuffer("case_library.txt", max_batch=10000, max_delay=3600)
+    yield buf
+    buf.close()
+
+
+def test_votes_are_coalesced_into_one_rewrite(buffer):
+    for vote in (1, 1, -1):
+        buffer.update_case_feedback("CASE-00001", vote)
+
+    assert buffer.flush() == 1
+    assert read_library("case_library.txt")[0] == "CASE-00001 | VERIFIED | cpu-temp:high | Replace the CPU fan | 4 | 2026-01-01"
+
+
+def test_failed_flush_requeues_the_batch(buffer, monkeypatch):
+    buffer.update_case_feedback("CASE-00001", 1)
+    buffer.save_new_case({"fan-status:fan-silent"}, "Clean the dust out of the CPU fan")
+
+    def fail(*args):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as m:
+        m.setattr(buffer, "_write_batch", fail)
+        assert buffer.flush() == 0
+    assert buffer.stats["errors"] == 1
+    assert buffer.pending_count() == 2
+    assert read_library("case_library.txt") == LINES
+
+    # A vote queued after the failure merges with the re-queued one
+    buffer.update_case_feedback("CASE-00001", 1)
+    assert buffer.flush() == 2
+    lines = read_library("case_library.txt")
+    assert lines[0].split(" | ")[4] == "5"
+    assert len(lines) == 3 and "Clean the dust out of the CPU fan" in lines[2]
+    assert buffer.pending_count() == 0
+
+
+def test_malformed_line_does_not_block_other_votes(buffer):
+    write_library("case_library.txt", LINES + ["CASE-00003 | PENDING | beep-code:none | Reseat RAM | abc"])
+
+    buffer.update_case_feedback("CASE-00003", 1)
+    buffer.update_case_feedback("CASE-00001", 1)
+    assert buffer.flush() == 2
+
+    lines = read_library("case_library.txt")
+    assert lines[0].split(" | ")[4] == "4"
+    assert lines[2] == "CASE-00003 | PENDING | beep-code:none | Reseat RAM | abc"
+    assert buffer.pending_count() == 0
+    assert buffer.stats["errors"] == 0
+
+
+def test_vote_matches_the_exact_case_id(buffer):
+    write_library("case_library.txt", ["CASE-10001 | VERIFIED | cpu-temp:high | Replace the CPU fan | 3",
+                                       "CASE-1000 | PENDING | see CASE-10001 | Reseat the heatsink | 0"])
+
+    buffer.update_case_feedback("CASE-1000", 1)
+    assert buffer.flush() == 1
+
+    assert read_library("case_library.txt") == [
+        "CASE-10001 | VERIFIED | cpu-temp:high | Replace the CPU fan | 3",
+        "CASE-1000 | PENDING | see CASE-10001 | Reseat the heatsink | 1",
+    ]
+
+
+def test_flush_keeps_untouched_bytes_and_line_endings(buffer):
+    with open("case_library.txt", "wb") as f:
+        f.write(b"CASE-00001 | VERIFIED | cpu-temp:high | Replace the CPU fan | 3\r\n"
+                b"CASE-00002 | PENDING  |  sound-output:none | Reinstall the audio driver | 0")
+
+    buffer.update_case_feedback("CASE-00001", -1)
+    assert buffer.flush() == 1
+
+    with open("case_library.txt", "rb") as f:
+        assert f.read() == (b"CASE-00001 | VERIFIED | cpu-temp:high | Replace the CPU fan | 2\r\n"
+                            b"CASE-00002 | PENDING  |  sound-output:none | Reinstall the audio driver | 0")
+
+
+def test_vote_on_a_just_submitted_case(buffer):
+    buffer.save_new_case({"fan-status:fan-silent"}, "Clean the dust out of the CPU fan")
+    buffer.update_case_feedback("CASE-00002", 1)
+    buffer.flush()
+    new_id = read_library("case_library.txt")[2].split(" | ")[0]
+
+    buffer.save_new_case({"beep-code:long-repeating"}, "Reseat the memory modules")
+    buffer.update_case_feedback(new_id, 1)
+    buffer.update_case_feedback("CASE-00001", 1)
+    assert buffer.flush() == 3
+
+    lines = read_library("case_library.txt")
+    assert [line.split(" | ")[4] for line in lines[:3]] == ["4", "1", "1"]
+    assert len(lines) == 4 and "Reseat the memory modules" in lines[3]
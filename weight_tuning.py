@@ -0,0 +1,296 @@
+"""
+[FEATURE_WEIGHTS EVALUATION & TUNING]
+Leave-one-out retrieval evaluation of the weighted-Jaccard CBR over the
+VERIFIED cases, vectorized with NumPy.
+
+All pairwise scores for a weight vector come from two matrix products over a
+binary case x feature matrix, and many candidate weight vectors are scored in
+one batch, so evaluating a weight table costs microseconds instead of one
+full library scan per case. Scores are computed in blocks of query cases
+(weight tables x query rows x cases <= SCORE_BUDGET), so memory stays bounded
+as the library grows instead of growing with cases squared.
+
+Ground truth: a retrieval is correct when the nearest other case has the same
+fault label. Labels come from --labels (CSV: case_id,label) or are derived
+from the first sentence of each solution with the keyword taxonomy below.
+
+Usage:
+    python weight_tuning.py                       # evaluate current weights
+    python weight_tuning.py --search 2000 -k 3    # propose a tuned weight table
+"""
+import argparse
+import csv
+import json
+import time
+
+import numpy as np
+
+from case_archive import DEAD_FEEDBACK_THRESHOLD
+from expert_engine import FEATURE_WEIGHTS, try_parse_case_record
+
+LIBRARY_PATH = "case_library.txt"
+
+# First match wins, checked against the first sentence of the solution
+LABEL_KEYWORDS = [
+    ("normal", ["no issue", "system normal"]),
+    ("memory", ["ram"]),
+    ("storage", ["hdd", "ssd", "disk", "sata", "ide", "smart"]),
+    ("thermal", ["thermal", "heatsink", "overheat", "fan", "cooler", "temp"]),
+    ("power", ["power supply", "psu"]),
+    ("audio", ["audio", "sound", "speaker"]),
+    ("display", ["gpu", "video", "hdmi", "graphics", "display"]),
+]
+
+WEIGHT_MIN, WEIGHT_MAX = 0.1, 5.0
+SCORE_BUDGET = 5e7  # Pairwise scores per block (~400 MB of float64)
+
+
+# ======================================
+# 1. DATA
+# ======================================
+
+def derive_label(solution):
+    first_sentence = solution.split(". ")[0].lower()
+    for label, keywords in LABEL_KEYWORDS:
+        if any(keyword in first_sentence for keyword in keywords):
+            return label
+    return "other"
+
+
+def load_cases(path=LIBRARY_PATH, labels=None):
+    """
+    Loads VERIFIED cases that run_cbr_analysis would consider.
+
+    Returns:
+        list: [{"id", "features": set, "feedback", "label"}, ...]
+    """
+    cases = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            case = try_parse_case_record(line)
+            if not case or case["status"] != "VERIFIED" or case["feedback"] < DEAD_FEEDBACK_THRESHOLD:
+                continue
+            cases.append({
+                "id": case["id"],
+                "features": case["features"],
+                "feedback": case["feedback"],
+                "label": (labels or {}).get(case["id"]) or derive_label(case["solution"]),
+            })
+    return cases
+
+
+def build_matrices(cases, weights):
+    """
+    Returns:
+        tuple: (X: n x F binary matrix, feature_type_index: F ints, types: list, bonus: n floats)
+    """
+    features = sorted({f for c in cases for f in c["features"]})
+    types = sorted({f.split(":")[0] if ":" in f else f for f in features} | set(weights))
+    type_index = {t: i for i, t in enumerate(types)}
+    column = {f: i for i, f in enumerate(features)}
+
+    X = np.zeros((len(cases), len(features)), dtype=np.float64)
+    for row, case in enumerate(cases):
+        X[row, [column[f] for f in case["features"]]] = 1.0
+
+    feature_types = np.array([type_index[f.split(":")[0] if ":" in f else f] for f in features], dtype=np.intp)
+    # Same positive-feedback bonus run_cbr_analysis applies to the candidate case
+    bonus = np.array([1 + c["feedback"] * 0.05 if c["feedback"] > 0 else 1.0 for c in cases])
+    return X, feature_types, types, bonus
+
+
+# ======================================
+# 2. VECTORIZED LEAVE-ONE-OUT
+# ======================================
+
+def pairwise_scores(X, feature_types, bonus, type_weights, rows=None):
+    """
+    Weighted Jaccard for every query/candidate pair, for a batch of weight vectors.
+
+    Args:
+        type_weights: m x T array (one row per candidate weight table)
+        rows: slice of query cases to score (default: all n)
+
+    Returns:
+        np.ndarray: m x r x n scores (x100, feedback bonus applied, self-matches = -inf)
+    """
+    rows = rows or slice(0, X.shape[0])
+    Q = X[rows]                                              # r x F
+    WF = type_weights[:, feature_types]                      # m x F
+    inter = np.einsum("if,mf,jf->mij", Q, WF, X, optimize=True)
+    totals = X @ WF.T                                        # n x m
+    union = totals.T[:, rows, None] + totals.T[:, None, :] - inter
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scores = np.where(union > 0, inter / union, 0.0) * 100 * bonus[None, None, :]
+    queries = np.arange(Q.shape[0])
+    scores[:, queries, rows.start + queries] = -np.inf
+    return scores
+
+
+def retrieval_hits(scores, labels, k, rows=None):
+    """
+    Args:
+        scores: m x r x n, from pairwise_scores over the same rows
+
+    Returns:
+        tuple: (top1 hits: m ints, topk hits: m ints) over the r query cases
+    """
+    # Stable sort keeps file order on ties, like the strict '>' in run_cbr_analysis
+    order = np.argsort(-scores, axis=2, kind="stable")[:, :, :k]
+    # A zero score is "no match" in run_cbr_analysis, never a hit
+    matched = np.take_along_axis(scores, order, axis=2) > 0
+    hits = (labels[order] == labels[rows or slice(None)][None, :, None]) & matched
+    return hits[:, :, 0].sum(axis=1), hits.any(axis=2).sum(axis=1)
+
+
+def evaluate(X, feature_types, bonus, labels, type_weights, k, batch=256):
+    """
+    Top-1 / top-k accuracy for many weight vectors. Weight tables are scored in
+    batches and query cases in row blocks, so no block holds more than SCORE_BUDGET scores.
+    """
+    n = X.shape[0]
+    budget = max(1, int(SCORE_BUDGET // n))  # Weight tables x query rows per block
+    batch = max(1, min(batch, budget))
+    top1, topk = [], []
+    for start in range(0, len(type_weights), batch):
+        weights = type_weights[start:start + batch]
+        step = max(1, budget // len(weights))
+        h1, hk = 0, 0
+        for row in range(0, n, step):
+            rows = slice(row, min(row + step, n))
+            b1, bk = retrieval_hits(pairwise_scores(X, feature_types, bonus, weights, rows), labels, k, rows)
+            h1, hk = h1 + b1, hk + bk
+        top1.append(h1 / n)
+        topk.append(hk / n)
+    return np.concatenate(top1), np.concatenate(topk)
+
+
+def naive_loo_top1(cases, weights):
+    """Reference: the run_cbr_analysis scoring loop, one pass per query case."""
+    hits = 0
+    for i, query in enumerate(cases):
+        best, best_score = None, 0.0
+        for j, case in enumerate(cases):
+            if i == j:
+                continue
+            inter = union = 0.0
+            for feature in query["features"] | case["features"]:
+                weight = weights.get(feature.split(":")[0] if ":" in feature else feature, 1.0)
+                union += weight
+                if feature in query["features"] and feature in case["features"]:
+                    inter += weight
+            score = (inter / union * 100) if union else 0
+            if case["feedback"] > 0:
+                score *= (1 + case["feedback"] * 0.05)
+            if score > best_score:
+                best, best_score = case, score
+        hits += bool(best) and best["label"] == query["label"]
+    return hits / len(cases)
+
+
+# ======================================
+# 3. WEIGHT SEARCH
+# ======================================
+
+def search_weights(X, feature_types, bonus, labels, base, k, iterations, seed=0, batch=256):
+    """
+    Random local search around the best table found so far.
+    Objective: top-1 accuracy, then top-k accuracy, then closeness to the current table.
+
+    Returns:
+        tuple: (best weights: T floats, top1, topk, candidates evaluated)
+    """
+    rng = np.random.default_rng(seed)
+    best = base.copy()
+    b1, bk = (v[0] for v in evaluate(X, feature_types, bonus, labels, best[None, :], k))
+    evaluated = 1
+
+    while evaluated < iterations:
+        m = min(batch, iterations - evaluated)
+        scale = rng.choice([0.1, 0.3, 0.6], size=(m, 1))
+        mask = rng.random((m, len(base))) < 0.3
+        candidates = np.clip(best[None, :] * np.exp(rng.normal(0, 1, (m, len(base))) * scale * mask),
+                             WEIGHT_MIN, WEIGHT_MAX)
+        a1, ak = evaluate(X, feature_types, bonus, labels, candidates, k, batch)
+        evaluated += m
+
+        distance = np.abs(np.log(candidates / base[None, :])).sum(axis=1)
+        objective = a1 * 1e6 + ak * 1e3 - distance * 1e-3
+        i = int(np.argmax(objective))
+        current = b1 * 1e6 + bk * 1e3 - np.abs(np.log(best / base)).sum() * 1e-3
+        if objective[i] > current:
+            best, b1, bk = candidates[i], a1[i], ak[i]
+
+    return best, b1, bk, evaluated
+
+
+def load_labels(path):
+    if not path:
+        return None
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return {row["case_id"]: row["label"] for row in csv.DictReader(f)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Leave-one-out evaluation and tuning of FEATURE_WEIGHTS")
+    parser.add_argument("--library", default=LIBRARY_PATH)
+    parser.add_argument("--labels", help="CSV with case_id,label columns (default: derived from solutions)")
+    parser.add_argument("-k", type=int, default=3, help="k for top-k accuracy")
+    parser.add_argument("--search", type=int, default=0, help="Number of candidate weight tables to evaluate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the proposed weight table as JSON")
+    args = parser.parse_args(argv)
+
+    cases = load_cases(args.library, load_labels(args.labels))
+    if len(cases) < 2:
+        print("Need at least two VERIFIED cases to evaluate.")
+        return 1
+
+    X, feature_types, types, bonus = build_matrices(cases, FEATURE_WEIGHTS)
+    labels = np.array([c["label"] for c in cases])
+    base = np.array([FEATURE_WEIGHTS.get(t, 1.0) for t in types])
+    k = min(args.k, len(cases) - 1)
+
+    print(f"📚 {len(cases)} VERIFIED cases, {X.shape[1]} features, {len(types)} feature types, "
+          f"{len(set(labels))} labels")
+
+    start = time.perf_counter()
+    base_top1, base_topk = (v[0] for v in evaluate(X, feature_types, bonus, labels, base[None, :], k))
+    vector_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    naive_top1 = naive_loo_top1(cases, FEATURE_WEIGHTS)
+    naive_time = time.perf_counter() - start
+
+    print(f"Current weights: top-1 {base_top1:.1%}, top-{k} {base_topk:.1%}")
+    print(f"   vectorized LOO {vector_time * 1000:.2f} ms vs naive loop {naive_time * 1000:.2f} ms "
+          f"(naive top-1 {naive_top1:.1%})")
+
+    if not args.search:
+        return 0
+
+    start = time.perf_counter()
+    best, top1, topk, evaluated = search_weights(X, feature_types, bonus, labels, base, k, args.search, args.seed)
+    elapsed = time.perf_counter() - start
+
+    print(f"Proposed weights: top-1 {top1:.1%} ({top1 - base_top1:+.1%}), "
+          f"top-{k} {topk:.1%} ({topk - base_topk:+.1%})")
+    print(f"   searched {evaluated} weight tables in {elapsed:.2f}s ({evaluated / elapsed:.0f} tables/s)")
+
+    proposed = {t: round(float(w), 2) for t, w in zip(types, best)}
+    print("\nFEATURE_WEIGHTS = {")
+    for t in types:
+        marker = "" if proposed[t] == round(FEATURE_WEIGHTS.get(t, 1.0), 2) else f"  # was {FEATURE_WEIGHTS.get(t, 1.0)}"
+        print(f'    "{t}": {proposed[t]},{marker}')
+    print("}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"weights": proposed, "top1": float(top1), "topk": float(topk), "k": k,
+                       "baseline_top1": float(base_top1), "baseline_topk": float(base_topk),
+                       "tables_evaluated": evaluated, "search_seconds": elapsed}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,325 @@
+"""
+[WRITE-BEHIND BUFFER - Feedback Votes & Case Submissions]
+Acknowledges 👍/👎 votes and new cases immediately and persists them to the
+case library in batches from a background worker thread.
+
+- Votes are coalesced per case ID (net score change), submissions per case ID
+- A batch is flushed when it reaches `max_batch` items or the oldest pending
+  item is `max_delay` seconds old
+- A flush with votes locates the voted lines through the memory map
+  (case_reader.py) and rewrites only those spans in one atomic splice (temp
+  file + rename); a flush of new cases only is appended in place, so
+  incremental case indexes (knowledge_base.py) only parse the new lines
+- Votes on PENDING cases are scored for auto-promotion by a separate worker
+  (promotion_worker.py); a promotion comes back as a status change that the
+  next flush applies and publishes for the UI (pop_promotion). A promotion
+  meeting a newer vote for its case is dropped and the case scored again
+- Every flush holds the library lock (file_lock.py) the maintenance commands
+  take for their rewrites, so neither side overwrites the other's changes
+- Pending items are flushed on interpreter shutdown (atexit)
+"""
+import atexit
+import threading
+import time
+from contextlib import contextmanager
+
+from case_reader import append_lines, iter_cases_containing, open_library, splice_many
+from expert_engine import (
+    apply_promotion_to_line,
+    apply_vote_to_line,
+    build_case_entry,
+    submission_message,
+)
+from file_lock import file_lock
+from metrics import PROMOTIONS, REGISTRY, VOTES
+from promotion_worker import PromotionWorker
+
+LIBRARY_PATH = "case_library.txt"
+
+
+class WriteBehindBuffer:
+    """
+    Process-wide queue in front of case_library.txt.
+    Public methods mirror update_case_feedback / save_new_case so callers can swap them in.
+    """
+
+    def __init__(self, library_path=LIBRARY_PATH, max_batch=50, max_delay=2.0):
+        self.library_path = library_path
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()  # One library rewrite at a time
+        self._votes = {}        # case_id -> {"vote": net, "user_features": set, "rbr_result": dict}
+        self._new_cases = {}    # case_id -> library line
+        self._promote = {}      # case_id -> promotion details, decided by the promotion worker
+        self._first_pending = None
+        self._stopped = False
+
+        # Promotions written by a flush, for the UI to pick up on a later rerun
+        self.promotions = {}
+        self.stats = {"flushes": 0, "votes": 0, "cases": 0, "promotions": 0, "errors": 0}
+        self.promotion_worker = PromotionWorker(on_promote=self._queue_promotion)
+
+        REGISTRY.gauge("expert_write_behind_pending", "Coalesced items waiting to be flushed",
+                       callback=lambda: {(): self.pending_count()})
+        REGISTRY.gauge("expert_write_behind", "Write-behind totals (flushes, votes, cases, errors)", ["kind"],
+                       callback=lambda: {(kind,): count for kind, count in self.stats.items()})
+
+        self._worker = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    # ----------------------------------
+    # Producer side (UI thread)
+    # ----------------------------------
+
+    def update_case_feedback(self, case_id, vote, user_features=None, rbr_result=None):
+        """
+        Queues a vote. Returns immediately with (success, promoted, details);
+        promotion is decided at flush time and published in `promotions`.
+        """
+        # CLIPS facts die with the next env.reset(), keep a plain copy
+        if rbr_result is not None and not isinstance(rbr_result, dict):
+            rbr_result = dict(rbr_result)
+
+        VOTES.inc("up" if vote > 0 else "down")
+        with self._lock:
+            pending = self._votes.setdefault(case_id, {"vote": 0, "user_features": None, "rbr_result": None})
+            pending["vote"] += vote
+            if user_features is not None:
+                pending["user_features"] = set(user_features)
+            if rbr_result is not None:
+                pending["rbr_result"] = rbr_result
+            self._mark_pending()
+        return True, False, {}
+
+    def save_new_case(self, user_features, correct_solution, is_verified=False):
+        """Validates and queues a new case. Returns (success, message) like save_new_case."""
+        success, case_id, entry = build_case_entry(user_features, correct_solution, is_verified)
+        if not success:
+            return False, entry
+
+        with self._lock:
+            self._new_cases[case_id] = entry
+            self._mark_pending()
+        return True, submission_message(is_verified)
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._votes) + len(self._new_cases) + len(self._promote)
+
+    def pop_promotion(self, case_id):
+        """Returns and forgets the promotion details for a case, or None."""
+        with self._lock:
+            return self.promotions.pop(case_id, None)
+
+    def _queue_promotion(self, case_id, details):
+        # Called from the promotion worker
+        with self._lock:
+            self._promote[case_id] = details
+            self._mark_pending()
+
+    def _mark_pending(self):
+        # Caller holds the lock
+        if self._first_pending is None:
+            self._first_pending = time.monotonic()
+        self._wakeup.notify()  # Worker re-evaluates size / age thresholds
+
+    # ----------------------------------
+    # Consumer side (worker thread)
+    # ----------------------------------
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._stopped:
+                    count = len(self._votes) + len(self._new_cases) + len(self._promote)
+                    if count >= self.max_batch:
+                        break
+                    if count and time.monotonic() - self._first_pending >= self.max_delay:
+                        break
+                    timeout = None
+                    if count:
+                        timeout = self.max_delay - (time.monotonic() - self._first_pending)
+                    self._wakeup.wait(timeout)
+                if self._stopped:
+                    return
+            self.flush()
+
+    def flush(self):
+        """
+        Writes all pending votes, cases and promotions in one atomic library rewrite.
+        On failure the batch is re-queued so nothing acknowledged is lost.
+        Voted PENDING cases are handed to the promotion worker afterwards.
+
+        Returns:
+            int: Number of coalesced items written
+        """
+        with self._flush_lock:
+            with self._lock:
+                votes, new_cases, promote = self._votes, self._new_cases, self._promote
+                self._votes, self._new_cases, self._promote, self._first_pending = {}, {}, {}, None
+
+            if not votes and not new_cases and not promote:
+                return 0
+
+            try:
+                # The maintenance commands rewrite the library under the same lock
+                with file_lock(self.library_path):
+                    promotions, jobs = self._write_batch(votes, new_cases, promote)
+            except Exception as e:
+                print(f"Error flushing write-behind buffer: {e}")
+                with self._lock:
+                    self.stats["errors"] += 1
+                    self._requeue(votes, new_cases, promote)
+                return 0
+
+        # Scored off this thread; the score written above is what gets evaluated
+        for job in jobs:
+            self.promotion_worker.submit(*job)
+
+        with self._lock:
+            self.promotions.update(promotions)
+            self.stats["flushes"] += 1
+            self.stats["votes"] += len(votes)
+            self.stats["cases"] += len(new_cases)
+            self.stats["promotions"] += len(promotions)
+        return len(votes) + len(new_cases) + len(promote)
+
+    @contextmanager
+    def exclusive(self):
+        """
+        Flushes pending items, then holds off further flushes and every other
+        process's library writers (file_lock) while the caller rewrites the
+        library itself (bulk moderation). Items queued meanwhile are applied to
+        the rewritten file by the next flush.
+        """
+        self.flush()
+        # Same order as flush(): buffer first, then the library
+        with self._flush_lock, file_lock(self.library_path):
+            yield
+
+    def _write_batch(self, votes, new_cases, promote):
+        """
+        Returns:
+            tuple: (promotions written: {case_id: details}, promotion jobs for voted PENDING cases)
+        """
+        if not votes and not promote:
+            append_lines(self.library_path, new_cases.values())
+            return {}, []
+
+        promotions, jobs, edits = {}, [], []
+        remaining = dict(votes)
+        wanted = set(votes) | set(promote)
+
+        # Only the lines of the voted / promoted cases are located and decoded
+        with open_library(self.library_path) as mm:
+            for lazy_case in iter_cases_containing(mm, [case_id.encode("utf-8") for case_id in wanted]):
+                case_id = lazy_case.field(0)
+                if case_id not in wanted:
+                    continue  # ID found inside another field, or a longer ID (CASE-1000 in CASE-10001)
+                wanted.discard(case_id)
+                line = lazy_case.text()
+                new_line = self._apply_to_line(case_id, line, remaining, promote, promotions, jobs)
+                if new_line != line:
+                    old_bytes = mm[lazy_case.start:lazy_case.end]
+                    # The line ending of the case is kept
+                    edits.append((lazy_case.start, lazy_case.end,
+                                  new_line.rstrip("\r\n").encode("utf-8"), old_bytes))
+
+        # Votes on a just-submitted case apply to its entry before it is appended
+        new_entries = [self._apply_to_line(case_id, entry, remaining, promote, promotions, jobs)
+                       if case_id in wanted else entry
+                       for case_id, entry in new_cases.items()]
+
+        for case_id in remaining:
+            print(f"Write-behind: vote for unknown case {case_id} dropped")
+
+        tail = "".join(new_entries).encode("utf-8")
+        if edits:
+            splice_many(self.library_path, edits, tail)
+        elif tail:
+            append_lines(self.library_path, new_entries)
+        return promotions, jobs
+
+    def _apply_to_line(self, case_id, line, remaining, promote, promotions, jobs):
+        """A case line with its pending vote and promotion applied (the line itself if neither applies)."""
+        pending = remaining.pop(case_id, None)
+        if pending is not None:
+            try:
+                new_line, _, _ = apply_vote_to_line(line, pending["vote"], evaluate_promotion=False)
+            except ValueError as e:
+                # Dropped, not re-queued: the line would fail every later flush too
+                print(f"Write-behind: vote for {case_id} dropped, unreadable case line ({e})")
+                new_line = None
+            if new_line is not None:
+                line = new_line
+                job = _promotion_job(new_line, pending)
+                if job is not None:
+                    jobs.append(job)
+        if case_id in promote:
+            if pending is not None:
+                # Decided on the score before this vote: the job queued above re-decides on the new one
+                return line
+            # Skipped if the case was verified or rewritten in the meantime
+            new_line = apply_promotion_to_line(line)
+            if new_line is not None:
+                line = new_line
+                promotions[case_id] = promote[case_id]
+                PROMOTIONS.inc()
+        return line
+
+    def _requeue(self, votes, new_cases, promote):
+        # Caller holds the lock; merge the failed batch back under newer items
+        for case_id, pending in votes.items():
+            current = self._votes.get(case_id)
+            if current is None:
+                self._votes[case_id] = pending
+            else:
+                current["vote"] += pending["vote"]
+                current["user_features"] = current["user_features"] or pending["user_features"]
+                current["rbr_result"] = current["rbr_result"] or pending["rbr_result"]
+        for case_id, entry in new_cases.items():
+            self._new_cases.setdefault(case_id, entry)
+        for case_id, details in promote.items():
+            self._promote.setdefault(case_id, details)
+        if self._first_pending is None:
+            self._first_pending = time.monotonic()
+
+    def close(self):
+        """Stops the workers and flushes everything still pending (flush-on-shutdown)."""
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._wakeup.notify_all()
+        self._worker.join(timeout=5)
+        self.flush()
+        # Promotions scored for the votes just written land in one last flush
+        self.promotion_worker.close()
+        self.flush()
+
+
+def _promotion_job(line, pending):
+    """promotion_worker.submit() arguments for a voted line that is still PENDING, else None."""
+    parts = [p.strip() for p in line.split("|")]
+    if parts[1] != "PENDING":
+        return None
+    # Without the voter's features the case's own features feed the convergence check
+    user_features = pending["user_features"] or set(parts[2].split())
+    return parts[0], int(parts[4]), user_features, parts[3], pending["rbr_result"]
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """Process-wide buffer shared by all Streamlit sessions and reruns."""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = WriteBehindBuffer()
+        return _buffer